@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# Carrega o .env uma única vez, antes de qualquer módulo do app ler os.getenv
+load_dotenv()
@@ -8,12 +8,6 @@ from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
 from app.db import db
 import os
-from dotenv import load_dotenv
-
-# -----------------------------
-# Load environment variables
-# -----------------------------
-load_dotenv()
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretkey")  # Replace with a random jwt key
 ALGORITHM = "HS256"
@@ -78,3 +72,9 @@ def get_current_user(request: Request):
         raise HTTPException(status_code=401, detail="User not found")
 
     return user
+
+def get_current_admin(current_user: dict = Depends(get_current_user)):
+    """Same as get_current_user, but only for users with role 'admin'"""
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+    return current_user
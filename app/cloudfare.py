@@ -1,27 +1,56 @@
-import boto3
+import math
+import threading
 import uuid
 from datetime import datetime
 import os
-from botocore.config import Config
+
+MIB = 1024 * 1024
+
+# Limites do S3/R2 para multipart: partes >= 5 MiB (exceto a última), no máximo 10.000 partes
+MIN_PART_SIZE = 5 * MIB
+MAX_PART_SIZE = 512 * MIB
+MAX_PARTS = 10_000
+# Quantidade de partes desejada: suficiente para paralelizar e retomar sem URLs demais
+TARGET_PARTS = 64
+MAX_MULTIPART_SIZE = int(os.getenv("MAX_MULTIPART_SIZE", 2 * 1024 * MIB))
+MAX_PART_URLS_PER_REQUEST = 100
 
 class R2UploadService:
     def __init__(self):
+        self._s3_client = None
+        self._client_lock = threading.Lock()
+        self.bucket = os.getenv("R2_BUCKET", "recordings")
+        
+        # Use your ACTUAL development URL
+        self.public_base_url = os.getenv("R2_PUBLIC_BASE_URL", "https://pub-de94145f5f0e4c39b93b6db978cc0969.r2.dev")
+
+    @property
+    def s3_client(self):
+        # boto3 é lento para importar e montar o client: só na primeira utilização
+        if self._s3_client is None:
+            with self._client_lock:
+                if self._s3_client is None:
+                    self._s3_client = self._build_client()
+        return self._s3_client
+
+    @staticmethod
+    def _build_client():
+        import boto3
+        from botocore.config import Config
+
         config = Config(
             signature_version='s3v4',
-            s3={'addressing_style': 'virtual'}
+            # MinIO/moto locais precisam de "path"
+            s3={'addressing_style': os.getenv("R2_ADDRESSING_STYLE", "virtual")}
         )
         
-        self.s3_client = boto3.client(
+        return boto3.client(
             's3',
             endpoint_url=os.getenv("R2_ENDPOINT"),
             aws_access_key_id=os.getenv("R2_ACCESS_KEY"),
             aws_secret_access_key=os.getenv("R2_SECRET_KEY"),
             config=config
         )
-        self.bucket = os.getenv("R2_BUCKET", "recordings")
-        
-        # Use your ACTUAL development URL
-        self.public_base_url = "https://pub-de94145f5f0e4c39b93b6db978cc0969.r2.dev"
     
     def generate_upload_url(self, user_email: str, filename: str, file_size: int) -> dict:
         if not filename.lower().endswith('.webm'):
@@ -53,6 +82,88 @@ class R2UploadService:
             'expires_in': 1800
         }
     
+    # -----------------------------
+    # Multipart upload (arquivos grandes, partes em paralelo e retomáveis)
+    # -----------------------------
+
+    def initiate_multipart_upload(self, user_email: str, filename: str, file_size: int) -> dict:
+        if not filename.lower().endswith('.webm'):
+            raise ValueError("Only WebM files are allowed")
+        if file_size <= 0:
+            raise ValueError("Invalid file size")
+        if file_size > MAX_MULTIPART_SIZE:
+            raise ValueError(f"File too large. Max size: {MAX_MULTIPART_SIZE // MIB}MB")
+
+        file_key = self._generate_file_key(user_email, filename)
+        response = self.s3_client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=file_key,
+            ContentType='video/webm'
+        )
+        part_size = self.choose_part_size(file_size)
+
+        return {
+            'upload_id': response['UploadId'],
+            'file_key': file_key,
+            'public_url': f"{self.public_base_url}/{file_key}",
+            'part_size': part_size,
+            'part_count': math.ceil(file_size / part_size),
+            'expires_in': 3600
+        }
+
+    @staticmethod
+    def choose_part_size(file_size: int) -> int:
+        """Tamanho de parte adaptativo: ~TARGET_PARTS partes, arredondado para MiB."""
+        part_size = math.ceil(file_size / TARGET_PARTS / MIB) * MIB
+        part_size = max(part_size, math.ceil(file_size / MAX_PARTS / MIB) * MIB)
+        return min(max(part_size, MIN_PART_SIZE), MAX_PART_SIZE)
+
+    def generate_part_urls(self, file_key: str, upload_id: str, part_numbers: list, expires_in: int = 3600) -> list:
+        if len(part_numbers) > MAX_PART_URLS_PER_REQUEST:
+            raise ValueError(f"At most {MAX_PART_URLS_PER_REQUEST} parts per request")
+        urls = []
+        for part_number in sorted(set(part_numbers)):
+            if not 1 <= part_number <= MAX_PARTS:
+                raise ValueError(f"Invalid part number: {part_number}")
+            urls.append({
+                'part_number': part_number,
+                'url': self.s3_client.generate_presigned_url(
+                    'upload_part',
+                    Params={
+                        'Bucket': self.bucket,
+                        'Key': file_key,
+                        'UploadId': upload_id,
+                        'PartNumber': part_number,
+                    },
+                    ExpiresIn=expires_in,
+                    HttpMethod='PUT'
+                )
+            })
+        return urls
+
+    def list_uploaded_parts(self, file_key: str, upload_id: str) -> list:
+        """Partes já recebidas pelo storage (usado pelo cliente para retomar)."""
+        parts = []
+        paginator = self.s3_client.get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=self.bucket, Key=file_key, UploadId=upload_id):
+            for part in page.get('Parts', []):
+                parts.append({'part_number': part['PartNumber'], 'etag': part['ETag'], 'size': part['Size']})
+        return parts
+
+    def complete_multipart_upload(self, file_key: str, upload_id: str, parts: list) -> dict:
+        ordered = sorted(parts, key=lambda p: p['part_number'])
+        return self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=file_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [
+                {'PartNumber': p['part_number'], 'ETag': p['etag']} for p in ordered
+            ]}
+        )
+
+    def abort_multipart_upload(self, file_key: str, upload_id: str):
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=file_key, UploadId=upload_id)
+
     def _generate_file_key(self, user_email: str, filename: str) -> str:
         safe_email = user_email.replace('@', '_at_').replace('.', '_')
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
@@ -1,10 +1,9 @@
 # app/database.py
+import threading
+from typing import Optional
 from pymongo import MongoClient
+from app.services.metrics import MongoCommandMetrics
 import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env
-load_dotenv()
 
 # MongoDB connection URI (e.g., mongodb://localhost:27017)
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
@@ -12,9 +11,42 @@ MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 # Database name
 DB_NAME = os.getenv("DB_NAME", "pw")  # Default to "pw" if not set
 
-# Create a single MongoClient instance
-client = MongoClient(MONGO_URI)
+# Conexões mantidas abertas no pool (pré-aquecidas no warmup)
+MONGO_MIN_POOL = int(os.getenv("MONGO_MIN_POOL", 0))
+
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """Single MongoClient instance, created on first use (com latência de comandos nas métricas)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGO_URI,
+                    minPoolSize=MONGO_MIN_POOL,
+                    event_listeners=[MongoCommandMetrics()]
+                )
+    return _client
+
+
+def close_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+class _LazyDatabase:
+    """Proxy for client[DB_NAME]: importing app.db opens nothing until the first query"""
+
+    def __getitem__(self, name):
+        return get_client()[DB_NAME][name]
+
+    def __getattr__(self, name):
+        return getattr(get_client()[DB_NAME], name)
 
-# Access the database only once
-db = client[DB_NAME]
 
+db = _LazyDatabase()
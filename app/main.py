@@ -1,14 +1,71 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import users, upload, chat, matchmaking, game 
+from app.routes import users, upload, chat, matchmaking, game, tournament, analysis, metrics, admin
+from app.services.metrics import MetricsMiddleware
+from app.services.compression import CompressionMiddleware
+from app.services.body_limit import BodySizeLimitMiddleware
+from app.services.recording_lifecycle import recording_verifier
+from app.services.recording_search import ensure_indexes as ensure_search_indexes
+from app.services.loop_monitor import loop_monitor
+from app.services.liveness import liveness
+from app.services.tournament import tournament_manager
+from app.services.result_writer import result_writer
+from app.services.drain import drain_manager, ensure_indexes as ensure_checkpoint_indexes
+from app.services.user_stats import ensure_indexes as ensure_games_indexes
+from app.services.avatar_images import shutdown_process_pool
+from app.services.warmup import warm_up, WARMUP_ENABLED
+from app.services.log_pipeline import setup_logging, stop_logging, RequestContextMiddleware
+from app.db import close_client
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Recursos caros (Mongo, boto3, pools) são criados aqui ou no primeiro uso, nunca no import
+    # Logging em fila antes de qualquer outra coisa (nada de I/O de log no caminho das requisições)
+    setup_logging()
+    loop_monitor.start()
+    if WARMUP_ENABLED:
+        await warm_up()
+    for ensure_indexes in (recording_verifier.ensure_indexes, ensure_search_indexes, ensure_checkpoint_indexes,
+                           ensure_games_indexes):
+        try:
+            await asyncio.to_thread(ensure_indexes)
+        except Exception as e:
+            logger.error(f"Could not ensure indexes at startup: {e}")
+    recording_verifier.start()
+    liveness.start()
+    tournament_manager.start()
+    # SIGTERM passa pela drenagem antes do handler do uvicorn (que fecharia os sockets na hora)
+    drain_manager.install()
+    yield
+    drain_manager.uninstall()
+    await tournament_manager.stop()
+    await liveness.stop()
+    # Resultados ainda no buffer vão para o Mongo antes de fechar o cliente
+    await result_writer.stop()
+    await recording_verifier.stop()
+    await loop_monitor.stop()
+    shutdown_process_pool()
+    close_client()
+    # Por último: esvazia a fila com tudo o que o desligamento logou
+    stop_logging()
+
 
 app = FastAPI(
     title="PW API",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    lifespan=lifespan
 )
 
+# Mais interno: limita o corpo antes de o FastAPI ler o formulário (o 413 ainda passa pelo CORS)
+app.add_middleware(BodySizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # adjust in production
@@ -16,6 +73,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Por último = mais externo: o request_id vale para todo o resto (inclusive o log de acesso)
+app.add_middleware(RequestContextMiddleware)
 
 
 app.include_router(users.router, prefix="/api", tags=["users"])
@@ -23,6 +84,10 @@ app.include_router(upload.router, prefix="/api", tags=["upload"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 app.include_router(matchmaking.router, prefix="/api", tags=["matchmaking"])
 app.include_router(game.router, prefix="/api", tags=["game"])
+app.include_router(tournament.router, prefix="/api", tags=["tournament"])
+app.include_router(analysis.router, prefix="/api", tags=["analysis"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
 
 
 @app.get("/")
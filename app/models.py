@@ -63,4 +63,52 @@ class UploadResponse(BaseModel):
     recording_id: str
     file_key: str
     public_url: str
-    expires_in: int
\ No newline at end of file
+    expires_in: int
+
+class MultipartInitResponse(BaseModel):
+    recording_id: str
+    upload_id: str
+    file_key: str
+    public_url: str
+    part_size: int
+    part_count: int
+    expires_in: int
+
+class PartUrlsRequest(BaseModel):
+    part_numbers: List[int]
+
+class CompletedPart(BaseModel):
+    part_number: int
+    etag: str
+
+class MultipartCompleteRequest(BaseModel):
+    parts: List[CompletedPart]
+
+# -----------------------------
+# TOURNAMENT MODELS
+# -----------------------------
+
+class TournamentCreate(BaseModel):
+    name: str
+    format: str = "swiss"
+    rounds: Optional[int] = None
+    max_players: Optional[int] = None
+
+# -----------------------------
+# ANALYSIS MODELS
+# -----------------------------
+
+class AnalysisPosition(BaseModel):
+    board: Optional[List[List[Optional[dict]]]] = None  # None = posição inicial
+    turn: str = "white"
+    chain_piece: Optional[dict] = None
+
+class AnalysisRequest(BaseModel):
+    positions: List[AnalysisPosition]
+    depth: int = 1
+
+class ReviewRequest(BaseModel):
+    moves: List[dict]  # [{"from": {"r", "c"}, "to": {"r", "c"}}, ...]
+    board: Optional[List[List[Optional[dict]]]] = None
+    turn: str = "white"
+    depth: int = 1
@@ -0,0 +1,35 @@
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.auth import get_current_admin
+from app.services.loop_monitor import profiler, MAX_PROFILE_SECONDS
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+# -----------------------------
+# Diagnostics Routes (admin only)
+# -----------------------------
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    current_user: dict = Depends(get_current_admin)
+):
+    """
+    Amostra as pilhas do worker durante `seconds` e devolve collapsed stacks
+    (use com flamegraph.pl ou speedscope).
+    """
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        collapsed = await asyncio.to_thread(profiler.collect, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    filename = f"profile-{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.collapsed"
+    return PlainTextResponse(
+        collapsed,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
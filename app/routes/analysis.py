@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.auth import get_current_user
+from app.models import AnalysisRequest, ReviewRequest
+from app.services.rate_limiter import rate_limit
+from app.services.analysis import (
+    analyse_positions, review_game, position_from_wire, MAX_DEPTH, MAX_POSITIONS
+)
+
+router = APIRouter(prefix="/analysis", tags=["analysis"])
+
+
+def _check_depth(depth: int):
+    if not 1 <= depth <= MAX_DEPTH:
+        raise HTTPException(status_code=400, detail=f"Depth must be between 1 and {MAX_DEPTH}")
+
+# -----------------------------
+# Analysis Routes
+# -----------------------------
+# Rotas síncronas: a busca (CPU) roda no threadpool, fora do event loop
+
+@router.post("", dependencies=[Depends(rate_limit("analysis"))])
+def analyse(data: AnalysisRequest, current_user: dict = Depends(get_current_user)):
+    """Lances legais pontuados para uma ou várias posições (uma avaliação vetorizada para o lote)."""
+    _check_depth(data.depth)
+    if not 1 <= len(data.positions) <= MAX_POSITIONS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {MAX_POSITIONS} positions")
+    try:
+        positions = [position_from_wire(p.board, p.turn, p.chain_piece) for p in data.positions]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": analyse_positions(positions, data.depth)}
+
+@router.post("/review", dependencies=[Depends(rate_limit("analysis"))])
+def review(data: ReviewRequest, current_user: dict = Depends(get_current_user)):
+    """Revisão pós-jogo de uma lista de lances a partir da posição dada (ou da inicial)."""
+    _check_depth(data.depth)
+    try:
+        return review_game(data.moves, position_from_wire(data.board, data.turn), data.depth)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,6 +1,12 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from typing import List
 import json
+import logging
+from app.services.rate_limiter import rate_limiter
+from app.services.metrics import SEND_FAILURES
+from app.services.liveness import liveness
+
+logger = logging.getLogger(__name__)
 
 class ConnectionManager:
     def __init__(self):
@@ -12,11 +18,17 @@ class ConnectionManager:
         # Envia atualização de contagem para todos ao conectar
         await self.broadcast_count()
 
-    def disconnect(self, websocket: WebSocket):
+    def disconnect(self, websocket: WebSocket) -> bool:
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
             # A atualização de contagem no disconnect será chamada manualmente no endpoint
             # pois este método é síncrono aqui, mas precisamos fazer await no broadcast
+            return True
+        return False
+
+    async def evict(self, websocket: WebSocket):
+        # Chamado pelo liveness quando o peer para de responder
+        if self.disconnect(websocket): await self.broadcast_count()
 
     async def broadcast(self, message: str):
         # Envia mensagem bruta para todos
@@ -24,7 +36,8 @@ class ConnectionManager:
             try:
                 await connection.send_text(message)
             except Exception as e:
-                print(f"Error sending message: {e}")
+                SEND_FAILURES.labels("chat").inc()
+                logger.warning(f"Error sending message: {e}", extra={"event": "chat.send_failed"})
 
     async def broadcast_json(self, data: dict):
         # Helper para enviar dicionário como JSON string
@@ -41,16 +54,24 @@ router = APIRouter()
 
 @router.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    if not await rate_limiter.admit_websocket(websocket, "chat"): return
+    socket_key = str(id(websocket))
     try:
+        await manager.connect(websocket)
+        liveness.register(websocket, "chat", manager.evict)
         while True:
             data = await websocket.receive_text()
+            liveness.seen(websocket)
+
+            # Descarta mensagens acima do limite do socket (evita flood no broadcast)
+            if not rate_limiter.allow("chat_msg", socket_key): continue
             
             # Tenta processar a mensagem recebida
             try:
                 # O frontend manda {"username": "X", "text": "Y"}
                 # Vamos adicionar o type="chat" e retransmitir
                 message_data = json.loads(data)
+                if liveness.handle_pong(websocket, message_data): continue
                 message_data["type"] = "chat"
                 
                 await manager.broadcast_json(message_data)
@@ -59,6 +80,9 @@ async def websocket_endpoint(websocket: WebSocket):
                 await manager.broadcast(data)
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        # Envia atualização de contagem para todos ao desconectar
-        await manager.broadcast_count()
\ No newline at end of file
+        # Envia atualização de contagem para todos ao desconectar (se o liveness ainda não o fez)
+        if manager.disconnect(websocket): await manager.broadcast_count()
+    finally:
+        liveness.unregister(websocket)
+        rate_limiter.forget("chat_msg", socket_key)
+        rate_limiter.release_socket("chat")
\ No newline at end of file
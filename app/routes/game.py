@@ -4,6 +4,11 @@ from app.auth import get_current_user, decode_access_token # Importe suas funcoe
 from app.db import db
 from bson import ObjectId
 import json
+from app.services.rate_limiter import rate_limiter, WS_CLOSE_OVERLOADED
+from app.services.liveness import liveness
+from app.services.analysis import send_hint
+from app.services.log_pipeline import game_id_var
+from app.services.drain import restore_game
 
 router = APIRouter()
 
@@ -31,6 +36,15 @@ async def game_endpoint(
     color: str,
     userId: str = Query(None) # Mantém como fallback
 ):
+    if not await rate_limiter.admit_websocket(websocket, "game"): return
+    try:
+        await _run_game_socket(websocket, game_id, color, userId)
+    finally:
+        rate_limiter.release_socket("game")
+
+async def _run_game_socket(websocket: WebSocket, game_id: str, color: str, userId: str):
+    # Todo log emitido a partir desta conexão sai com o game_id
+    game_id_var.set(game_id)
     await websocket.accept() 
     
     # 1. Tenta autenticação segura via Cookie
@@ -39,7 +53,9 @@ async def game_endpoint(
     player_data = {
         "id": None,
         "name": "Anônimo",
-        "email": ""
+        "email": "",
+        # Só True com cookie válido (lugares de torneio exigem isso)
+        "authenticated": False,
     }
 
     if user:
@@ -47,6 +63,7 @@ async def game_endpoint(
         player_data["id"] = str(user["_id"])
         player_data["name"] = user.get("name", "Jogador")
         player_data["email"] = user.get("email", "")
+        player_data["authenticated"] = True
     elif userId and userId != "anon":
         # Fallback para ID da URL (menos seguro, mas útil para dev)
         player_data["id"] = userId
@@ -56,23 +73,48 @@ async def game_endpoint(
                 player_data["name"] = u.get("name", "Visitante")
                 player_data["email"] = u.get("email", "")
         except: pass
+
+    # Limite de (re)conexões por usuário, independente do IP
+    if player_data["id"] and not rate_limiter.allow("ws_user", player_data["id"]):
+        await websocket.close(code=WS_CLOSE_OVERLOADED)
+        return
     
+    # Partida salva por um worker que foi reiniciado: recupera antes de conectar
+    if game_id not in game_manager.active_games: await restore_game(game_id)
+
     # Conecta usando os dados resolvidos
     await game_manager.connect_player(game_id, websocket, color, player_data)
+    socket_key = str(id(websocket))
+    # Peer morto libera o lugar na partida (o oponente para de enviar para ele)
+    liveness.register(websocket, "game", lambda ws: game_manager.disconnect_player(game_id, color, ws))
     
     try:
         while True:
             data = await websocket.receive_text()
-            msg = json.loads(data)
+            liveness.seen(websocket)
+
+            # Mensagens acima do limite são descartadas sem processar nem fazer broadcast
+            if not rate_limiter.allow("game_msg", socket_key): continue
+
+            try: msg = json.loads(data)
+            except ValueError: continue
+            if liveness.handle_pong(websocket, msg): continue
             
             msg_type = msg.get("type")
 
-            if msg_type == "move":
+            if msg_type in ("move", "request_state"):
                 await game_manager.process_move(game_id, msg, color)
+            elif msg_type == "hint":
+                # Busca mais cara que um lance: balde próprio por socket
+                if rate_limiter.allow("hint", socket_key): await send_hint(game_id, color)
             elif msg_type == "surrender": 
                 await game_manager.player_surrender(game_id, color)
             elif msg_type in ["chat", "signal"]:
                 await game_manager.forward_message(game_id, msg, color)
                 
     except (WebSocketDisconnect, RuntimeError):
-        await game_manager.disconnect_player(game_id, color)
\ No newline at end of file
+        await game_manager.disconnect_player(game_id, color, websocket)
+    finally:
+        liveness.unregister(websocket)
+        rate_limiter.forget("game_msg", socket_key)
+        rate_limiter.forget("hint", socket_key)
\ No newline at end of file
@@ -1,14 +1,26 @@
+import json
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.services.game_manager import game_manager
+from app.services.rate_limiter import rate_limiter
+from app.services.liveness import liveness
 
 router = APIRouter()
 
 @router.websocket("/ws/matchmaking")
 async def matchmaking_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    await game_manager.add_to_queue(websocket)
+    if not await rate_limiter.admit_websocket(websocket, "matchmaking"): return
     try:
+        await websocket.accept()
+        # Peer que parar de responder sai da fila sem esperar o TCP perceber
+        liveness.register(websocket, "matchmaking", game_manager.remove_from_queue)
+        await game_manager.add_to_queue(websocket)
         while True:
-            await websocket.receive_text()
+            data = await websocket.receive_text()
+            liveness.seen(websocket)
+            try: liveness.handle_pong(websocket, json.loads(data))
+            except ValueError: pass
     except (WebSocketDisconnect, RuntimeError):
-        game_manager.remove_from_queue(websocket)
\ No newline at end of file
+        game_manager.remove_from_queue(websocket)
+    finally:
+        liveness.unregister(websocket)
+        rate_limiter.release_socket("matchmaking")
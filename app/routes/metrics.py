@@ -0,0 +1,15 @@
+import os
+from fastapi import APIRouter, HTTPException, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+# Se definido, /api/metrics exige "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Exposição no formato texto do Prometheus"""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
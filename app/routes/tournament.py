@@ -0,0 +1,105 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from app.auth import get_current_user, get_current_admin
+from app.models import TournamentCreate
+from app.routes.game import get_user_from_ws
+from app.services.liveness import liveness
+from app.services.rate_limiter import rate_limiter
+from app.services.tournament import tournament_manager, TournamentNotFound, TournamentError
+
+router = APIRouter()
+
+# Código de fechamento para torneio inexistente ou usuário não autenticado
+WS_CLOSE_NOT_FOUND = 4004
+
+
+def _get(tournament_id: str):
+    try:
+        return tournament_manager.get(tournament_id)
+    except TournamentNotFound:
+        raise HTTPException(status_code=404, detail="Tournament not found")
+
+# -----------------------------
+# Tournament Routes
+# -----------------------------
+
+@router.get("/tournaments")
+def list_tournaments():
+    return [t.summary() for t in tournament_manager.tournaments.values()]
+
+@router.post("/tournaments")
+def create_tournament(data: TournamentCreate, current_user: dict = Depends(get_current_admin)):
+    try:
+        t = tournament_manager.create(
+            data.name, data.format, str(current_user["_id"]), rounds=data.rounds, max_players=data.max_players
+        )
+    except TournamentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return t.summary()
+
+@router.get("/tournaments/{tournament_id}")
+def get_tournament(tournament_id: str):
+    return _get(tournament_id).detail()
+
+@router.post("/tournaments/{tournament_id}/register")
+def register(tournament_id: str, current_user: dict = Depends(get_current_user)):
+    _get(tournament_id)
+    try:
+        tournament_manager.register(
+            tournament_id, str(current_user["_id"]), current_user.get("name", "Jogador"), current_user.get("wins", 0)
+        )
+    except TournamentError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Registered"}
+
+@router.delete("/tournaments/{tournament_id}/register")
+def unregister(tournament_id: str, current_user: dict = Depends(get_current_user)):
+    _get(tournament_id)
+    try:
+        tournament_manager.unregister(tournament_id, str(current_user["_id"]))
+    except TournamentError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Unregistered"}
+
+@router.post("/tournaments/{tournament_id}/start")
+async def start_tournament(tournament_id: str, current_user: dict = Depends(get_current_admin)):
+    _get(tournament_id)
+    try:
+        t = await tournament_manager.start_tournament(tournament_id)
+    except TournamentError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return t.summary()
+
+# -----------------------------
+# Canal de avisos (rodadas, classificação)
+# -----------------------------
+
+@router.websocket("/ws/tournament/{tournament_id}")
+async def tournament_endpoint(websocket: WebSocket, tournament_id: str):
+    if not await rate_limiter.admit_websocket(websocket, "tournament"): return
+    try:
+        await websocket.accept()
+        user = await get_user_from_ws(websocket)
+        t = tournament_manager.tournaments.get(tournament_id)
+        if not user or t is None:
+            await websocket.close(code=WS_CLOSE_NOT_FOUND)
+            return
+        user_id = str(user["_id"])
+        tournament_manager.subscribe(t, user_id, websocket)
+        liveness.register(websocket, "tournament", tournament_manager.unsubscribe)
+
+        # Estado atual + a partida da rodada, para quem (re)conecta no meio do torneio
+        await websocket.send_text(json.dumps(dict(t.detail(), type="tournament_state"), default=str))
+        if user_id in t.assignments: await websocket.send_text(t.assignments[user_id])
+
+        while True:
+            data = await websocket.receive_text()
+            liveness.seen(websocket)
+            try: liveness.handle_pong(websocket, json.loads(data))
+            except ValueError: pass
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        tournament_manager.unsubscribe(websocket)
+        liveness.unregister(websocket)
+        rate_limiter.release_socket("tournament")
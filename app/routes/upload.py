@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models import UploadRequest, UploadResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from typing import Optional
+from app.models import UploadRequest, UploadResponse, MultipartInitResponse, PartUrlsRequest, MultipartCompleteRequest
 import uuid
 from datetime import datetime
 from app.db import db
 from app.auth import get_current_user
 from app.cloudfare import r2_service
 from bson import ObjectId
+from botocore.exceptions import ClientError
+from app.services.recording_lifecycle import (
+    lifecycle_fields, PENDING, UPLOADED, FAILED, LISTABLE_STATUSES
+)
+from app.services.etags import make_etag, not_modified, set_validators, CACHE_RECORDINGS
+from app.services.recording_search import search_recordings, InvalidCursor, MAX_PAGE_SIZE
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 router = APIRouter(prefix="/upload", tags=["upload"])
@@ -14,6 +24,26 @@ router = APIRouter(prefix="/upload", tags=["upload"])
 # Recording Upload and Retrieval Routes
 # -----------------------------
 
+# Tempo para concluir um multipart (o cliente renova as URLs das partes em lotes)
+MULTIPART_EXPIRES_IN = 6 * 3600
+
+def _new_recording(request: UploadRequest, current_user: dict, upload_data: dict, expires_in: int) -> dict:
+    return {
+        "recording_id": str(uuid.uuid4()),
+        "user_id": current_user["_id"],
+        "user_email": current_user["email"],
+        "title": request.title,
+        "duration": request.duration,
+        "players": [player.dict() for player in request.players],
+        "game_type": request.game_type,
+        "file_key": upload_data["file_key"],
+        "file_size": request.file_size,
+        "public_url": upload_data["public_url"],
+        **lifecycle_fields(PENDING, expires_in),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
 @router.post("/request-url", response_model=UploadResponse)
 def request_upload_url(
     request: UploadRequest,
@@ -26,21 +56,7 @@ def request_upload_url(
             file_size=request.file_size
         )
         
-        recording_data = {
-            "recording_id": str(uuid.uuid4()),
-            "user_id": current_user["_id"],
-            "user_email": current_user["email"],
-            "title": request.title,
-            "duration": request.duration,
-            "players": [player.dict() for player in request.players],
-            "game_type": request.game_type,
-            "file_key": upload_data["file_key"],
-            "file_size": request.file_size,
-            "public_url": upload_data["public_url"],
-            "status": "completed",
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
+        recording_data = _new_recording(request, current_user, upload_data, upload_data["expires_in"])
         
         db["recordings"].insert_one(recording_data)
         
@@ -57,22 +73,159 @@ def request_upload_url(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate upload URL: {str(e)}")
 
+# -----------------------------
+# Multipart Upload Routes (gravações grandes)
+# -----------------------------
+
+def _get_multipart_recording(recording_id: str, current_user: dict) -> dict:
+    recording = db["recordings"].find_one({
+        "recording_id": recording_id,
+        "user_id": current_user["_id"],
+        "upload_id": {"$exists": True}
+    })
+    if not recording:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if recording["status"] != PENDING:
+        raise HTTPException(status_code=409, detail=f"Upload is already {recording['status']}")
+    return recording
+
+@router.post("/multipart/initiate", response_model=MultipartInitResponse)
+def initiate_multipart_upload(
+    request: UploadRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        upload_data = r2_service.initiate_multipart_upload(
+            user_email=current_user["email"],
+            filename=request.filename,
+            file_size=request.file_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to initiate upload: {str(e)}")
+
+    recording_data = _new_recording(request, current_user, upload_data, MULTIPART_EXPIRES_IN)
+    recording_data["upload_id"] = upload_data["upload_id"]
+    recording_data["part_size"] = upload_data["part_size"]
+    db["recordings"].insert_one(recording_data)
+
+    return MultipartInitResponse(
+        recording_id=recording_data["recording_id"],
+        upload_id=upload_data["upload_id"],
+        file_key=upload_data["file_key"],
+        public_url=upload_data["public_url"],
+        part_size=upload_data["part_size"],
+        part_count=upload_data["part_count"],
+        expires_in=upload_data["expires_in"]
+    )
+
+@router.post("/multipart/{recording_id}/part-urls")
+def get_part_urls(
+    recording_id: str,
+    request: PartUrlsRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Lote de URLs assinadas para as partes pedidas (o cliente envia em paralelo)."""
+    recording = _get_multipart_recording(recording_id, current_user)
+    try:
+        urls = r2_service.generate_part_urls(recording["file_key"], recording["upload_id"], request.part_numbers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"urls": urls, "expires_in": 3600}
+
+@router.get("/multipart/{recording_id}/parts")
+def list_uploaded_parts(recording_id: str, current_user: dict = Depends(get_current_user)):
+    """Partes já recebidas, para retomar um upload interrompido."""
+    recording = _get_multipart_recording(recording_id, current_user)
+    try:
+        parts = r2_service.list_uploaded_parts(recording["file_key"], recording["upload_id"])
+    except ClientError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to list parts: {str(e)}")
+    return {"part_size": recording.get("part_size"), "parts": parts}
+
+@router.post("/multipart/{recording_id}/complete")
+def complete_multipart_upload(
+    recording_id: str,
+    request: MultipartCompleteRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    recording = _get_multipart_recording(recording_id, current_user)
+    if not request.parts:
+        raise HTTPException(status_code=400, detail="No parts provided")
+    try:
+        r2_service.complete_multipart_upload(
+            recording["file_key"],
+            recording["upload_id"],
+            [part.dict() for part in request.parts]
+        )
+    except ClientError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to complete upload: {str(e)}")
+
+    _mark_uploaded(recording["_id"])
+    return {"recording_id": recording_id, "public_url": recording["public_url"], "status": UPLOADED}
+
+@router.delete("/multipart/{recording_id}")
+def abort_multipart_upload(recording_id: str, current_user: dict = Depends(get_current_user)):
+    recording = _get_multipart_recording(recording_id, current_user)
+    try:
+        r2_service.abort_multipart_upload(recording["file_key"], recording["upload_id"])
+    except ClientError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to abort upload: {str(e)}")
+
+    db["recordings"].update_one(
+        {"_id": recording["_id"]},
+        {"$set": {"status": FAILED, "failure_reason": "aborted", "updated_at": datetime.utcnow()}}
+    )
+    return {"recording_id": recording_id, "status": FAILED}
+
+# -----------------------------
+# Upload Lifecycle Routes
+# -----------------------------
+
+def _mark_uploaded(recording_oid):
+    # Verificação imediata pelo verificador em lote (sem HEAD na requisição)
+    now = datetime.utcnow()
+    db["recordings"].update_one(
+        {"_id": recording_oid, "status": PENDING},
+        {"$set": {"status": UPLOADED, "next_check_at": now, "updated_at": now}}
+    )
+
+@router.post("/{recording_id}/uploaded")
+def mark_uploaded(recording_id: str, current_user: dict = Depends(get_current_user)):
+    """Cliente avisa que o PUT direto terminou; o verificador confirma no storage."""
+    recording = db["recordings"].find_one(
+        {"recording_id": recording_id, "user_id": current_user["_id"]},
+        {"status": 1, "upload_id": 1}
+    )
+    if not recording or recording.get("upload_id"):
+        raise HTTPException(status_code=404, detail="Recording not found")
+    if recording["status"] == PENDING:
+        _mark_uploaded(recording["_id"])
+        return {"recording_id": recording_id, "status": UPLOADED}
+    return {"recording_id": recording_id, "status": recording["status"]}
+
 @router.get("/my-recordings")
-def get_my_recordings(current_user: dict = Depends(get_current_user)):
+def get_my_recordings(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """
     Return all recordings for the authenticated user.
     """
-    try:
-        print("DEBUG - User from auth:", current_user)
+    # recordings_version muda sempre que o verificador altera uma gravação do usuário
+    etag = make_etag("recordings", current_user["_id"], current_user.get("recordings_version", 0))
+    cached = not_modified(request, etag, CACHE_RECORDINGS)
+    if cached: return cached
+    set_validators(response, etag, CACHE_RECORDINGS)
 
+    try:
         user_id = current_user["_id"]   # THIS is already ObjectId (just like in /me)
 
-        print("DEBUG - Using user_id:", user_id, type(user_id))
-
         # Query recordings using ObjectId directly
-        recordings = list(db["recordings"].find({"user_id": user_id}))
-
-        print("DEBUG - Fetched recordings:", recordings)
+        # Só gravações confirmadas no storage (sem entradas fantasmas)
+        # Sem os campos internos do verificador: novas tentativas não mudam a resposta (nem o ETag)
+        recordings = list(db["recordings"].find(
+            {"user_id": user_id, "status": {"$in": LISTABLE_STATUSES}},
+            {"verify_attempts": 0, "next_check_at": 0}
+        ))
 
         cleaned = []
         for rec in recordings:
@@ -90,8 +243,24 @@ def get_my_recordings(current_user: dict = Depends(get_current_user)):
 
         return cleaned
 
-    except Exception as e:
-        print(f"ERROR in /my-recordings: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+    except Exception:
+        logger.exception("Error in /my-recordings")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/search")
+def search_my_recordings(
+    q: Optional[str] = Query(None, max_length=100, description="Texto no título ou nome dos jogadores"),
+    player: Optional[str] = Query(None, max_length=100, description="Email ou nome exato de um jogador"),
+    game_type: Optional[str] = Query(None, max_length=50),
+    cursor: Optional[str] = Query(None, max_length=200, description="next_cursor da página anterior"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Busca paginada nas gravações do usuário (e nas partidas em que ele jogou).
+    A primeira página traz as contagens por tipo de jogo e resultado.
+    """
+    try:
+        return search_recordings(current_user, q=q, player=player, game_type=game_type, cursor=cursor, limit=limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
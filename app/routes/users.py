@@ -1,18 +1,26 @@
 # app/routes/users.py
-import os
-from fastapi import APIRouter, HTTPException, Depends, status, Response, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, status, Response, UploadFile, File, Request
 from datetime import datetime
 from app.models import UserCreate, UserLogin, LoginResponse, UserPublic, UserUpdate
 from app.db import db
 from app.auth import hash_password, verify_password, create_access_token
 from app.auth import get_current_user
+from app.services.rate_limiter import rate_limit, rate_limiter
+from app.services.avatar_images import save_avatar, avatar_variant, AvatarTooLarge, InvalidImage, MAX_AVATAR_BYTES
+from app.services.etags import (
+    make_etag, not_modified, set_validators, leaderboard_generation, bump_leaderboard,
+    CACHE_ME, CACHE_RANKING
+)
+from app.services.user_stats import get_user_stats
 from typing import List
+import logging
 
 # Caminho onde os avatares serão salvos no servidor
 AVATAR_FOLDER = "/var/www/html/images/avatars/custom"
+AVATAR_BASE_URL = "https://pw.jan.bortolanza.vms.ufsc.br/images/avatars/custom"
+DEFAULT_AVATAR = "https://pw.jan.bortolanza.vms.ufsc.br/images/avatars/default/default_avatar.png"
 
-# Garantir que a pasta exista
-os.makedirs(AVATAR_FOLDER, exist_ok=True)
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -20,7 +28,7 @@ router = APIRouter()
 # Registration Route
 # -----------------------------
 
-@router.post("/register", status_code=201)
+@router.post("/register", status_code=201, dependencies=[Depends(rate_limit("register"))])
 def register(user: UserCreate):
     # Check if user already exists
 
@@ -40,12 +48,14 @@ def register(user: UserCreate):
         "name": user.name,
         "email": user.email,
         "password": hashed_pwd,
-        "avatar": "https://pw.jan.bortolanza.vms.ufsc.br/images/avatars/default/default_avatar.png",
+        "avatar": DEFAULT_AVATAR,
         "role": "user",
         "is_active": True,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     })
+    # Com poucos usuários, o novo já aparece no ranking
+    bump_leaderboard()
 
     return {"message": "User registered successfully"}
 
@@ -53,11 +63,18 @@ def register(user: UserCreate):
 # Login and Logout Routes
 # -----------------------------
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(rate_limit("login"))])
 def login(user: UserLogin, response: Response):
+    # Limite por conta, além do limite por IP (protege contra ataques distribuídos).
+    # Só senhas erradas gastam tokens do balde da conta
+    account_key = f"user:{user.email}"
+    if rate_limiter.exhausted("login", account_key):
+        raise HTTPException(status_code=429, detail="Too many login attempts")
+
     db_user = db["users"].find_one({"email": user.email})
 
     if not db_user or not verify_password(user.password, db_user["password"]):
+        rate_limiter.allow("login", account_key)
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     token = create_access_token({"sub": db_user["email"]})
@@ -121,13 +138,14 @@ def update_profile(
             {"email": current_user["email"]},
             {"$set": update_data}
         )
+        if "name" in update_data: bump_leaderboard()
         
         return {"message": "Profile updated successfully"}
         
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"UPDATE ERROR: {str(e)}")
+    except Exception:
+        logger.exception("Error updating profile")
         raise HTTPException(status_code=500, detail="Error updating profile")
 
 @router.put("/update-avatar")
@@ -143,9 +161,11 @@ def update_avatar(avatar_url: str, current_user: dict = Depends(get_current_user
             "$set": {
                 "avatar": avatar_url,
                 "updated_at": datetime.utcnow()
-            }
+            },
+            "$unset": {"avatar_thumbs": ""}
         }
     )
+    bump_leaderboard()
     
     return Response(status_code=200)
 
@@ -165,23 +185,21 @@ async def upload_avatar(
             detail="Only JPG, PNG or WEBP images are allowed"
         )
 
-    # Gerar nome único baseado no email do usuário
-    file_extension = file.filename.split(".")[-1]
-    safe_email = current_user["email"].replace("@", "_").replace(".", "_")
-
-    filename = f"{safe_email}_{datetime.utcnow().timestamp()}.{file_extension}"
-    file_path = os.path.join(AVATAR_FOLDER, filename)
-
-    # Salvar arquivo no servidor
+    # O corpo já foi limitado enquanto chegava (BodySizeLimitMiddleware); o limite do
+    # arquivo em si também é aplicado durante a cópia
+    # Copia em blocos e redimensiona fora do event loop; nomes derivados do hash do conteúdo
     try:
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        thumbnails = await save_avatar(file.file, AVATAR_FOLDER)
+    except AvatarTooLarge:
+        raise HTTPException(status_code=413, detail=f"File too large. Max size: {MAX_AVATAR_BYTES // 1024 // 1024}MB")
+    except InvalidImage:
+        raise HTTPException(status_code=400, detail="Invalid image file")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
 
-    # URL pública do avatar
-    avatar_url = f"https://pw.jan.bortolanza.vms.ufsc.br/images/avatars/custom/{filename}"
+    avatar_thumbs = {str(size): f"{AVATAR_BASE_URL}/{name}" for size, name in thumbnails.items()}
+    # URL pública do avatar (maior variante)
+    avatar_url = avatar_thumbs[str(max(thumbnails))]
 
     # Atualizar o avatar do usuário no banco
     db["users"].update_one(
@@ -189,12 +207,14 @@ async def upload_avatar(
         {
             "$set": {
                 "avatar": avatar_url,
+                "avatar_thumbs": avatar_thumbs,
                 "updated_at": datetime.utcnow()
             }
         }
     )
+    bump_leaderboard()
 
-    return {"message": "Avatar uploaded successfully", "avatar_url": avatar_url}
+    return {"message": "Avatar uploaded successfully", "avatar_url": avatar_url, "avatar_thumbs": avatar_thumbs}
 
 
 # -----------------------------
@@ -202,40 +222,49 @@ async def upload_avatar(
 # -----------------------------
 
 @router.get("/me")
-def get_me(current_user: dict = Depends(get_current_user)):
+def get_me(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """
     Get current user profile data
     """
+    # Toda escrita no usuário (perfil, avatar, estatísticas) atualiza updated_at
+    etag = make_etag("me", current_user["_id"], current_user.get("updated_at"))
+    cached = not_modified(request, etag, CACHE_ME)
+    if cached: return cached
+    set_validators(response, etag, CACHE_ME)
+
     try:
         # Já temos o usuário completo do get_current_user
         # Não precisamos buscar novamente no banco!
-        
-        print(f"DEBUG - User from auth: {current_user}")
-        
         # Retornar diretamente os dados do current_user
         return {
             "name": current_user.get("name", ""),
             "email": current_user.get("email", ""),
-            "avatar": current_user.get("avatar", "https://pw.jan.bortolanza.vms.ufsc.br/images/avatars/default/default_avatar.png"),
+            "avatar": avatar_variant(current_user, 128, DEFAULT_AVATAR),
             "location": current_user.get("location", ""),
             "bio": current_user.get("bio", ""),
             "totalGames": current_user.get("totalGames", 0),
             "wins": current_user.get("wins", 0),
             "losses": current_user.get("losses", 0),
             "draws": current_user.get("draws", 0),
+            # Documento de estatísticas mantido no fim de cada partida (uma leitura pelo _id)
+            "stats": get_user_stats(current_user["_id"]),
         }
         
-    except Exception as e:
-        print(f"ERROR in /me: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error in /me")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/ranking")
-def get_ranking(current_user: dict = Depends(get_current_user)):
+def get_ranking(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """
     Retorna os top 5 usuários com mais vitórias.
     """
+    # Leitura de um documento pelo _id em vez do sort na coleção de usuários
+    etag = make_etag("ranking", leaderboard_generation())
+    cached = not_modified(request, etag, CACHE_RANKING)
+    if cached: return cached
+    set_validators(response, etag, CACHE_RANKING)
+
     try:
         # Busca usuários ordenados por vitórias (descendente), limitados a 5
         # Projetamos apenas os campos necessários para segurança e performance
@@ -245,6 +274,7 @@ def get_ranking(current_user: dict = Depends(get_current_user)):
                 "_id": 0,           # Não expor o ID interno
                 "name": 1, 
                 "avatar": 1, 
+                "avatar_thumbs": 1,
                 "wins": 1, 
                 "totalGames": 1
             }
@@ -257,13 +287,13 @@ def get_ranking(current_user: dict = Depends(get_current_user)):
         for user in ranking_list:
             cleaned_ranking.append({
                 "name": user.get("name", "Jogador"),
-                "avatar": user.get("avatar", "https://pw.jan.bortolanza.vms.ufsc.br/images/avatars/default/default_avatar.png"),
+                "avatar": avatar_variant(user, 64, DEFAULT_AVATAR),
                 "wins": user.get("wins", 0),
                 "totalGames": user.get("totalGames", 0)
             })
 
         return cleaned_ranking
 
-    except Exception as e:
-        print(f"ERROR in /ranking: {str(e)}")
+    except Exception:
+        logger.exception("Error in /ranking")
         raise HTTPException(status_code=500, detail="Error fetching ranking")
\ No newline at end of file
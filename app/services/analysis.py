@@ -0,0 +1,310 @@
+"""
+Análise de posições: lances legais pontuados por uma avaliação estática vetorizada.
+
+Cada posição vira uma linha de um array NumPy (N, 64) de bytes no mesmo formato do
+GameSession (bits WHITE/BLACK/KING). Material, damas, avanço, mobilidade e ameaças de
+captura saem de operações sobre o lote inteiro, então avaliar as folhas de uma dica,
+de várias posições ou de uma partida inteira é uma chamada só de `evaluate`.
+
+A geração de lances segue as regras do GameManager (captura obrigatória, dama voadora,
+captura em cadeia) e usa as mesmas funções dele para aplicar lances e detectar capturas.
+"""
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+from app.services.game_manager import game_manager, DIRECTIONS
+from app.services.game_session import (
+    board_from_wire, initial_board, COLOR_BITS, OPPONENT, WHITE, BLACK, KING
+)
+from app.services.metrics import SEND_FAILURES
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Pesos da avaliação (pontos por unidade, ponto de vista das brancas)
+# -----------------------------
+W_MAN = 100.0
+W_KING = 250.0
+W_ADVANCE = 2.0
+W_MOBILITY = 4.0
+W_THREAT = 15.0
+WIN_SCORE = 10000.0
+
+MAX_DEPTH = 2
+MAX_POSITIONS = 64
+MAX_REVIEW_MOVES = 300
+HINT_MOVES = 3
+
+# Perda (em pontos) em relação ao melhor lance -> classificação na revisão
+REVIEW_LABELS = ((10, "best"), (50, "good"), (150, "inaccuracy"), (400, "mistake"))
+
+_ROWS = np.arange(8, dtype=np.int32)[:, None]
+_FORWARD = {"white": -1, "black": 1}
+
+# Posição = (tabuleiro, quem joga, peça em captura em cadeia)
+Position = Tuple[bytearray, str, Optional[dict]]
+
+
+# -----------------------------
+# Avaliação vetorizada
+# -----------------------------
+
+def encode(boards: List[bytearray]) -> np.ndarray:
+    """Lote de tabuleiros bytearray -> array (N, 64) uint8, sem cópia casa a casa."""
+    return np.frombuffer(b"".join(boards), dtype=np.uint8).reshape(-1, 64)
+
+
+def _neighbor(mask: np.ndarray, dr: int, dc: int) -> np.ndarray:
+    """out[:, r, c] = mask[:, r + dr, c + dc] (False fora do tabuleiro)."""
+    out = np.zeros_like(mask)
+    out[:, max(0, -dr):8 - max(0, dr), max(0, -dc):8 - max(0, dc)] = \
+        mask[:, max(0, dr):8 - max(0, -dr), max(0, dc):8 - max(0, -dc)]
+    return out
+
+
+def _count(mask: np.ndarray) -> np.ndarray:
+    return mask.sum(axis=(1, 2), dtype=np.int32)
+
+
+def evaluate(boards: np.ndarray) -> np.ndarray:
+    """Pontuação estática de cada tabuleiro do lote, positiva a favor das brancas."""
+    b = boards.reshape(-1, 8, 8)
+    white, black, king = (b & WHITE) > 0, (b & BLACK) > 0, (b & KING) > 0
+    empty = b == 0
+    w_men, b_men = white & ~king, black & ~king
+    w_kings, b_kings = white & king, black & king
+
+    score = W_MAN * (_count(w_men) - _count(b_men)) + W_KING * (_count(w_kings) - _count(b_kings))
+    # Avanço das peças comuns (linhas andadas desde a própria base)
+    score += W_ADVANCE * ((w_men * (7 - _ROWS)).sum(axis=(1, 2)) - (b_men * _ROWS).sum(axis=(1, 2)))
+
+    for dr, dc in DIRECTIONS:
+        free = _neighbor(empty, dr, dc)
+        jump = _neighbor(empty, 2 * dr, 2 * dc)
+        # Mobilidade: peças comuns só andam para frente, damas em qualquer diagonal
+        w_movers = w_kings | (w_men if dr == _FORWARD["white"] else False)
+        b_movers = b_kings | (b_men if dr == _FORWARD["black"] else False)
+        score += W_MOBILITY * (_count(w_movers & free) - _count(b_movers & free))
+        # Ameaças: inimiga adjacente com a casa seguinte vazia
+        score += W_THREAT * (_count(white & _neighbor(black, dr, dc) & jump)
+                             - _count(black & _neighbor(white, dr, dc) & jump))
+
+    # Mesma regra de vitória do jogo: sem peças, perdeu
+    score = np.where(white.any(axis=(1, 2)), score, -WIN_SCORE)
+    return np.where(black.any(axis=(1, 2)), score, WIN_SCORE)
+
+
+# -----------------------------
+# Geração de lances (regras do GameManager)
+# -----------------------------
+
+def legal_moves(board: bytearray, color: str, chain_piece: Optional[dict] = None) -> list:
+    """(origem, destino, é_captura) válidos para `color`, um passo por lance como no WebSocket."""
+    own = COLOR_BITS[color]
+    if chain_piece:
+        origins, must_capture = [chain_piece["r"] * 8 + chain_piece["c"]], True
+    else:
+        origins = [i for i, p in enumerate(board) if p & own]
+        must_capture = game_manager._has_any_capture(board, color)
+    forward = _FORWARD[color]
+
+    moves = []
+    for i in origins:
+        r, c, is_king = i >> 3, i & 7, board[i] & KING
+        o = {"r": r, "c": c}
+        for dr, dc in DIRECTIONS:
+            ir, ic = r + dr, c + dc
+            if must_capture:
+                if is_king:
+                    # Dama voadora: desliza até a primeira peça; se inimiga, pousa em qualquer casa vazia depois
+                    while 0 <= ir < 8 and 0 <= ic < 8 and not board[ir * 8 + ic]:
+                        ir += dr
+                        ic += dc
+                    if not (0 <= ir < 8 and 0 <= ic < 8) or board[ir * 8 + ic] & own: continue
+                    jr, jc = ir + dr, ic + dc
+                    while 0 <= jr < 8 and 0 <= jc < 8 and not board[jr * 8 + jc]:
+                        moves.append((o, {"r": jr, "c": jc}, True))
+                        jr += dr
+                        jc += dc
+                else:
+                    jr, jc = r + 2 * dr, c + 2 * dc
+                    if not (0 <= jr < 8 and 0 <= jc < 8) or board[jr * 8 + jc]: continue
+                    mid = board[ir * 8 + ic]
+                    if mid and not mid & own: moves.append((o, {"r": jr, "c": jc}, True))
+            elif is_king:
+                while 0 <= ir < 8 and 0 <= ic < 8 and not board[ir * 8 + ic]:
+                    moves.append((o, {"r": ir, "c": ic}, False))
+                    ir += dr
+                    ic += dc
+            elif dr == forward and 0 <= ir < 8 and 0 <= ic < 8 and not board[ir * 8 + ic]:
+                moves.append((o, {"r": ir, "c": ic}, False))
+    return moves
+
+
+def play(position: Position, move) -> Position:
+    """Aplica um passo numa cópia (mesma sequência do process_move, sem I/O)."""
+    board, turn, _ = position
+    o, t, is_capture = move
+    board = bytearray(board)
+    game_manager._apply_move_on_board(board, o, t, is_capture)
+    if is_capture and game_manager._can_capture_from(board, t, turn):
+        return board, turn, t
+    return board, OPPONENT[turn], None
+
+
+def _is_over(board: bytearray) -> bool:
+    return not any(p & WHITE for p in board) or not any(p & BLACK for p in board)
+
+
+# -----------------------------
+# Busca em lote
+# -----------------------------
+
+class _Batch:
+    """Junta as folhas de várias posições para avaliar todas numa chamada só."""
+
+    def __init__(self):
+        self.leaves: List[bytearray] = []
+
+    def add(self, boards: List[bytearray]) -> Tuple[int, int]:
+        start = len(self.leaves)
+        self.leaves.extend(boards)
+        return start, len(self.leaves)
+
+    def evaluate(self) -> np.ndarray:
+        if not self.leaves: return np.zeros(0)
+        return evaluate(encode(self.leaves))
+
+
+def _plan(batch: _Batch, position: Position, depth: int):
+    """
+    Registra as folhas de cada lance da posição. depth=2 também considera as respostas:
+    o valor do lance é o melhor (mesmo jogador, cadeia) ou o pior (adversário) entre elas.
+    """
+    moves = legal_moves(*position)
+    plans = []
+    for move in moves:
+        child = play(position, move)
+        replies = legal_moves(*child) if depth > 1 and not _is_over(child[0]) else []
+        if replies:
+            span = batch.add([play(child, reply)[0] for reply in replies])
+            plans.append((move, span, child[1] == position[1]))
+        else:
+            plans.append((move, batch.add([child[0]]), True))
+    return position, moves, plans, batch.add([position[0]])
+
+
+def _resolve(scores: np.ndarray, planned) -> dict:
+    position, moves, plans, static_span = planned
+    # Tudo do ponto de vista de quem joga na posição
+    sign = 1.0 if position[1] == "white" else -1.0
+    ranked = []
+    for move, (start, end), maximize in plans:
+        leaf = scores[start:end] * sign
+        o, t, is_capture = move
+        ranked.append({
+            "from": o, "to": t, "capture": is_capture,
+            "score": round(float(leaf.max() if maximize else leaf.min()), 1),
+        })
+    ranked.sort(key=lambda m: -m["score"])
+    static = float(scores[static_span[0]] * sign)
+    return {
+        "turn": position[1],
+        "evaluation": ranked[0]["score"] if ranked else round(static, 1),
+        "static": round(static, 1),
+        "moves": ranked,
+    }
+
+
+def analyse_positions(positions: List[Position], depth: int = 1) -> List[dict]:
+    """Pontua os lances de várias posições com uma única avaliação vetorizada."""
+    batch = _Batch()
+    planned = [_plan(batch, position, depth) for position in positions]
+    scores = batch.evaluate()
+    return [_resolve(scores, p) for p in planned]
+
+
+def _square(value, name: str) -> dict:
+    """{"r", "c"} vindo do cliente -> casa válida do tabuleiro (ValueError vira 400 na rota)."""
+    if not isinstance(value, dict): raise ValueError(f"Invalid {name}")
+    r, c = value.get("r"), value.get("c")
+    # bool é subclasse de int, mas não é coordenada
+    if type(r) is not int or type(c) is not int or not (0 <= r < 8 and 0 <= c < 8):
+        raise ValueError(f"Invalid {name}")
+    return {"r": r, "c": c}
+
+
+def position_from_wire(board: Optional[list], turn: str = "white", chain_piece: Optional[dict] = None) -> Position:
+    if turn not in COLOR_BITS: raise ValueError(f"Invalid turn: {turn}")
+    if board is None:
+        decoded = initial_board()
+    else:
+        if len(board) != 8 or any(len(row) != 8 for row in board): raise ValueError("Board must be 8x8")
+        try:
+            decoded = board_from_wire(board)
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError("Invalid piece on board")
+    if chain_piece is not None:
+        chain_piece = _square(chain_piece, "chain_piece")
+        # A peça em cadeia tem que existir e ser de quem joga
+        if not decoded[chain_piece["r"] * 8 + chain_piece["c"]] & COLOR_BITS[turn]:
+            raise ValueError("chain_piece must be a piece of the side to move")
+    return decoded, turn, chain_piece
+
+
+def _same_square(a: dict, b: dict) -> bool:
+    return a.get("r") == b["r"] and a.get("c") == b["c"]
+
+
+def review_game(moves: List[dict], start: Position, depth: int = 1) -> dict:
+    """
+    Revisão pós-jogo: reproduz a lista de lances e avalia todas as posições de uma vez.
+    Cada lance recebe a pontuação do lance jogado, a do melhor e a perda entre eles.
+    """
+    if len(moves) > MAX_REVIEW_MOVES: raise ValueError(f"At most {MAX_REVIEW_MOVES} moves")
+    positions, played = [], []
+    position = start
+    for index, step in enumerate(moves):
+        if not isinstance(step, dict): raise ValueError(f"Invalid move at index {index}")
+        origin = _square(step.get("from"), f"'from' at index {index}")
+        target = _square(step.get("to"), f"'to' at index {index}")
+        legal = legal_moves(*position)
+        move = next((m for m in legal if _same_square(origin, m[0]) and _same_square(target, m[1])), None)
+        if move is None: raise ValueError(f"Illegal move at index {index}")
+        positions.append(position)
+        played.append(move)
+        position = play(position, move)
+
+    results = analyse_positions(positions, depth)
+    review = []
+    for index, (result, (o, t, _)) in enumerate(zip(results, played)):
+        score = next(m["score"] for m in result["moves"] if m["from"] == o and m["to"] == t)
+        loss = round(result["evaluation"] - score, 1)
+        label = next((name for limit, name in REVIEW_LABELS if loss <= limit), "blunder")
+        review.append({
+            "index": index, "turn": result["turn"], "from": o, "to": t,
+            "score": score, "best": result["moves"][0], "loss": loss, "label": label,
+        })
+    return {"moves": review, "final": {"turn": position[1], "over": _is_over(position[0])}}
+
+
+# -----------------------------
+# Dica durante a partida
+# -----------------------------
+
+async def send_hint(game_id: str, color: str):
+    """Melhores lances para quem pediu, só na própria vez e fora de torneios."""
+    game = game_manager.active_games.get(game_id)
+    if not game or color not in COLOR_BITS or game.tournament_id or game.turn != color: return
+    ws = game.player(color).ws
+    if not ws: return
+    # Fotografia do estado: a busca roda numa thread enquanto a partida pode seguir
+    position = (bytearray(game.board), game.turn, game.chain_piece)
+    try:
+        result = (await asyncio.to_thread(analyse_positions, [position], MAX_DEPTH))[0]
+    except Exception as e:
+        logger.error(f"Hint error: {e}")
+        return
+    try: await ws.send_json({"type": "hint", "evaluation": result["evaluation"], "moves": result["moves"][:HINT_MOVES]})
+    except Exception: SEND_FAILURES.labels("game").inc()
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Optional, Tuple
+
+# -----------------------------
+# Configuração
+# -----------------------------
+MAX_AVATAR_BYTES = int(os.getenv("MAX_AVATAR_BYTES", 5 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+# Tamanhos fixos (lado em px) gerados para cada avatar
+THUMBNAIL_SIZES = (64, 128, 256)
+
+# Limite de pixels da imagem decodificada (proteção contra "decompression bombs")
+MAX_IMAGE_PIXELS = 40_000_000
+
+AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", 2))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+class AvatarTooLarge(Exception):
+    pass
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def stream_to_disk(source: BinaryIO, dest_dir: str, max_bytes: int = MAX_AVATAR_BYTES) -> Tuple[str, str]:
+    """
+    Copia o upload em blocos para um arquivo temporário calculando o SHA-256 no caminho.
+    Bloqueante: deve rodar fora do event loop. Retorna (caminho_temporário, hash_hex).
+    """
+    # Pasta criada só no primeiro upload (importar o módulo não toca no disco)
+    os.makedirs(dest_dir, exist_ok=True)
+    tmp_path = os.path.join(dest_dir, f".upload_{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk: break
+                written += len(chunk)
+                if written > max_bytes: raise AvatarTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        _silent_remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def make_thumbnails(src_path: str, dest_dir: str, digest: str) -> Dict[int, str]:
+    """
+    Gera as miniaturas quadradas em WEBP (executa no pool de processos).
+    Arquivos nomeados pelo hash do conteúdo: o mesmo upload nunca é reprocessado.
+    """
+    names = {size: f"{digest[:32]}_{size}.webp" for size in THUMBNAIL_SIZES}
+    if all(os.path.exists(os.path.join(dest_dir, n)) for n in names.values()):
+        return names
+
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+    try:
+        with Image.open(src_path) as img:
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            for size in sorted(THUMBNAIL_SIZES, reverse=True):
+                thumb = ImageOps.fit(img, (size, size), method=Image.LANCZOS)
+                final_path = os.path.join(dest_dir, names[size])
+                tmp_path = f"{final_path}.{uuid.uuid4().hex[:8]}.tmp"
+                thumb.save(tmp_path, "WEBP", quality=85, method=4)
+                # Rename atômico: leitores nunca veem um arquivo pela metade
+                os.replace(tmp_path, final_path)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e))
+    return names
+
+
+def _silent_remove(path: str):
+    try: os.remove(path)
+    except OSError: pass
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=AVATAR_WORKERS)
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _noop():
+    return None
+
+
+def prestart_process_pool():
+    """Sobe os processos do pool antes do primeiro upload (usado no warmup)."""
+    pool = get_process_pool()
+    for future in [pool.submit(_noop) for _ in range(AVATAR_WORKERS)]: future.result()
+
+
+async def save_avatar(source: BinaryIO, dest_dir: str) -> Dict[int, str]:
+    """Salva o upload e gera as miniaturas sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    tmp_path, digest = await loop.run_in_executor(None, stream_to_disk, source, dest_dir)
+    try:
+        return await loop.run_in_executor(get_process_pool(), make_thumbnails, tmp_path, dest_dir, digest)
+    finally:
+        await loop.run_in_executor(None, _silent_remove, tmp_path)
+
+
+def avatar_variant(user: dict, size: int, default: str) -> str:
+    """URL da miniatura de `size` px (ou o avatar salvo, para avatares padrão)."""
+    thumbs = user.get("avatar_thumbs") or {}
+    return thumbs.get(str(size)) or user.get("avatar") or default
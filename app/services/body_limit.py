@@ -0,0 +1,74 @@
+import os
+from typing import Dict, Optional
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from app.services.avatar_images import MAX_AVATAR_BYTES
+
+# -----------------------------
+# Configuração
+# -----------------------------
+# Corpos JSON da API são pequenos; rotas de upload têm limite próprio
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", 2 * 1024 * 1024))
+# Folga para os cabeçalhos/boundaries do multipart em volta do arquivo
+MULTIPART_OVERHEAD = 64 * 1024
+
+BODY_LIMITS: Dict[str, int] = {
+    "/api/upload-avatar": MAX_AVATAR_BYTES + MULTIPART_OVERHEAD,
+}
+
+
+class BodyTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body too large. Max size: {limit // 1024}KB")
+
+
+class BodySizeLimitMiddleware:
+    """
+    Middleware ASGI puro: limita o corpo das requisições ENQUANTO ele chega, antes de o
+    Starlette ler/gravar o multipart inteiro. Recusa pelo Content-Length quando ele é
+    declarado e, para corpos em chunks, interrompe a leitura ao passar do limite.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[str, int]] = None, default: int = MAX_REQUEST_BYTES):
+        self.app = app
+        self.limits = BODY_LIMITS if limits is None else limits
+        self.default = default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits.get(scope["path"], self.default)
+        declared = Headers(scope=scope).get("content-length")
+        if declared and declared.isdigit() and int(declared) > limit:
+            await self._reject(scope, receive, send, limit)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                # HTTPException: o FastAPI repassa (vira 413) em vez de tratar como corpo inválido
+                if received > limit: raise BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start": response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except BodyTooLarge:
+            if response_started: raise
+            await self._reject(scope, receive, send, limit)
+
+    async def _reject(self, scope, receive, send, limit: int):
+        error = BodyTooLarge(limit)
+        response = JSONResponse({"detail": error.detail}, status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)
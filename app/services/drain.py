@@ -0,0 +1,215 @@
+"""
+Drenagem no SIGTERM (restart/deploy) sem derrubar as partidas em andamento.
+
+O lifespan instala `drain_manager` na frente do handler de SIGTERM do uvicorn. Ao receber o
+sinal, antes de o uvicorn fechar as conexões:
+  1. novas conexões WebSocket recebem um aviso de reconexão e são fechadas (1012)
+  2. fila de matchmaking, chat e torneios recebem o aviso e são fechados na hora
+  3. as partidas param de aceitar lances e os lances em processamento terminam
+  4. cada partida é salva em `game_checkpoints`; o worker novo a recupera quando
+     um jogador reconecta (restore_game)
+  5. os jogadores recebem o aviso e são desconectados; o escritor de resultados é esvaziado
+Tudo isso tem prazo (DRAIN_DEADLINE); depois o handler original do uvicorn segue o desligamento.
+Um segundo SIGTERM pula a drenagem.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import signal
+import threading
+from datetime import datetime
+from typing import Optional
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+from pymongo import ASCENDING, ReplaceOne
+from app.db import db
+from app.services.game_manager import game_manager
+from app.services.game_session import GameSession
+from app.services.liveness import liveness, SEND_TIMEOUT
+from app.services.result_writer import result_writer
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Configuração
+# -----------------------------
+DRAIN_DEADLINE = float(os.getenv("DRAIN_DEADLINE", 20))
+# Clientes esperam isso (+ jitter) antes de reconectar, para não chegarem todos juntos
+RECONNECT_AFTER_MS = int(os.getenv("DRAIN_RECONNECT_AFTER_MS", 2000))
+RECONNECT_JITTER_MS = int(os.getenv("DRAIN_RECONNECT_JITTER_MS", 3000))
+# Checkpoints não recuperados somem sozinhos (índice TTL)
+CHECKPOINT_TTL = int(os.getenv("GAME_CHECKPOINT_TTL", 600))
+CHECKPOINTS = "game_checkpoints"
+
+# "Service Restart" (RFC 6455): o cliente deve tentar de novo
+WS_CLOSE_SERVICE_RESTART = 1012
+
+
+# -----------------------------
+# Checkpoints de partidas
+# -----------------------------
+
+def checkpoint_document(game: GameSession, now: datetime) -> dict:
+    return {
+        "_id": game.game_id,
+        "board": bytes(game.board),
+        "turn": game.turn,
+        "chain_piece": game.chain_piece,
+        "last_move_from": game.last_move_from,
+        "last_move_to": game.last_move_to,
+        "start_time": game.start_time,
+        "tournament_id": game.tournament_id,
+        "players": {color: {
+            "user_id": slot.user_id, "name": slot.name, "email": slot.email, "joined": slot.joined,
+        } for color, slot in game.slots()},
+        "saved_at": now,
+    }
+
+
+def session_from_checkpoint(doc: dict) -> GameSession:
+    game = GameSession(doc["_id"], bytearray(doc["board"]), doc["turn"], doc.get("chain_piece"),
+                       tournament_id=doc.get("tournament_id"))
+    game.last_move_from = doc.get("last_move_from")
+    game.last_move_to = doc.get("last_move_to")
+    game.last_sound = None
+    game.start_time = doc.get("start_time") or game.start_time
+    for color, slot in game.slots():
+        player = doc.get("players", {}).get(color, {})
+        slot.user_id = player.get("user_id")
+        slot.name = player.get("name", slot.name)
+        slot.email = player.get("email", "")
+        slot.joined = player.get("joined", False)
+    return game
+
+
+def ensure_indexes():
+    db[CHECKPOINTS].create_index([("saved_at", ASCENDING)], expireAfterSeconds=CHECKPOINT_TTL)
+
+
+def save_checkpoints(docs: list):
+    if docs: db[CHECKPOINTS].bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs], ordered=False)
+
+
+async def restore_game(game_id: str) -> bool:
+    """Recupera (e consome) o checkpoint de uma partida desconhecida neste worker."""
+    if game_id in game_manager.active_games: return True
+    try:
+        doc = await asyncio.to_thread(db[CHECKPOINTS].find_one_and_delete, {"_id": game_id})
+    except Exception as e:
+        logger.error(f"Could not restore game {game_id}: {e}")
+        return False
+    if doc is None: return False
+    # Outra conexão pode ter restaurado enquanto esperávamos o Mongo
+    if game_id not in game_manager.active_games:
+        game_manager.active_games[game_id] = session_from_checkpoint(doc)
+        logger.info(f"Game {game_id} restored from checkpoint")
+    return True
+
+
+# -----------------------------
+# Drenagem
+# -----------------------------
+
+def reconnect_hint() -> str:
+    return json.dumps({
+        "type": "reconnect", "reason": "restart",
+        "retry_after_ms": RECONNECT_AFTER_MS + random.randint(0, RECONNECT_JITTER_MS),
+    })
+
+
+async def send_reconnect_hint(websocket: WebSocket):
+    """Aviso de reconexão + fechamento 1012. Funciona antes ou depois do accept."""
+    try:
+        if websocket.client_state == WebSocketState.CONNECTING: await websocket.accept()
+        await asyncio.wait_for(websocket.send_text(reconnect_hint()), SEND_TIMEOUT)
+        await asyncio.wait_for(websocket.close(code=WS_CLOSE_SERVICE_RESTART), SEND_TIMEOUT)
+    except Exception:
+        pass
+
+
+class DrainManager:
+    def __init__(self, deadline: float = DRAIN_DEADLINE):
+        self.deadline = deadline
+        self.draining = False
+        self._previous = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- SINAL ---
+    def install(self):
+        """
+        Chamado no startup do lifespan, quando o uvicorn já instalou o handler dele. Exige
+        uvicorn >= 0.29: antes disso o SIGTERM ia por loop.add_signal_handler, que passa na
+        frente deste handler e começa o desligamento sem esperar a drenagem.
+        """
+        # signal.signal só funciona na thread principal (uvicorn numa thread, TestClient...):
+        # aí quem embute o servidor cuida do desligamento e a drenagem fica desligada
+        if threading.current_thread() is not threading.main_thread():
+            logger.info("Not on the main thread: SIGTERM drain disabled")
+            return
+        self._loop = asyncio.get_running_loop()
+        self._previous = signal.signal(signal.SIGTERM, self._on_sigterm)
+
+    def uninstall(self):
+        if self._previous is not None and signal.getsignal(signal.SIGTERM) == self._on_sigterm:
+            signal.signal(signal.SIGTERM, self._previous)
+
+    def _on_sigterm(self, signum, frame):
+        if self.draining:
+            self._chain(signum, frame)
+            return
+        self.draining = True
+        logger.info("SIGTERM received: draining")
+        self._loop.call_soon_threadsafe(self._start)
+
+    def _start(self):
+        self._task = self._loop.create_task(self._drain_then_exit())
+
+    def _chain(self, signum, frame=None):
+        previous = self._previous
+        if callable(previous): previous(signum, frame)
+        else:
+            # Sem handler anterior do uvicorn (ex.: testes): comportamento padrão
+            signal.signal(signum, signal.SIG_DFL)
+            signal.raise_signal(signum)
+
+    async def _drain_then_exit(self):
+        try:
+            await asyncio.wait_for(self.drain(), self.deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain deadline ({self.deadline:.0f}s) reached")
+        except Exception as e:
+            logger.error(f"Drain error: {e}")
+        finally:
+            self._chain(signal.SIGTERM)
+
+    # --- DRENAGEM ---
+    async def _hint_endpoint_peers(self, predicate):
+        sockets = [ws for ws, peer in list(liveness.peers.items()) if predicate(peer.endpoint)]
+        for ws in sockets: liveness.unregister(ws)
+        await asyncio.gather(*(send_reconnect_hint(ws) for ws in sockets))
+        return len(sockets)
+
+    async def drain(self):
+        self.draining = True
+        # Fila, chat e torneios não têm estado a salvar: reconectam já (no worker novo)
+        others = await self._hint_endpoint_peers(lambda endpoint: endpoint != "game")
+
+        # Lances em andamento terminam; novos são ignorados (o cliente ressincroniza ao reconectar)
+        await game_manager.freeze()
+
+        games = list(game_manager.active_games.values())
+        now = datetime.utcnow()
+        try:
+            await asyncio.to_thread(save_checkpoints, [checkpoint_document(g, now) for g in games])
+        except Exception as e:
+            logger.error(f"Could not checkpoint games: {e}")
+
+        players = await self._hint_endpoint_peers(lambda endpoint: endpoint == "game")
+        await result_writer.flush()
+        logger.info(f"Drained: {len(games)} games checkpointed, {players} players and {others} other sockets notified")
+
+
+drain_manager = DrainManager()
@@ -0,0 +1,68 @@
+import hashlib
+from typing import Iterable, Optional
+from fastapi import Request, Response
+from pymongo import UpdateOne
+from app.db import db
+
+# -----------------------------
+# ETags por versão (GET condicional)
+# -----------------------------
+# O ETag vem de um número de versão, não do corpo: dá para responder 304 sem
+# montar a resposta. Versões usadas:
+#   /me            -> users.updated_at (toda escrita no usuário atualiza o campo)
+#   /ranking       -> geração do leaderboard (documento "leaderboard" em meta)
+#   /my-recordings -> users.recordings_version (incrementado quando a lista muda)
+
+CACHE_ME = "private, no-cache"
+CACHE_RANKING = "private, max-age=15"
+CACHE_RECORDINGS = "private, no-cache"
+
+LEADERBOARD_META_ID = "leaderboard"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    # Fraco: o corpo pode sair comprimido ou não (mesma representação semântica)
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """304 pronto se o If-None-Match do cliente bate com o ETag atual (comparação fraca)."""
+    header = request.headers.get("if-none-match")
+    if not header: return None
+    if header.strip() != "*" and _opaque(etag) not in {_opaque(t) for t in header.split(",")}: return None
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def set_validators(response: Response, etag: str, cache_control: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+# -----------------------------
+# Versões
+# -----------------------------
+
+def leaderboard_generation() -> int:
+    doc = db["meta"].find_one({"_id": LEADERBOARD_META_ID}, {"generation": 1})
+    return doc.get("generation", 0) if doc else 0
+
+
+def bump_leaderboard():
+    """Chamado em toda escrita que pode mudar o ranking (placar, nome, avatar, novo usuário)."""
+    db["meta"].update_one({"_id": LEADERBOARD_META_ID}, {"$inc": {"generation": 1}}, upsert=True)
+
+
+def bump_leaderboard_op() -> UpdateOne:
+    """Mesmo incremento, como operação para bulk_write (escritor de resultados)."""
+    return UpdateOne({"_id": LEADERBOARD_META_ID}, {"$inc": {"generation": 1}}, upsert=True)
+
+
+def bump_recordings_version(user_ids: Iterable):
+    ids = list({uid for uid in user_ids if uid is not None})
+    if ids: db["users"].update_many({"_id": {"$in": ids}}, {"$inc": {"recordings_version": 1}})
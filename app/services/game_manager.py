@@ -1,171 +1,222 @@
+import asyncio
+import time
 import uuid
 import json
 import logging
-from typing import List, Dict, Any
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from fastapi import WebSocket
-from app.db import db
-from bson import ObjectId
 from datetime import datetime
+from app.services.metrics import ACTIVE_GAMES, QUEUE_DEPTH, MOVES, SEND_FAILURES
+from app.services.user_stats import game_result_ops, game_document
+from app.services.result_writer import result_writer
+from app.services.liveness import liveness, PAIRING_MAX_SILENCE
+from app.services.game_session import (
+    GameSession, board_to_wire, initial_board, COLOR_BITS, OPPONENT, EMPTY, WHITE, BLACK, KING
+)
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+# Código de fechamento para quem tenta ocupar o lugar de outro jogador
+WS_CLOSE_WRONG_PLAYER = 4003
+
+# Chamado com (partida, vencedor, motivo) depois que a partida sai de active_games
+GameOverListener = Callable[[GameSession, str, str], Awaitable[None]]
+
 class GameManager:
     def __init__(self):
         self.waiting_queue: List[WebSocket] = []
-        self.active_games: Dict[str, Dict[str, Any]] = {}
+        self.active_games: Dict[str, GameSession] = {}
+        self.game_over_listeners: List[GameOverListener] = []
+        # Drenagem (SIGTERM): congelado, nenhum lance novo é aplicado
+        self.frozen = False
+        self.moves_in_flight = 0
+
+    def add_game_over_listener(self, listener: GameOverListener):
+        self.game_over_listeners.append(listener)
 
     # --- MATCHMAKING ---
     async def add_to_queue(self, websocket: WebSocket):
         self.waiting_queue.append(websocket)
-        if len(self.waiting_queue) >= 2:
-            p1 = self.waiting_queue.pop(0)
-            p2 = self.waiting_queue.pop(0)
-            await self.create_match(p1, p2)
+        while len(self.waiting_queue) >= 2:
+            pair = self.waiting_queue[:2]
+            # Quem não respondeu ao último ping não é pareado: sai da fila e é fechado
+            stale = [ws for ws in pair if not liveness.is_alive(ws, PAIRING_MAX_SILENCE)]
+            if stale:
+                for ws in stale:
+                    self.remove_from_queue(ws)
+                    await liveness.evict(ws)
+                continue
+            del self.waiting_queue[:2]
+            await self.create_match(*pair)
 
     def remove_from_queue(self, websocket: WebSocket):
         if websocket in self.waiting_queue: self.waiting_queue.remove(websocket)
 
+    def create_game(self, tournament_id: Optional[str] = None,
+                    players: Optional[Dict[str, Tuple[str, str]]] = None) -> GameSession:
+        """
+        Registra uma partida nova. `players` ({cor: (user_id, nome)}) reserva os lugares:
+        só esses usuários conseguem se conectar nessas cores (partidas de torneio).
+        """
+        game = GameSession(str(uuid.uuid4()), tournament_id=tournament_id)
+        for color, (user_id, name) in (players or {}).items():
+            slot = game.player(color)
+            slot.user_id, slot.name = user_id, name
+        self.active_games[game.game_id] = game
+        return game
+
     async def create_match(self, p1: WebSocket, p2: WebSocket):
-        game_id = str(uuid.uuid4())
-        self.active_games[game_id] = {
-            "white_ws": None, "black_ws": None,
-            "white_user_id": None, "black_user_id": None,
-            "white_name": "Aguardando...", "white_email": "",
-            "black_name": "Aguardando...", "black_email": "",
-            "turn": "white",
-            "board": self._get_initial_board(),
-            "chain_piece": None,
-            "last_move_from": None,
-            "last_move_to": None,
-            "last_sound": "start", # Novo campo para som
-            "start_time": datetime.utcnow()
-        }
+        game_id = self.create_game().game_id
         for s, c in [(p1, 'white'), (p2, 'black')]:
             try:
                 await s.send_json({"type": "match_found", "game_id": game_id, "color": c})
                 await s.close()
-            except: pass
+            except Exception: SEND_FAILURES.labels("matchmaking").inc()
 
     async def connect_player(self, game_id: str, websocket: WebSocket, color: str, player_data: dict):
-        if game_id in self.active_games:
-            game = self.active_games[game_id]
-            game[f"{color}_ws"] = websocket
-            if player_data:
-                game[f"{color}_user_id"] = player_data.get("id")
-                game[f"{color}_name"] = player_data.get("name", "Jogador")
-                game[f"{color}_email"] = player_data.get("email", "")
-            await self.broadcast_game_state(game_id)
-        else: await websocket.close(code=4000)
-
-    async def disconnect_player(self, game_id: str, color: str):
-        if game_id in self.active_games:
-            if f"{color}_ws" in self.active_games[game_id]:
-                self.active_games[game_id][f"{color}_ws"] = None
+        game = self.active_games.get(game_id)
+        if game is None or color not in COLOR_BITS:
+            await websocket.close(code=4000)
+            return
+        slot = game.player(color)
+        # Lugar reservado (torneio) ou já ocupado por outro usuário.
+        # Em torneio só vale o usuário autenticado pelo cookie: o ?userId= da URL é ignorado
+        if slot.user_id and player_data:
+            claimed = player_data.get("id")
+            if game.tournament_id and not player_data.get("authenticated"): claimed = None
+            if claimed != slot.user_id:
+                await websocket.close(code=WS_CLOSE_WRONG_PLAYER)
+                return
+        slot.ws = websocket
+        slot.joined = True
+        slot.left_at = None
+        if player_data:
+            slot.user_id = player_data.get("id")
+            slot.name = player_data.get("name", "Jogador")
+            slot.email = player_data.get("email", "")
+        await self.broadcast_game_state(game_id)
+
+    async def disconnect_player(self, game_id: str, color: str, websocket: WebSocket = None):
+        game = self.active_games.get(game_id)
+        if not game or color not in COLOR_BITS: return
+        slot = game.player(color)
+        # Uma reconexão pode já ter substituído o socket antigo
+        if websocket is None or slot.ws is websocket:
+            slot.ws = None
+            slot.left_at = time.monotonic()
 
     async def forward_message(self, game_id: str, message: dict, sender_color: str):
         game = self.active_games.get(game_id)
         if not game: return
         if message.get("type") == "chat":
-            sender_name = game.get(f"{sender_color}_name", "Oponente")
-            message["sender"] = sender_name
-        opponent_color = "black" if sender_color == "white" else "white"
-        ws = game.get(f"{opponent_color}_ws")
+            message["sender"] = game.player(sender_color).name
+        ws = game.player(OPPONENT[sender_color]).ws
         if ws:
             try: await ws.send_json(message)
-            except: pass
+            except Exception: SEND_FAILURES.labels("game").inc()
 
     # --- ESTADO DO JOGO (COM SOM) ---
-    def _build_state_msg(self, game):
+    def _build_state_msg(self, game: GameSession):
         return {
             "type": "update", 
-            "board": game["board"], 
-            "turn": game["turn"], 
-            "chain_piece": game["chain_piece"],
-            "last_move_from": game["last_move_from"], 
-            "last_move_to": game["last_move_to"],
-            "sound": game.get("last_sound", None), # Envia som para o frontend
+            "board": board_to_wire(game.board), 
+            "turn": game.turn, 
+            "chain_piece": game.chain_piece,
+            "last_move_from": game.last_move_from, 
+            "last_move_to": game.last_move_to,
+            "sound": game.last_sound, # Envia som para o frontend
             "players": {
-                "white": { "name": game["white_name"], "email": game.get("white_email", ""), "id": game["white_user_id"] },
-                "black": { "name": game["black_name"], "email": game.get("black_email", ""), "id": game["black_user_id"] }
+                "white": game.white.to_wire(),
+                "black": game.black.to_wire()
             }
         }
 
-    async def send_individual_update(self, websocket: WebSocket, game: dict):
+    async def send_individual_update(self, websocket: WebSocket, game: GameSession):
         try: await websocket.send_json(self._build_state_msg(game))
-        except: pass
+        except Exception: SEND_FAILURES.labels("game").inc()
 
     async def broadcast_game_state(self, game_id: str):
         game = self.active_games.get(game_id)
         if not game: return
-        msg = self._build_state_msg(game)
+        # Serializa uma vez para os dois jogadores (mesmo formato do send_json)
+        msg = json.dumps(self._build_state_msg(game), separators=(",", ":"), ensure_ascii=False)
         
         # Limpa o som após o envio para não repetir em reconexões
-        game["last_sound"] = None 
+        game.last_sound = None 
         
-        for c in ["white", "black"]:
-            ws = game.get(f"{c}_ws")
-            if ws: 
-                try: await ws.send_json(msg)
-                except: pass
+        for _, slot in game.slots():
+            if slot.ws: 
+                try: await slot.ws.send_text(msg)
+                except Exception: SEND_FAILURES.labels("game").inc()
 
     # --- FINALIZAÇÃO ---
     async def player_surrender(self, game_id: str, loser_color: str):
+        if self.frozen: return
         game = self.active_games.get(game_id)
-        if not game: return
-        winner_color = "black" if loser_color == "white" else "white"
-        await self.broadcast_game_over(game_id, winner_color, "surrender")
+        if not game or loser_color not in COLOR_BITS: return
+        await self.broadcast_game_over(game_id, OPPONENT[loser_color], "surrender")
 
     async def broadcast_game_over(self, game_id: str, winner: str, reason: str):
         game = self.active_games.get(game_id)
         if not game: return
-        self._update_player_stats(game, winner)
         msg = {"type": "game_over", "winner": winner, "reason": reason}
-        for c in ["white", "black"]:
-            ws = game.get(f"{c}_ws")
-            if ws: 
-                try: await ws.send_json(msg); await ws.close()
-                except: pass
+        for _, slot in game.slots():
+            if slot.ws: 
+                try: await slot.ws.send_json(msg); await slot.ws.close()
+                except Exception: SEND_FAILURES.labels("game").inc()
         if game_id in self.active_games:
             del self.active_games[game_id]
+        self._record_result(game, winner, reason)
+        for listener in self.game_over_listeners:
+            try: await listener(game, winner, reason)
+            except Exception as e: logger.error(f"Game over listener error: {e}")
 
-    def _update_player_stats(self, game, winner_color):
+    def _record_result(self, game: GameSession, winner_color: str, reason: str):
+        # Histórico + estatísticas vão para o escritor em lote (bulk_write numa thread)
         try:
-            white_id = game.get("white_user_id")
-            black_id = game.get("black_user_id")
-            if not white_id or not black_id or len(str(white_id)) < 10: return
-            white_oid, black_oid = ObjectId(white_id), ObjectId(black_id)
-            if winner_color == "white":
-                db["users"].update_one({"_id": white_oid}, {"$inc": {"wins": 1, "totalGames": 1}})
-                db["users"].update_one({"_id": black_oid}, {"$inc": {"losses": 1, "totalGames": 1}})
-            elif winner_color == "black":
-                db["users"].update_one({"_id": black_oid}, {"$inc": {"wins": 1, "totalGames": 1}})
-                db["users"].update_one({"_id": white_oid}, {"$inc": {"losses": 1, "totalGames": 1}})
-            elif winner_color == "draw":
-                db["users"].update_one({"_id": white_oid}, {"$inc": {"draws": 1, "totalGames": 1}})
-                db["users"].update_one({"_id": black_oid}, {"$inc": {"draws": 1, "totalGames": 1}})
+            result_writer.submit(game_result_ops(game_document(game, winner_color, reason, datetime.utcnow())))
         except Exception as e: logger.error(f"Stats error: {e}")
 
     # --- PROCESSAMENTO DE MOVIMENTO ---
+    async def freeze(self):
+        """Para de aceitar lances e espera os que já estão em processamento (antes do checkpoint)."""
+        self.frozen = True
+        while self.moves_in_flight: await asyncio.sleep(0.01)
+
     async def process_move(self, game_id: str, move_data: dict, player_color: str):
+        if self.frozen: return
+        self.moves_in_flight += 1
+        try:
+            await self._process_move(game_id, move_data, player_color)
+        finally:
+            self.moves_in_flight -= 1
+
+    async def _process_move(self, game_id: str, move_data: dict, player_color: str):
         try:
             game = self.active_games.get(game_id)
-            if not game: return
+            if not game or player_color not in COLOR_BITS: return
 
             if move_data.get("type") == "request_state":
-                ws = game.get(f"{player_color}_ws")
+                ws = game.player(player_color).ws
                 if ws: await self.send_individual_update(ws, game)
                 return
 
-            if game["turn"] != player_color: return 
+            if game.turn != player_color:
+                MOVES.labels("out_of_turn").inc()
+                return 
 
             origin, target = move_data["from"], move_data["to"]
-            board = game["board"]
+            board = game.board
 
             is_valid, is_capture = self._validate_move_logic(game, origin, target, player_color)
             
+            MOVES.labels("valid" if is_valid else "invalid").inc()
             if not is_valid:
-                await self.broadcast_game_state(game_id)
+                # Só quem errou precisa ressincronizar; o oponente não viu mudança alguma
+                ws = game.player(player_color).ws
+                if ws: await self.send_individual_update(ws, game)
                 return
 
             # Aplica movimento e verifica promoção
@@ -176,20 +227,20 @@ class GameManager:
             if is_promotion: sound_event = "promote" # Promoção tem prioridade de som visual
             elif is_capture: sound_event = "capture"
             
-            game["last_sound"] = sound_event # Salva para o broadcast
-            game["last_move_from"] = origin
-            game["last_move_to"] = target
-            game["chain_piece"] = None 
+            game.last_sound = sound_event # Salva para o broadcast
+            game.last_move_from = origin
+            game.last_move_to = target
+            game.chain_piece = None 
             turn_ends = True
 
             if is_capture:
                 if self._can_capture_from(board, target, player_color):
-                    game["chain_piece"] = target
+                    game.chain_piece = target
                     turn_ends = False
             
             if turn_ends:
-                game["turn"] = "black" if game["turn"] == "white" else "white"
-                opponent_color = game["turn"] 
+                game.turn = OPPONENT[game.turn]
+                opponent_color = game.turn 
                 if await self._check_win_conditions(board, player_color, opponent_color, game_id):
                     return
 
@@ -200,30 +251,34 @@ class GameManager:
             await self.broadcast_game_state(game_id)
 
     # --- REGRAS DO JOGO (CORRIGIDAS) ---
+    # Tabuleiro em bytearray: casa (r, c) = board[r * 8 + c]
 
     def _is_path_clear(self, board, r1, c1, r2, c2):
         dr = 1 if r2 > r1 else -1
         dc = 1 if c2 > c1 else -1
         r, c = r1 + dr, c1 + dc
         while r != r2:
-            if board[r][c] is not None: return False
+            if board[r * 8 + c]: return False
             r += dr
             c += dc
         return True
 
     def _validate_move_logic(self, game, o, t, color):
-        board, chain_piece = game["board"], game["chain_piece"]
+        board, chain_piece = game.board, game.chain_piece
         
-        if not (0 <= t['r'] < 8 and 0 <= t['c'] < 8) or board[t['r']][t['c']]: return False, False
-        piece = board[o['r']][o['c']]
-        if not piece or piece['color'] != color: return False, False
+        # Índices fora do tabuleiro dariam a volta no bytearray: checa origem e destino
+        if not (0 <= o['r'] < 8 and 0 <= o['c'] < 8): return False, False
+        if not (0 <= t['r'] < 8 and 0 <= t['c'] < 8) or board[t['r'] * 8 + t['c']]: return False, False
+        own = COLOR_BITS[color]
+        piece = board[o['r'] * 8 + o['c']]
+        if not piece & own: return False, False
         if chain_piece and (o['r'] != chain_piece['r'] or o['c'] != chain_piece['c']): return False, False
 
         row_diff = t['r'] - o['r']
         col_diff = t['c'] - o['c']
         if abs(row_diff) != abs(col_diff): return False, False
 
-        is_king = piece.get('king', False)
+        is_king = piece & KING
         forward = -1 if color == 'white' else 1
 
         has_capture_available = self._has_any_capture(board, color)
@@ -238,6 +293,8 @@ class GameManager:
 
         # MOVIMENTO DE CAPTURA (DAMA VOADORA)
         # Precisa percorrer o caminho, encontrar 1 inimigo e o resto vazio
+        # Peça comum só captura por salto curto (inimiga adjacente, pouso logo depois)
+        if not is_king and abs(row_diff) != 2: return False, False
         if abs(row_diff) >= 2:
             dr = 1 if row_diff > 0 else -1
             dc = 1 if col_diff > 0 else -1
@@ -246,9 +303,9 @@ class GameManager:
             enemy_found = False
             
             while r != t['r']:
-                p = board[r][c]
+                p = board[r * 8 + c]
                 if p:
-                    if p['color'] == color: return False, False # Bloqueado por amiga
+                    if p & own: return False, False # Bloqueado por amiga
                     if enemy_found: return False, False # Já pulou um inimigo
                     enemy_found = True
                 r += dr
@@ -259,7 +316,8 @@ class GameManager:
         return False, False
 
     def _apply_move_on_board(self, board, o, t, is_capture):
-        p = board[o['r']][o['c']]
+        origin, dest = o['r'] * 8 + o['c'], t['r'] * 8 + t['c']
+        p = board[origin]
         promoted = False
         
         if is_capture:
@@ -267,41 +325,40 @@ class GameManager:
             dc = 1 if t['c'] > o['c'] else -1
             r, c = o['r'] + dr, o['c'] + dc
             while r != t['r']:
-                if board[r][c]:
-                    board[r][c] = None
+                if board[r * 8 + c]:
+                    board[r * 8 + c] = EMPTY
                     break
                 r += dr
                 c += dc
         
-        board[o['r']][o['c']] = None
-        board[t['r']][t['c']] = p
+        board[origin] = EMPTY
         
-        if (p['color']=='white' and t['r']==0) or (p['color']=='black' and t['r']==7): 
-            if not p.get('king'): # Só marca promoção se não era rei antes
-                p['king'] = True
+        if (p & WHITE and t['r'] == 0) or (p & BLACK and t['r'] == 7): 
+            if not p & KING: # Só marca promoção se não era rei antes
+                p |= KING
                 promoted = True
-                
+
+        board[dest] = p
         return promoted
 
     def _can_capture_from(self, board, pos, color):
         r, c = pos['r'], pos['c']
-        piece = board[r][c]
+        piece = board[r * 8 + c]
         if not piece: return False
+        own = COLOR_BITS[color]
         
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        
-        if piece.get('king'):
+        if piece & KING:
             # DAMA VOADORA: Varre as diagonais
-            for dr, dc in directions:
+            for dr, dc in DIRECTIONS:
                 ir, ic = r + dr, c + dc
                 while 0 <= ir < 8 and 0 <= ic < 8:
-                    target = board[ir][ic]
+                    target = board[ir * 8 + ic]
                     if target:
                         # Se achou peça inimiga
-                        if target['color'] != color:
+                        if not target & own:
                             # Verifica se a casa APÓS a inimiga está vazia
                             jr, jc = ir + dr, ic + dc
-                            if 0 <= jr < 8 and 0 <= jc < 8 and not board[jr][jc]:
+                            if 0 <= jr < 8 and 0 <= jc < 8 and not board[jr * 8 + jc]:
                                 return True
                         # Se achou qualquer peça (amiga ou inimiga), para de olhar nesta direção
                         break
@@ -310,35 +367,31 @@ class GameManager:
             return False
         else:
             # PEÇA COMUM: Captura adjacente (distância 2)
-            for dr, dc in directions:
+            for dr, dc in DIRECTIONS:
                 tr, tc = r + dr*2, c + dc*2
-                mr, mc = r + dr, c + dc
-                if 0 <= tr < 8 and 0 <= tc < 8 and not board[tr][tc]:
-                    mid = board[mr][mc]
-                    if mid and mid['color'] != color: return True
+                if 0 <= tr < 8 and 0 <= tc < 8 and not board[tr * 8 + tc]:
+                    mid = board[(r + dr) * 8 + c + dc]
+                    if mid and not mid & own: return True
             return False
 
     def _has_any_capture(self, board, color):
-        for r in range(8):
-            for c in range(8):
-                piece = board[r][c]
-                if piece and piece['color'] == color and self._can_capture_from(board, {'r': r, 'c': c}, color):
-                    return True
+        own = COLOR_BITS[color]
+        for i, piece in enumerate(board):
+            if piece & own and self._can_capture_from(board, {'r': i >> 3, 'c': i & 7}, color):
+                return True
         return False
 
-    def _check_win_conditions(self, board, current_player_color, opponent_color, game_id):
-        opponent_pieces = sum(1 for row in board for piece in row if piece and piece['color'] == opponent_color)
-        if opponent_pieces == 0:
-            return self.broadcast_game_over(game_id, current_player_color, "annihilation")
+    async def _check_win_conditions(self, board, current_player_color, opponent_color, game_id):
+        opponent = COLOR_BITS[opponent_color]
+        if not any(piece & opponent for piece in board):
+            await self.broadcast_game_over(game_id, current_player_color, "annihilation")
+            return True
         return False 
 
     def _get_initial_board(self):
-        b = [[None]*8 for _ in range(8)]
-        for r in range(8):
-            for c in range(8):
-                if (r+c)%2==1:
-                    if r<3: b[r][c]={"color":"black","king":False}
-                    elif r>4: b[r][c]={"color":"white","king":False}
-        return b
-
-game_manager = GameManager()
\ No newline at end of file
+        return initial_board()
+
+game_manager = GameManager()
+
+ACTIVE_GAMES.set_function(lambda: len(game_manager.active_games))
+QUEUE_DEPTH.set_function(lambda: len(game_manager.waiting_queue))
@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import Optional
+
+# -----------------------------
+# Representação compacta do tabuleiro
+# -----------------------------
+# bytearray de 64 casas (índice r * 8 + c), um byte por casa:
+# bit de cor (WHITE/BLACK) + bit KING. 0 = casa vazia.
+EMPTY, WHITE, BLACK, KING = 0, 1, 2, 4
+COLOR_BITS = {"white": WHITE, "black": BLACK}
+OPPONENT = {"white": "black", "black": "white"}
+
+# Células no formato do cliente; compartilhadas entre jogos (só são serializadas, nunca alteradas)
+WIRE_CELLS = {
+    EMPTY: None,
+    WHITE: {"color": "white", "king": False},
+    BLACK: {"color": "black", "king": False},
+    WHITE | KING: {"color": "white", "king": True},
+    BLACK | KING: {"color": "black", "king": True},
+}
+# Indexado pelo byte da casa: evita o hash de dict na conversão
+_WIRE_LOOKUP = tuple(WIRE_CELLS.get(code) for code in range(8))
+
+
+def initial_board() -> bytearray:
+    board = bytearray(64)
+    for r in range(8):
+        for c in range(8):
+            if (r + c) % 2 == 1:
+                if r < 3: board[r * 8 + c] = BLACK
+                elif r > 4: board[r * 8 + c] = WHITE
+    return board
+
+
+def board_to_wire(board: bytearray) -> list:
+    """Matriz 8x8 de {"color", "king"} / None, como o frontend espera."""
+    cells = [_WIRE_LOOKUP[p] for p in board]
+    return [cells[i:i + 8] for i in range(0, 64, 8)]
+
+
+def board_from_wire(rows: list) -> bytearray:
+    board = bytearray(64)
+    for r, row in enumerate(rows):
+        for c, piece in enumerate(row):
+            if piece: board[r * 8 + c] = COLOR_BITS[piece["color"]] | (KING if piece.get("king") else 0)
+    return board
+
+
+class PlayerSlot:
+    __slots__ = ("ws", "user_id", "name", "email", "joined", "left_at")
+
+    def __init__(self):
+        self.ws = None
+        self.user_id: Optional[str] = None
+        self.name = "Aguardando..."
+        self.email = ""
+        # Já conectou alguma vez (no torneio separa W.O. de abandono)
+        self.joined = False
+        # time.monotonic() de quando o socket caiu (None enquanto conectado ou antes de entrar)
+        self.left_at: Optional[float] = None
+
+    def to_wire(self) -> dict:
+        return {"name": self.name, "email": self.email, "id": self.user_id}
+
+
+class GameSession:
+    """Estado de uma partida em memória. Sem __dict__: poucas centenas de bytes por jogo."""
+
+    __slots__ = (
+        "game_id", "white", "black", "turn", "board", "chain_piece",
+        "last_move_from", "last_move_to", "last_sound", "start_time", "tournament_id",
+    )
+
+    def __init__(self, game_id: str, board: Optional[bytearray] = None, turn: str = "white", chain_piece=None,
+                 tournament_id: Optional[str] = None):
+        self.game_id = game_id
+        self.white = PlayerSlot()
+        self.black = PlayerSlot()
+        self.turn = turn
+        self.board = board if board is not None else initial_board()
+        self.chain_piece = chain_piece
+        self.last_move_from = None
+        self.last_move_to = None
+        self.last_sound = "start"
+        self.start_time = datetime.utcnow()
+        self.tournament_id = tournament_id
+
+    def player(self, color: str) -> PlayerSlot:
+        return self.white if color == "white" else self.black
+
+    def slots(self):
+        return (("white", self.white), ("black", self.black))
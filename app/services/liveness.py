@@ -0,0 +1,138 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Union
+from fastapi import WebSocket
+from app.services.metrics import WS_RTT, WS_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Configuração
+# -----------------------------
+PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", 15))
+# Sem nenhuma mensagem do cliente por mais que isso, o peer é considerado morto
+PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", 45))
+# Um envio que não termina nesse prazo (buffer cheio, peer travado) conta como falha
+SEND_TIMEOUT = 5.0
+# Para parear na fila: o jogador precisa ter respondido ao último ping (intervalo + folga)
+PAIRING_MAX_SILENCE = PING_INTERVAL + 5
+
+WS_CLOSE_DEAD_PEER = 4408
+
+OnDead = Callable[[WebSocket], Union[Awaitable[None], None]]
+
+
+class Peer:
+    __slots__ = ("endpoint", "on_dead", "last_seen", "ping_id", "ping_sent_at")
+
+    def __init__(self, endpoint: str, on_dead: Optional[OnDead]):
+        self.endpoint = endpoint
+        self.on_dead = on_dead
+        self.last_seen = time.monotonic()
+        self.ping_id = 0
+        self.ping_sent_at = 0.0
+
+
+class LivenessManager:
+    """
+    Ping/pong em nível de aplicação para todos os WebSockets, numa única tarefa periódica.
+    O servidor envia {"type": "ping", "id": N}; o cliente responde {"type": "pong", "id": N}.
+    Qualquer mensagem recebida conta como sinal de vida. Peers calados além do timeout são
+    removidos dos registros (callback on_dead) e fechados.
+    """
+
+    def __init__(self, interval: float = PING_INTERVAL, timeout: float = PING_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.peers: Dict[WebSocket, Peer] = {}
+        self._sweep_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    # --- REGISTRO ---
+    def register(self, websocket: WebSocket, endpoint: str, on_dead: Optional[OnDead] = None):
+        self.peers[websocket] = Peer(endpoint, on_dead)
+
+    def unregister(self, websocket: WebSocket):
+        self.peers.pop(websocket, None)
+
+    def seen(self, websocket: WebSocket):
+        peer = self.peers.get(websocket)
+        if peer: peer.last_seen = time.monotonic()
+
+    def handle_pong(self, websocket: WebSocket, message) -> bool:
+        """True se a mensagem era um pong (o chamador não deve processá-la)."""
+        if not isinstance(message, dict) or message.get("type") != "pong": return False
+        peer = self.peers.get(websocket)
+        if peer:
+            peer.last_seen = time.monotonic()
+            if message.get("id") == peer.ping_id and peer.ping_sent_at:
+                WS_RTT.labels(peer.endpoint).observe(peer.last_seen - peer.ping_sent_at)
+                peer.ping_sent_at = 0.0
+        return True
+
+    def is_alive(self, websocket: WebSocket, max_silence: Optional[float] = None) -> bool:
+        peer = self.peers.get(websocket)
+        if peer is None: return False
+        return time.monotonic() - peer.last_seen <= (max_silence or self.timeout)
+
+    # --- VARREDURA ---
+    async def sweep(self):
+        self._sweep_id += 1
+        now = time.monotonic()
+        ping = json.dumps({"type": "ping", "id": self._sweep_id})
+        dead, alive = [], []
+        for ws, peer in list(self.peers.items()):
+            (dead if now - peer.last_seen > self.timeout else alive).append(ws)
+
+        results = await asyncio.gather(*(self._ping(ws, ping, now) for ws in alive))
+        dead += [ws for ws, ok in zip(alive, results) if not ok]
+        for ws in dead: await self.evict(ws)
+
+    async def _ping(self, websocket: WebSocket, ping: str, now: float) -> bool:
+        peer = self.peers.get(websocket)
+        if peer is None: return True
+        peer.ping_id, peer.ping_sent_at = self._sweep_id, now
+        try:
+            await asyncio.wait_for(websocket.send_text(ping), SEND_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def evict(self, websocket: WebSocket):
+        peer = self.peers.pop(websocket, None)
+        if peer is None: return
+        WS_EVICTIONS.labels(peer.endpoint).inc()
+        if peer.on_dead:
+            try:
+                result = peer.on_dead(websocket)
+                if inspect.isawaitable(result): await result
+            except Exception as e:
+                logger.error(f"Liveness callback error ({peer.endpoint}): {e}")
+        # O loop de recepção do endpoint termina com WebSocketDisconnect e faz o resto da limpeza
+        try: await asyncio.wait_for(websocket.close(code=WS_CLOSE_DEAD_PEER), SEND_TIMEOUT)
+        except Exception: pass
+
+    # --- TAREFA DE FUNDO ---
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try: await self.sweep()
+            except Exception as e: logger.error(f"Liveness sweep error: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+
+liveness = LivenessManager()
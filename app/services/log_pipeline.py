@@ -0,0 +1,224 @@
+"""
+Logging assíncrono e estruturado.
+
+Quem loga só monta o registro e o coloca numa fila limitada (QueueHandler); uma thread
+(QueueListener) formata em JSON e escreve no stdout. Antes de enfileirar, filtros baratos:
+  - contexto: request_id (middleware) e game_id (WebSocket de partida) via contextvars
+  - amostragem por tipo de mensagem: LOG_SAMPLE="uvicorn.access=0.1,chat.send_failed=0.05"
+    (o tipo é o `event` passado em extra=..., ou o nome do logger)
+  - teto para erros repetidos: no máximo LOG_RATE_CAP registros por ponto do código a cada
+    LOG_RATE_WINDOW segundos; o próximo registro depois da janela informa quantos foram suprimidos
+Fila cheia descarta o registro (e conta na métrica) em vez de bloquear o event loop.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from app.services.metrics import LOG_DROPPED
+
+# -----------------------------
+# Configuração (via .env)
+# -----------------------------
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_JSON = os.getenv("LOG_JSON", "1") != "0"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_RATE_CAP = int(os.getenv("LOG_RATE_CAP", 20))
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", 60))
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+# Loggers do uvicorn passam a usar a fila (o worker do gunicorn os liga direto no stderr)
+CAPTURED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+CONTEXT_FIELDS = ("event", "request_id", "game_id", "suppressed", "sample_rate")
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+game_id_var: ContextVar[Optional[str]] = ContextVar("game_id", default=None)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip(): rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+
+# -----------------------------
+# Filtros (rodam na thread de quem loga: precisam ser baratos)
+# -----------------------------
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.game_id = game_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None) or record.name)
+        if rate is None or rate >= 1: return True
+        if random.random() < rate:
+            record.sample_rate = rate
+            return True
+        LOG_DROPPED.labels("sampled").inc()
+        return False
+
+
+class RateCapFilter(logging.Filter):
+    """Avisos/erros repetidos do mesmo ponto do código: até `cap` por janela, o resto só é contado."""
+
+    def __init__(self, cap: int, window: float):
+        super().__init__()
+        self.cap = cap
+        self.window = window
+        # (arquivo, linha) -> [início da janela, emitidos, suprimidos]
+        self.windows: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING: return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self.windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state and state[2]: record.suppressed = state[2]
+                self.windows[key] = [now, 1, 0]
+                return True
+            if state[1] < self.cap:
+                state[1] += 1
+                return True
+            state[2] += 1
+        LOG_DROPPED.labels("rate_capped").inc()
+        return False
+
+
+# -----------------------------
+# Fila e formatação
+# -----------------------------
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Só resolve a mensagem e o traceback aqui; o JSON é montado na thread do listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try: self.queue.put_nowait(record)
+        except queue.Full: LOG_DROPPED.labels("queue_full").inc()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None: entry[field] = value
+        # Campos livres: logger.info("...", extra={"fields": {...}})
+        fields = getattr(record, "fields", None)
+        if fields: entry.update(fields)
+        if record.exc_text: entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "request_id", None) is None: record.request_id = "-"
+        return super().format(record)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging():
+    """Configura o logger raiz com a fila. Idempotente; chamado no startup do lifespan."""
+    global _listener
+    if _listener: return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_JSON else _TextFormatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE)))
+    handler.addFilter(RateCapFilter(LOG_RATE_CAP, LOG_RATE_WINDOW))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    for name in CAPTURED_LOGGERS:
+        captured = logging.getLogger(name)
+        captured.handlers = []
+        captured.propagate = True
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Esvazia a fila e para a thread de escrita; o que for logado depois sai direto (síncrono)."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        root = logging.getLogger()
+        root.handlers = list(_listener.handlers)
+        _listener = None
+
+
+# -----------------------------
+# request_id por requisição/conexão
+# -----------------------------
+
+class RequestContextMiddleware:
+    """Middleware ASGI puro: usa o X-Request-ID recebido (ou gera um) e devolve no cabeçalho."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id if scope["type"] == "http" else send)
+        finally:
+            request_id_var.reset(token)
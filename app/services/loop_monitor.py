@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Optional
+from app.services.metrics import LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Configuração
+# -----------------------------
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL_MS", 100)) / 1000
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD_MS", 250)) / 1000
+
+MAX_PROFILE_SECONDS = 60
+
+
+class LoopLagMonitor:
+    """
+    Mede o atraso do event loop e, quando um callback trava o loop além do limite,
+    registra a pilha do código que está bloqueando (capturada por uma thread vigia).
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_beat = time.monotonic()
+        self.loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            LOOP_LAG.observe(max(0.0, now - expected))
+            self.last_beat = now
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self.last_beat
+            stalled = time.monotonic() - beat
+            # Um relatório por travamento: só registra de novo depois de um novo batimento
+            if stalled < self.threshold + self.interval or beat == reported_beat: continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<pilha indisponível>"
+            logger.warning(f"Event loop blocked for {stalled * 1000:.0f}ms; current stack:\n{stack}")
+
+    def start(self):
+        if self._task is not None: return
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+
+class SamplingProfiler:
+    """Profiler estatístico: amostra as pilhas de todas as threads e gera collapsed stacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def collect(self, seconds: float, interval: float) -> str:
+        """Bloqueante (roda numa thread). Retorna linhas 'f1;f2;f3 N' prontas para flamegraph.pl."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            me = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == me: continue
+                    stacks[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+                time.sleep(interval)
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        parts.append(thread_name)
+        # Formato collapsed: raiz primeiro, separado por ';' (sem ';' nos nomes)
+        return ";".join(p.replace(";", ":") for p in reversed(parts))
+
+
+loop_monitor = LoopLagMonitor()
+profiler = SamplingProfiler()
@@ -0,0 +1,81 @@
+import time
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+
+# -----------------------------
+# Métricas (formato Prometheus)
+# -----------------------------
+# Tudo é contador/histograma em memória: custo de poucos microssegundos por evento.
+
+HTTP_LATENCY = Histogram(
+    "pw_http_request_duration_seconds", "Latência das requisições HTTP por rota",
+    ["method", "route", "status"],
+)
+WS_ACTIVE = Gauge("pw_websockets_active", "WebSockets abertos por endpoint", ["endpoint"])
+WS_RTT = Histogram(
+    "pw_websocket_rtt_seconds", "Tempo de ida e volta do ping/pong da aplicação", ["endpoint"],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5),
+)
+WS_EVICTIONS = Counter("pw_websocket_evictions_total", "Peers removidos por não responderem ao ping", ["endpoint"])
+ACTIVE_GAMES = Gauge("pw_active_games", "Partidas em andamento neste worker")
+QUEUE_DEPTH = Gauge("pw_matchmaking_queue_depth", "Jogadores aguardando na fila de matchmaking")
+MOVES = Counter("pw_moves_total", "Lances recebidos por resultado", ["result"])
+SEND_FAILURES = Counter("pw_ws_send_failures_total", "Falhas ao enviar mensagens por WebSocket", ["channel"])
+RATE_LIMIT_REJECTIONS = Counter("pw_rate_limit_rejections_total", "Requisições/conexões rejeitadas", ["reason"])
+MONGO_LATENCY = Histogram(
+    "pw_mongo_command_duration_seconds", "Latência dos comandos MongoDB", ["command"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5),
+)
+MONGO_FAILURES = Counter("pw_mongo_command_failures_total", "Comandos MongoDB com erro", ["command"])
+RESULT_BATCH_SIZE = Histogram(
+    "pw_result_batch_ops", "Operações por bulk_write do escritor de resultados", ["collection"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+RESULT_WRITE_FAILURES = Counter("pw_result_write_failures_total", "Operações de resultado não gravadas", ["collection"])
+TOURNAMENT_GAMES = Gauge("pw_tournament_games", "Partidas de torneio em andamento neste worker")
+LOG_DROPPED = Counter("pw_log_records_dropped_total", "Registros de log descartados antes da escrita", ["reason"])
+LOOP_LAG = Histogram(
+    "pw_event_loop_lag_seconds", "Atraso do event loop medido pelo monitor de lag",
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5),
+)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro: mede a latência HTTP usando o template da rota como label."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start": status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # O roteador grava a rota encontrada no scope; evita um label por URL
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_LATENCY.labels(scope["method"], path, str(status)).observe(time.perf_counter() - start)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Latência de cada comando via command monitoring do PyMongo."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_LATENCY.labels(event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(event.command_name).inc()
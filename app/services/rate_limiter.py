@@ -0,0 +1,166 @@
+import os
+import time
+from typing import Dict, Tuple
+from fastapi import HTTPException, Request, WebSocket
+from app.services.metrics import RATE_LIMIT_REJECTIONS, WS_ACTIVE
+from app.services.drain import drain_manager, send_reconnect_hint
+
+# -----------------------------
+# Configuração (via .env)
+# -----------------------------
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+
+# Limites no formato (capacidade do balde, tokens repostos por segundo)
+LIMITS: Dict[str, Tuple[float, float]] = {
+    "login": (float(os.getenv("RATE_LOGIN_BURST", 10)), float(os.getenv("RATE_LOGIN_PER_SEC", 0.2))),
+    "register": (float(os.getenv("RATE_REGISTER_BURST", 5)), float(os.getenv("RATE_REGISTER_PER_SEC", 0.05))),
+    "ws_connect": (float(os.getenv("RATE_WS_CONNECT_BURST", 20)), float(os.getenv("RATE_WS_CONNECT_PER_SEC", 1))),
+    "ws_user": (float(os.getenv("RATE_WS_USER_BURST", 30)), float(os.getenv("RATE_WS_USER_PER_SEC", 2))),
+    "game_msg": (float(os.getenv("RATE_GAME_MSG_BURST", 30)), float(os.getenv("RATE_GAME_MSG_PER_SEC", 10))),
+    "chat_msg": (float(os.getenv("RATE_CHAT_MSG_BURST", 10)), float(os.getenv("RATE_CHAT_MSG_PER_SEC", 2))),
+    "analysis": (float(os.getenv("RATE_ANALYSIS_BURST", 10)), float(os.getenv("RATE_ANALYSIS_PER_SEC", 0.5))),
+    "hint": (float(os.getenv("RATE_HINT_BURST", 3)), float(os.getenv("RATE_HINT_PER_SEC", 0.2))),
+}
+
+# Teto global de WebSockets abertos por endpoint neste worker
+WS_CAPS: Dict[str, int] = {
+    "matchmaking": int(os.getenv("WS_MAX_MATCHMAKING", 2000)),
+    "chat": int(os.getenv("WS_MAX_CHAT", 5000)),
+    "game": int(os.getenv("WS_MAX_GAME", 5000)),
+    "tournament": int(os.getenv("WS_MAX_TOURNAMENT", 5000)),
+}
+
+# Proxies cujos cabeçalhos X-Real-IP / X-Forwarded-For são confiáveis (o gunicorn escuta só em localhost)
+TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if ip.strip()}
+
+# Código de fechamento "Try Again Later" (RFC 6455)
+WS_CLOSE_OVERLOADED = 1013
+
+# Baldes ociosos há mais que isso são descartados na limpeza
+IDLE_BUCKET_SECONDS = 600
+MAX_BUCKETS = 100_000
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        # Reabastece proporcionalmente ao tempo decorrido
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, now: float, amount: float = 1.0) -> bool:
+        self.refill(now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+
+class RateLimiter:
+    """Baldes de tokens em memória por (escopo, chave) -- IP, usuário ou socket."""
+
+    def __init__(self):
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.open_sockets: Dict[str, int] = {name: 0 for name in WS_CAPS}
+
+    def allow(self, scope: str, key: str, amount: float = 1.0) -> bool:
+        if not RATE_LIMIT_ENABLED: return True
+        now = time.monotonic()
+        bucket = self.buckets.get((scope, key))
+        if bucket is None:
+            if len(self.buckets) >= MAX_BUCKETS: self._prune(now)
+            capacity, rate = LIMITS[scope]
+            bucket = self.buckets[(scope, key)] = TokenBucket(capacity, rate)
+        if bucket.consume(now, amount): return True
+        self._reject(scope)
+        return False
+
+    def exhausted(self, scope: str, key: str, amount: float = 1.0) -> bool:
+        """Consulta sem gastar: o balde não tem `amount` tokens (para cobrar só depois, ex.: login com senha errada)."""
+        if not RATE_LIMIT_ENABLED: return False
+        bucket = self.buckets.get((scope, key))
+        if bucket is None: return False
+        bucket.refill(time.monotonic())
+        if bucket.tokens >= amount: return False
+        self._reject(scope)
+        return True
+
+    def forget(self, scope: str, key: str):
+        self.buckets.pop((scope, key), None)
+
+    def _reject(self, reason: str):
+        RATE_LIMIT_REJECTIONS.labels(reason).inc()
+
+    def _prune(self, now: float):
+        stale = [k for k, b in self.buckets.items() if now - b.updated > IDLE_BUCKET_SECONDS]
+        for k in stale: del self.buckets[k]
+        # Ainda cheio? Descarta os mais antigos para manter o limite de memória
+        if len(self.buckets) >= MAX_BUCKETS:
+            oldest = sorted(self.buckets.items(), key=lambda kv: kv[1].updated)
+            for k, _ in oldest[:len(oldest) // 10 or 1]: del self.buckets[k]
+
+    # --- ADMISSÃO DE WEBSOCKETS ---
+    def try_acquire_socket(self, endpoint: str) -> bool:
+        if RATE_LIMIT_ENABLED and self.open_sockets[endpoint] >= WS_CAPS[endpoint]:
+            self._reject(f"{endpoint}_cap")
+            return False
+        self.open_sockets[endpoint] += 1
+        return True
+
+    def release_socket(self, endpoint: str):
+        if self.open_sockets[endpoint] > 0: self.open_sockets[endpoint] -= 1
+
+    async def admit_websocket(self, websocket: WebSocket, endpoint: str) -> bool:
+        """
+        Decide se um WebSocket pode ser aceito ANTES do accept (sem custo de handshake).
+        Retorna False e fecha o socket quando o IP estourou o limite, o worker está cheio ou drenando.
+        Se retornar True, o chamador deve chamar release_socket(endpoint) ao final.
+        """
+        # Worker em drenagem (SIGTERM): o cliente recebe o aviso e reconecta no worker novo
+        if drain_manager.draining:
+            await send_reconnect_hint(websocket)
+            return False
+        if not self.allow("ws_connect", client_ip(websocket)) or not self.try_acquire_socket(endpoint):
+            await websocket.close(code=WS_CLOSE_OVERLOADED)
+            return False
+        return True
+
+
+def client_ip(conn) -> str:
+    """
+    IP real do cliente. Os cabeçalhos só valem quando a conexão vem do proxy (nginx):
+    X-Real-IP ($remote_addr) ou a última entrada do X-Forwarded-For, que é a que o nginx
+    acrescentou. As entradas à esquerda vêm do cliente e podem ser forjadas.
+    """
+    peer = conn.client.host if conn.client else "unknown"
+    if peer not in TRUSTED_PROXIES: return peer
+    real_ip = conn.headers.get("x-real-ip")
+    if real_ip: return real_ip.strip()
+    forwarded = conn.headers.get("x-forwarded-for")
+    if forwarded: return forwarded.split(",")[-1].strip()
+    return peer
+
+
+rate_limiter = RateLimiter()
+
+for _endpoint in WS_CAPS:
+    WS_ACTIVE.labels(_endpoint).set_function(lambda e=_endpoint: rate_limiter.open_sockets[e])
+
+
+def rate_limit(scope: str):
+    """Dependency do FastAPI que responde 429 quando o IP excede o limite do escopo."""
+    def dependency(request: Request):
+        if not rate_limiter.allow(scope, client_ip(request)):
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, int(1 / LIMITS[scope][1])))}
+            )
+    return dependency
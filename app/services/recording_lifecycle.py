@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+from botocore.exceptions import ClientError
+from pymongo import ASCENDING, UpdateOne
+from app.cloudfare import r2_service
+from app.db import db
+from app.services.etags import bump_recordings_version
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Estados de uma gravação
+# -----------------------------
+# pending  -> URL entregue, nenhum byte confirmado
+# uploaded -> cliente avisou que terminou (ou multipart completado)
+# verified -> HEAD no storage confirmou o objeto (tamanho real registrado)
+# failed   -> objeto ausente após o upload ou upload abortado
+# expired  -> pending por tempo demais; URL já não vale mais
+PENDING, UPLOADED, VERIFIED, FAILED, EXPIRED = "pending", "uploaded", "verified", "failed", "expired"
+
+# Registros antigos eram gravados direto como "completed"; continuam visíveis até o verificador confirmá-los
+LEGACY_COMPLETED = "completed"
+LISTABLE_STATUSES = [VERIFIED, LEGACY_COMPLETED]
+
+VERIFY_INTERVAL = float(os.getenv("RECORDING_VERIFY_INTERVAL", 15))
+VERIFY_BATCH_SIZE = int(os.getenv("RECORDING_VERIFY_BATCH", 100))
+VERIFY_WORKERS = int(os.getenv("RECORDING_VERIFY_WORKERS", 8))
+# Tentativas de HEAD após o cliente avisar que terminou, antes de marcar como failed
+MAX_VERIFY_ATTEMPTS = 5
+# Margem além da validade da URL assinada antes de expirar um pending
+PENDING_GRACE = timedelta(minutes=30)
+
+
+def next_check_delay(attempts: int) -> timedelta:
+    """Backoff exponencial entre verificações: 10s, 20s, 40s... até 10 min."""
+    return timedelta(seconds=min(600, 10 * 2 ** attempts))
+
+
+class RecordingVerifier:
+    """Confirma uploads em lote (HEAD no storage) e expira registros pendentes antigos."""
+
+    def __init__(self):
+        # Criado no start() (ou no primeiro uso) e encerrado no stop(): o lifespan pode rodar de novo
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_indexes(self):
+        db["recordings"].create_index([("status", ASCENDING), ("next_check_at", ASCENDING)])
+        # Registros antigos ("completed") entram na fila de verificação uma única vez
+        db["recordings"].update_many(
+            {"status": LEGACY_COMPLETED, "next_check_at": {"$exists": False}},
+            {"$set": {"next_check_at": datetime.utcnow()}}
+        )
+
+    # --- CICLO (roda fora do event loop) ---
+    def run_once(self) -> int:
+        now = datetime.utcnow()
+        expired = self.expire_stale(now)
+        checked = self.verify_batch(now)
+        return expired + checked
+
+    def verify_batch(self, now: datetime) -> int:
+        candidates = list(db["recordings"].find(
+            {
+                "status": {"$in": [PENDING, UPLOADED, LEGACY_COMPLETED]},
+                "next_check_at": {"$lte": now},
+                # Multipart pendente ainda não tem objeto: só o /complete o cria
+                "$or": [{"status": {"$ne": PENDING}}, {"upload_id": {"$exists": False}}],
+            },
+            {"file_key": 1, "status": 1, "verify_attempts": 1, "user_id": 1}
+        ).sort("next_check_at", ASCENDING).limit(VERIFY_BATCH_SIZE))
+        if not candidates: return 0
+
+        results = self._pool().map(self._head, [rec["file_key"] for rec in candidates])
+        ops, changed = [], []
+        for rec, head in zip(candidates, results):
+            update = self._transition(rec, head, now)
+            ops.append(UpdateOne({"_id": rec["_id"], "status": rec["status"]}, {"$set": update}))
+            if "status" in update: changed.append(rec.get("user_id"))
+        db["recordings"].bulk_write(ops, ordered=False)
+        # Só mudança de status altera /my-recordings: novas tentativas não invalidam o ETag
+        bump_recordings_version(changed)
+        return len(candidates)
+
+    def _head(self, file_key: str):
+        """Retorna o tamanho do objeto, None se não existe, ou a exceção em erros transitórios."""
+        try:
+            head = r2_service.s3_client.head_object(Bucket=r2_service.bucket, Key=file_key)
+            return head["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"): return None
+            return e
+        except Exception as e:
+            return e
+
+    def _transition(self, rec: dict, head, now: datetime) -> dict:
+        """Campos a gravar ($set). Só quem muda de status recebe updated_at (é o que a listagem mostra)."""
+        attempts = rec.get("verify_attempts", 0) + 1
+        if isinstance(head, Exception):
+            logger.warning(f"HEAD failed for {rec['file_key']}: {head}")
+            update = {"verify_attempts": attempts, "next_check_at": now + next_check_delay(attempts)}
+        elif head is not None:
+            update = {"status": VERIFIED, "actual_size": head, "verified_at": now}
+        elif rec["status"] == PENDING:
+            # Cliente ainda pode estar enviando; o sweeper expira se nunca chegar
+            update = {"verify_attempts": attempts, "next_check_at": now + next_check_delay(attempts)}
+        elif attempts >= MAX_VERIFY_ATTEMPTS:
+            update = {"status": FAILED, "failure_reason": "object_missing"}
+        else:
+            update = {"verify_attempts": attempts, "next_check_at": now + next_check_delay(attempts)}
+        if "status" in update: update["updated_at"] = now
+        return update
+
+    def expire_stale(self, now: datetime) -> int:
+        stale = list(db["recordings"].find(
+            {"status": PENDING, "expires_at": {"$lt": now - PENDING_GRACE}},
+            {"file_key": 1, "upload_id": 1}
+        ).limit(VERIFY_BATCH_SIZE))
+        if not stale: return 0
+
+        # Libera as partes órfãs no storage
+        multipart = [rec for rec in stale if rec.get("upload_id")]
+        list(self._pool().map(self._abort_quietly, multipart))
+
+        db["recordings"].update_many(
+            {"_id": {"$in": [rec["_id"] for rec in stale]}, "status": PENDING},
+            {"$set": {"status": EXPIRED, "updated_at": now}}
+        )
+        return len(stale)
+
+    def _abort_quietly(self, rec: dict):
+        try: r2_service.abort_multipart_upload(rec["file_key"], rec["upload_id"])
+        except Exception as e: logger.warning(f"Abort failed for {rec['file_key']}: {e}")
+
+    # --- TAREFA DE FUNDO ---
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                processed = await loop.run_in_executor(None, self.run_once)
+                # Ainda há fila? Continua logo; senão espera o próximo ciclo
+                if processed >= VERIFY_BATCH_SIZE: continue
+            except Exception as e:
+                logger.error(f"Recording verifier error: {e}")
+            await asyncio.sleep(VERIFY_INTERVAL)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix="recording-verify")
+        return self.pool
+
+    def start(self):
+        self._pool()
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+        if self.pool:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+
+def lifecycle_fields(status: str, expires_in: int) -> dict:
+    """Campos de ciclo de vida para um novo registro de gravação."""
+    now = datetime.utcnow()
+    return {
+        "status": status,
+        "expires_at": now + timedelta(seconds=expires_in),
+        "next_check_at": now + next_check_delay(0),
+        "verify_attempts": 0,
+    }
+
+
+recording_verifier = RecordingVerifier()
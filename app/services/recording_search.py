@@ -0,0 +1,118 @@
+import base64
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT
+from app.db import db
+from app.services.recording_lifecycle import LISTABLE_STATUSES
+
+# -----------------------------
+# Busca de gravações
+# -----------------------------
+# Escopo: gravações do usuário (user_id) ou em que ele jogou (players.email), só as listáveis.
+# Paginação por chave (created_at, _id) em ordem decrescente: custo constante em qualquer página,
+# ao contrário de skip(). As contagens por faceta só são calculadas na primeira página.
+
+MAX_PAGE_SIZE = 50
+
+# Só o necessário para a lista (sem chaves internas do storage/ciclo de vida)
+RESULT_PROJECTION = {
+    "recording_id": 1, "title": 1, "duration": 1, "players": 1, "game_type": 1,
+    "public_url": 1, "file_size": 1, "status": 1, "created_at": 1,
+}
+SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def ensure_indexes():
+    recordings = db["recordings"]
+    # Um índice de texto por coleção: título e nomes dos jogadores
+    recordings.create_index(
+        [("title", TEXT), ("players.name", TEXT)],
+        name="recordings_text", default_language="portuguese", weights={"title": 3, "players.name": 1},
+    )
+    recordings.create_index([("players.email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+    recordings.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+
+
+def encode_cursor(doc: dict) -> str:
+    raw = f"{doc['created_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, oid = raw.split("|")
+        return datetime.fromisoformat(created_at), ObjectId(oid)
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+
+
+def build_filter(user: dict, q: Optional[str], player: Optional[str], game_type: Optional[str]) -> dict:
+    clauses = [
+        {"$or": [{"user_id": user["_id"]}, {"players.email": user["email"]}]},
+        {"status": {"$in": LISTABLE_STATUSES}},
+    ]
+    if player: clauses.append({"players.email": player} if "@" in player else {"players.name": player})
+    if game_type: clauses.append({"game_type": game_type})
+    query = {"$and": clauses}
+    # $text precisa ficar no nível de cima do filtro
+    if q: query["$text"] = {"$search": q}
+    return query
+
+
+def _facets(query: dict, email: str) -> dict:
+    pipeline = [
+        {"$match": query},
+        {"$facet": {
+            "total": [{"$count": "n"}],
+            "game_type": [{"$sortByCount": "$game_type"}],
+            # Resultado do ponto de vista do usuário (vitórias/derrotas/empates)
+            "result": [
+                {"$unwind": "$players"},
+                {"$match": {"players.email": email}},
+                {"$sortByCount": "$players.result"},
+            ],
+        }},
+    ]
+    facets = next(db["recordings"].aggregate(pipeline), {})
+    total = facets.get("total") or [{"n": 0}]
+    return {
+        "total": total[0]["n"],
+        "game_type": {f["_id"]: f["count"] for f in facets.get("game_type", []) if f["_id"] is not None},
+        "result": {f["_id"]: f["count"] for f in facets.get("result", []) if f["_id"] is not None},
+    }
+
+
+def _clean(doc: dict) -> dict:
+    doc["_id"] = str(doc["_id"])
+    if isinstance(doc.get("created_at"), datetime): doc["created_at"] = doc["created_at"].isoformat()
+    return doc
+
+
+def search_recordings(user: dict, q: Optional[str] = None, player: Optional[str] = None,
+                      game_type: Optional[str] = None, cursor: Optional[str] = None, limit: int = 20) -> dict:
+    query = build_filter(user, q, player, game_type)
+    page_query = query
+    if cursor:
+        created_at, oid = decode_cursor(cursor)
+        page_query = dict(query, **{"$and": query["$and"] + [{"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": oid}},
+        ]}]})
+
+    # Um documento a mais indica se há próxima página
+    docs = list(db["recordings"].find(page_query, RESULT_PROJECTION).sort(SORT).limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1]) if has_more else None
+
+    return {
+        "results": [_clean(doc) for doc in docs],
+        "next_cursor": next_cursor,
+        "facets": None if cursor else _facets(query, user["email"]),
+    }
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from app.db import db
+from app.services.metrics import RESULT_BATCH_SIZE, RESULT_WRITE_FAILURES
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Configuração
+# -----------------------------
+# Espera no máximo isso entre o primeiro resultado pendente e a escrita
+RESULT_FLUSH_INTERVAL = float(os.getenv("RESULT_FLUSH_INTERVAL", 0.25))
+# Com essa quantidade de operações pendentes, escreve sem esperar o intervalo
+RESULT_MAX_BATCH = int(os.getenv("RESULT_MAX_BATCH", 500))
+# Falhas transitórias (rede, eleição de primário): o lote volta para a fila até esse número de vezes
+RESULT_MAX_RETRIES = int(os.getenv("RESULT_MAX_RETRIES", 5))
+
+# Erros de escrita individuais que indicam primário indisponível, não operação inválida
+TRANSIENT_WRITE_CODES = {6, 7, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+
+class ResultWriter:
+    """
+    Agrupa as escritas de fim de partida (games, user_stats, users, torneios...) e manda
+    um bulk_write por coleção, numa thread. Centenas de partidas terminando juntas viram
+    alguns poucos comandos no Mongo em vez de centenas de round-trips.
+
+    As operações de uma coleção mantêm a ordem de chegada (ordered=True): updates em
+    pipeline do mesmo documento (sequências, "recent") dependem dela. Um erro definitivo
+    descarta só a operação que falhou; as seguintes são reenviadas em seguida.
+
+    Falhas transitórias devolvem o restante do lote para o INÍCIO da fila (antes do que
+    chegou depois), com espera crescente, então a ordem por coleção se mantém. Depois de
+    uma queda de conexão não dá para saber o que já foi aplicado, e o lote inteiro volta:
+    por isso as operações enviadas aqui precisam ser idempotentes (ver game_result_ops).
+    """
+
+    def __init__(self, interval: float = RESULT_FLUSH_INTERVAL, max_batch: int = RESULT_MAX_BATCH):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.pending: Dict[str, List] = defaultdict(list)
+        self.size = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self._lock = asyncio.Lock()
+        # Flushes seguidos com falha transitória (0 = último deu certo)
+        self.retries = 0
+
+    def submit(self, ops: Dict[str, List]):
+        """Enfileira operações pymongo (InsertOne, UpdateOne...) por coleção. Não bloqueia."""
+        for collection, items in ops.items():
+            if not items: continue
+            self.pending[collection].extend(items)
+            self.size += len(items)
+        if not self.size: return
+        loop = asyncio.get_running_loop()
+        if self.size >= self.max_batch and not self.retries:
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._delay(), self._spawn_flush)
+
+    def _delay(self) -> float:
+        return self.interval * 2 ** self.retries
+
+    def _spawn_flush(self):
+        self._timer = None
+        task = asyncio.get_running_loop().create_task(self.flush())
+        # Mantém referência até terminar (o loop só guarda referências fracas)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Escreve tudo o que está pendente. Também usado no desligamento."""
+        async with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            batch, self.pending, self.size = self.pending, defaultdict(list), 0
+            if not batch: return
+            retry = await asyncio.to_thread(self._write, batch)
+            if retry: self._requeue(retry)
+            else: self.retries = 0
+
+    def _requeue(self, retry: Dict[str, List]):
+        self.retries += 1
+        if self.retries > RESULT_MAX_RETRIES:
+            for collection, ops in retry.items(): RESULT_WRITE_FAILURES.labels(collection).inc(len(ops))
+            logger.error(f"Giving up on {sum(map(len, retry.values()))} result ops after {RESULT_MAX_RETRIES} retries")
+            self.retries = 0
+            return
+        # Na frente do que chegou durante a escrita, para manter a ordem por coleção
+        for collection, ops in retry.items():
+            self.pending[collection] = ops + self.pending[collection]
+            self.size += len(ops)
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._delay(), self._spawn_flush)
+
+    def _write(self, batch: Dict[str, List]) -> Dict[str, List]:
+        """Escreve o lote; devolve, por coleção, o que ficou sem aplicar por falha transitória."""
+        retry = {}
+        for collection, ops in batch.items():
+            RESULT_BATCH_SIZE.labels(collection).observe(len(ops))
+            remaining = self._write_collection(collection, ops)
+            if remaining: retry[collection] = remaining
+        return retry
+
+    def _write_collection(self, collection: str, ops: List) -> List:
+        while ops:
+            try:
+                db[collection].bulk_write(ops, ordered=True)
+                return []
+            except BulkWriteError as e:
+                # ordered=True: antes do erro foi aplicado, depois dele nada foi tentado
+                error = e.details.get("writeErrors", [{}])[0]
+                index = error.get("index", 0)
+                if error.get("code") in TRANSIENT_WRITE_CODES:
+                    logger.warning(f"Bulk write interrupted ({collection}), will retry: {error.get('errmsg')}")
+                    return ops[index:]
+                RESULT_WRITE_FAILURES.labels(collection).inc()
+                logger.error(f"Bulk write error ({collection}): {error}")
+                ops = ops[index + 1:]
+            except ConnectionFailure as e:
+                # AutoReconnect, NetworkTimeout, seleção de servidor...: o que foi aplicado é
+                # desconhecido, o lote inteiro volta (operações idempotentes)
+                logger.warning(f"Bulk write interrupted ({collection}), will retry: {e}")
+                return ops
+            except Exception as e:
+                RESULT_WRITE_FAILURES.labels(collection).inc(len(ops))
+                logger.error(f"Bulk write error ({collection}): {e}")
+                return []
+        return []
+
+    async def stop(self):
+        await self.flush()
+        if self._tasks: await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Falhas transitórias no desligamento: tenta de novo (limitado por RESULT_MAX_RETRIES)
+        while self.size and self.retries:
+            await asyncio.sleep(self._delay())
+            await self.flush()
+
+
+result_writer = ResultWriter()
@@ -0,0 +1,434 @@
+"""
+Torneios (suíço e mata-mata) sobre o GameManager.
+
+Cada rodada é pareada de uma vez (ordenação + varredura linear), todas as partidas são
+criadas em memória num único passo e os avisos aos jogadores saem em paralelo. A rodada
+avança quando a última partida termina (listener de broadcast_game_over). A classificação
+é mantida incrementalmente; resultados e rodadas são gravados pelo escritor em lote.
+
+Como as partidas, os torneios vivem na memória do worker (o deploy roda com um worker).
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from fastapi import WebSocket
+from pymongo import UpdateOne
+from app.services.game_manager import game_manager
+from app.services.game_session import GameSession
+from app.services.liveness import SEND_TIMEOUT
+from app.services.metrics import SEND_FAILURES, TOURNAMENT_GAMES
+from app.services.result_writer import result_writer
+from app.services.user_stats import outcome_for
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Configuração
+# -----------------------------
+SWISS, KNOCKOUT = "swiss", "knockout"
+FORMATS = (SWISS, KNOCKOUT)
+REGISTERING, RUNNING, FINISHED = "registering", "running", "finished"
+POINTS = {"win": 1.0, "draw": 0.5, "loss": 0.0}
+
+TOURNAMENT_MAX_PLAYERS = int(os.getenv("TOURNAMENT_MAX_PLAYERS", 1024))
+# Quem não entrar na partida nesse prazo após o início da rodada perde por W.O.
+NO_SHOW_TIMEOUT = float(os.getenv("TOURNAMENT_NO_SHOW_TIMEOUT", 120))
+# Jogador que entrou e caiu: perde se não voltar nesse prazo (a partida não pode travar a rodada)
+DISCONNECT_TIMEOUT = float(os.getenv("TOURNAMENT_DISCONNECT_TIMEOUT", 60))
+NO_SHOW_SWEEP_INTERVAL = 10
+# Suíço: quantos adversários à frente procurar para evitar revanche antes de aceitá-la
+REMATCH_LOOKAHEAD = 8
+
+
+class TournamentNotFound(LookupError):
+    pass
+
+
+class TournamentError(ValueError):
+    pass
+
+
+class Entrant:
+    __slots__ = (
+        "user_id", "name", "rating", "seed", "score", "wins", "draws", "losses",
+        "opponents", "color_balance", "had_bye", "eliminated",
+    )
+
+    def __init__(self, user_id: str, name: str, rating: int = 0):
+        self.user_id = user_id
+        self.name = name
+        self.rating = rating
+        self.seed = 0
+        self.score = 0.0
+        self.wins = self.draws = self.losses = 0
+        self.opponents = set()
+        # Brancas - pretas: o suíço dá as brancas para quem jogou menos com elas
+        self.color_balance = 0
+        self.had_bye = False
+        self.eliminated = False
+
+    def to_wire(self) -> dict:
+        return {"id": self.user_id, "name": self.name}
+
+
+class Tournament:
+    __slots__ = (
+        "tournament_id", "name", "format", "rounds", "max_players", "status", "created_by", "created_at",
+        "entrants", "round", "round_games", "round_started_at", "assignments", "subscribers", "_standings",
+    )
+
+    def __init__(self, name: str, fmt: str, rounds: Optional[int], max_players: int, created_by: str):
+        self.tournament_id = str(uuid.uuid4())
+        self.name = name
+        self.format = fmt
+        self.rounds = rounds
+        self.max_players = max_players
+        self.status = REGISTERING
+        self.created_by = created_by
+        self.created_at = datetime.utcnow()
+        self.entrants: Dict[str, Entrant] = {}
+        self.round = 0
+        # Partidas ainda abertas na rodada atual: game_id -> (user_id brancas, user_id pretas)
+        self.round_games: Dict[str, Tuple[str, str]] = {}
+        self.round_started_at = 0.0
+        # Aviso da rodada atual por jogador (já serializado), reenviado em reconexões
+        self.assignments: Dict[str, str] = {}
+        self.subscribers: Dict[str, set] = {}
+        self._standings: Optional[List[dict]] = None
+
+    def alive(self) -> List[Entrant]:
+        return [e for e in self.entrants.values() if not e.eliminated]
+
+    def standings(self) -> List[dict]:
+        # Recalculada só quando algum resultado mudou desde a última leitura
+        if self._standings is None:
+            rows = []
+            for e in self.entrants.values():
+                buchholz = sum(self.entrants[o].score for o in e.opponents)
+                rows.append((e.eliminated, -e.score, -buchholz, e.seed, e, buchholz))
+            rows.sort(key=lambda row: row[:4])
+            self._standings = [{
+                "rank": rank, "id": e.user_id, "name": e.name, "seed": e.seed, "score": e.score,
+                "buchholz": buchholz, "wins": e.wins, "draws": e.draws, "losses": e.losses,
+                "eliminated": e.eliminated,
+            } for rank, (*_, e, buchholz) in enumerate(rows, 1)]
+        return self._standings
+
+    def summary(self) -> dict:
+        return {
+            "tournament_id": self.tournament_id, "name": self.name, "format": self.format,
+            "status": self.status, "round": self.round, "rounds": self.rounds,
+            "players": len(self.entrants), "max_players": self.max_players,
+            "created_at": self.created_at.isoformat(),
+        }
+
+    def detail(self) -> dict:
+        return dict(
+            self.summary(),
+            standings=self.standings(),
+            games=[{"game_id": game_id, "white": white, "black": black}
+                   for game_id, (white, black) in self.round_games.items()],
+        )
+
+
+# -----------------------------
+# Pareamento
+# -----------------------------
+
+def _orient(a: Entrant, b: Entrant) -> Tuple[Entrant, Entrant]:
+    """(brancas, pretas): quem jogou menos de brancas fica com elas; empate favorece `a`."""
+    return (b, a) if b.color_balance < a.color_balance else (a, b)
+
+
+def pair_swiss(entrants: List[Entrant]) -> Tuple[List[Tuple[Entrant, Entrant]], List[Entrant]]:
+    """
+    Ordena por pontuação (O(n log n)) e pareia vizinhos, procurando até REMATCH_LOOKAHEAD
+    posições à frente alguém que ainda não foi adversário. Número ímpar: o pior colocado
+    que ainda não folgou recebe a folga.
+    """
+    ranked = sorted(entrants, key=lambda e: (-e.score, e.seed))
+    byes = []
+    if len(ranked) % 2:
+        idx = next((i for i in range(len(ranked) - 1, -1, -1) if not ranked[i].had_bye), len(ranked) - 1)
+        byes.append(ranked.pop(idx))
+
+    taken = [False] * len(ranked)
+    pairs = []
+    for i, a in enumerate(ranked):
+        if taken[i]: continue
+        taken[i] = True
+        first, chosen, looked = None, None, 0
+        for j in range(i + 1, len(ranked)):
+            if taken[j]: continue
+            if first is None: first = j
+            if ranked[j].user_id not in a.opponents:
+                chosen = j
+                break
+            looked += 1
+            if looked >= REMATCH_LOOKAHEAD: break
+        j = first if chosen is None else chosen
+        taken[j] = True
+        pairs.append(_orient(a, ranked[j]))
+    return pairs, byes
+
+
+def pair_knockout(alive: List[Entrant]) -> Tuple[List[Tuple[Entrant, Entrant]], List[Entrant]]:
+    """
+    Mata-mata re-semeado a cada rodada: melhor semente contra a pior. Se o número de vivos
+    não é potência de 2, as melhores sementes folgam o suficiente para que a próxima rodada seja.
+    """
+    ranked = sorted(alive, key=lambda e: e.seed)
+    n = len(ranked)
+    p = 1 << (n.bit_length() - 1)
+    if n == p: byes, playing = [], ranked
+    else: byes, playing = ranked[:2 * p - n], ranked[2 * p - n:]
+    pairs = [_orient(playing[i], playing[-1 - i]) for i in range(len(playing) // 2)]
+    return pairs, byes
+
+
+# -----------------------------
+# Gerenciador
+# -----------------------------
+
+class TournamentManager:
+    def __init__(self):
+        self.tournaments: Dict[str, Tournament] = {}
+        # Socket -> (torneio, usuário), para remover inscrições sem varrer todos os torneios
+        self.sockets: Dict[WebSocket, Tuple[str, str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # --- CADASTRO ---
+    def create(self, name: str, fmt: str, created_by: str, rounds: Optional[int] = None,
+               max_players: Optional[int] = None) -> Tournament:
+        if fmt not in FORMATS: raise TournamentError(f"Unknown format: {fmt}")
+        if rounds is not None and rounds < 1: raise TournamentError("Rounds must be positive")
+        max_players = min(max_players or TOURNAMENT_MAX_PLAYERS, TOURNAMENT_MAX_PLAYERS)
+        t = Tournament(name, fmt, rounds if fmt == SWISS else None, max_players, created_by)
+        self.tournaments[t.tournament_id] = t
+        # Upsert: idempotente se o escritor reenviar o lote
+        result_writer.submit({"tournaments": [UpdateOne({"_id": t.tournament_id}, {"$set": {
+            "name": name, "format": fmt, "rounds": t.rounds,
+            "status": t.status, "created_by": created_by, "created_at": t.created_at,
+        }}, upsert=True)]})
+        return t
+
+    def get(self, tournament_id: str) -> Tournament:
+        t = self.tournaments.get(tournament_id)
+        if t is None: raise TournamentNotFound(tournament_id)
+        return t
+
+    def register(self, tournament_id: str, user_id: str, name: str, rating: int = 0) -> Entrant:
+        t = self.get(tournament_id)
+        if user_id in t.entrants: return t.entrants[user_id]
+        if t.status != REGISTERING: raise TournamentError("Registration is closed")
+        if len(t.entrants) >= t.max_players: raise TournamentError("Tournament is full")
+        entrant = t.entrants[user_id] = Entrant(user_id, name, rating)
+        t._standings = None
+        return entrant
+
+    def unregister(self, tournament_id: str, user_id: str):
+        t = self.get(tournament_id)
+        if t.status != REGISTERING: raise TournamentError("Registration is closed")
+        if t.entrants.pop(user_id, None): t._standings = None
+
+    # --- RODADAS ---
+    async def start_tournament(self, tournament_id: str) -> Tournament:
+        t = self.get(tournament_id)
+        if t.status != REGISTERING: raise TournamentError("Tournament already started")
+        if len(t.entrants) < 2: raise TournamentError("At least 2 players are needed")
+        t.status = RUNNING
+        # Sementes: melhor rating primeiro, empate pela ordem de inscrição (sort estável)
+        for seed, e in enumerate(sorted(t.entrants.values(), key=lambda e: -e.rating), 1):
+            e.seed = seed
+        if t.format == SWISS and t.rounds is None:
+            t.rounds = max(1, math.ceil(math.log2(len(t.entrants))))
+        result_writer.submit({"tournaments": [UpdateOne({"_id": t.tournament_id}, {"$set": {
+            "status": t.status, "rounds": t.rounds, "started_at": datetime.utcnow(),
+            "entrants": [{"user_id": e.user_id, "name": e.name, "seed": e.seed} for e in t.entrants.values()],
+        }})]})
+        await self._start_round(t)
+        return t
+
+    async def _start_round(self, t: Tournament):
+        t.round += 1
+        pairs, byes = pair_swiss(list(t.entrants.values())) if t.format == SWISS else pair_knockout(t.alive())
+
+        # Todas as partidas da rodada num passo só, sem await no meio
+        t.assignments = {}
+        pairings = []
+        for white, black in pairs:
+            game = game_manager.create_game(t.tournament_id, {
+                "white": (white.user_id, white.name), "black": (black.user_id, black.name),
+            })
+            t.round_games[game.game_id] = (white.user_id, black.user_id)
+            pairings.append({"game_id": game.game_id, "white": white.user_id, "black": black.user_id})
+            for color, me, opponent in (("white", white, black), ("black", black, white)):
+                t.assignments[me.user_id] = json.dumps({
+                    "type": "tournament_round", "tournament_id": t.tournament_id, "round": t.round,
+                    "game_id": game.game_id, "color": color, "opponent": opponent.to_wire(),
+                })
+        for e in byes:
+            if t.format == SWISS:
+                e.score += POINTS["win"]
+                e.had_bye = True
+            t.assignments[e.user_id] = json.dumps({
+                "type": "tournament_round", "tournament_id": t.tournament_id, "round": t.round, "bye": True,
+            })
+        t._standings = None
+        t.round_started_at = time.monotonic()
+
+        # Uma escrita para a rodada inteira
+        # Filtro pela rodada: o escritor pode reenviar o lote, o histórico não duplica
+        result_writer.submit({"tournaments": [UpdateOne({"_id": t.tournament_id, "history.round": {"$ne": t.round}}, {
+            "$set": {"round": t.round},
+            "$push": {"history": {
+                "round": t.round, "started_at": datetime.utcnow(), "games": pairings,
+                "byes": [e.user_id for e in byes],
+            }},
+        })]})
+        logger.info(f"Tournament {t.tournament_id} round {t.round}: {len(pairs)} games, {len(byes)} byes")
+
+        # Avisos em paralelo: um jogador lento não atrasa os outros
+        await asyncio.gather(*(
+            self._send_user(t, user_id, text) for user_id, text in t.assignments.items()
+        ))
+
+    async def on_game_over(self, game: GameSession, winner: str, reason: str):
+        if not game.tournament_id: return
+        t = self.tournaments.get(game.tournament_id)
+        if t is None or game.game_id not in t.round_games: return
+        white_id, black_id = t.round_games.pop(game.game_id)
+        self._apply_result(t, t.entrants[white_id], t.entrants[black_id], winner)
+        # Upsert por game_id: idempotente se o escritor reenviar o lote
+        result_writer.submit({"tournament_games": [UpdateOne({"game_id": game.game_id}, {"$setOnInsert": {
+            "tournament_id": t.tournament_id, "round": t.round,
+            "white": white_id, "black": black_id, "winner": winner, "reason": reason,
+            "ended_at": datetime.utcnow(),
+        }}, upsert=True)]})
+        if not t.round_games: await self._advance(t)
+
+    def _apply_result(self, t: Tournament, white: Entrant, black: Entrant, winner: str):
+        for color, me, opponent in (("white", white, black), ("black", black, white)):
+            # Vencedor "none" (W.O. duplo) conta como derrota para os dois
+            outcome = outcome_for(color, winner)
+            me.score += POINTS[outcome]
+            if outcome == "win": me.wins += 1
+            elif outcome == "draw": me.draws += 1
+            else: me.losses += 1
+            me.opponents.add(opponent.user_id)
+            me.color_balance += 1 if color == "white" else -1
+        if t.format == KNOCKOUT:
+            # Empate ou W.O. duplo: passa a melhor semente
+            if winner == "white": black.eliminated = True
+            elif winner == "black": white.eliminated = True
+            else: (black if white.seed < black.seed else white).eliminated = True
+        t._standings = None
+
+    async def _advance(self, t: Tournament):
+        standings = t.standings()
+        result_writer.submit({"tournaments": [UpdateOne(
+            {"_id": t.tournament_id}, {"$set": {"standings": standings}}
+        )]})
+        done = t.round >= t.rounds if t.format == SWISS else len(t.alive()) <= 1
+        if done:
+            await self._finish(t)
+            return
+        await self._broadcast(t, {
+            "type": "tournament_standings", "tournament_id": t.tournament_id, "round": t.round,
+            "standings": standings,
+        })
+        await self._start_round(t)
+
+    async def _finish(self, t: Tournament):
+        t.status = FINISHED
+        t.assignments = {}
+        standings = t.standings()
+        champion = standings[0] if standings else None
+        result_writer.submit({"tournaments": [UpdateOne({"_id": t.tournament_id}, {"$set": {
+            "status": t.status, "finished_at": datetime.utcnow(), "standings": standings,
+            "champion": champion and champion["id"],
+        }})]})
+        logger.info(f"Tournament {t.tournament_id} finished after {t.round} rounds")
+        await self._broadcast(t, {
+            "type": "tournament_finished", "tournament_id": t.tournament_id,
+            "champion": champion, "standings": standings,
+        })
+
+    # --- W.O. ---
+    @staticmethod
+    def _absent(slot, now: float, round_elapsed: float) -> bool:
+        # Nunca apareceu (W.O.) ou saiu e não voltou a tempo
+        if not slot.joined: return round_elapsed >= NO_SHOW_TIMEOUT
+        return slot.ws is None and slot.left_at is not None and now - slot.left_at >= DISCONNECT_TIMEOUT
+
+    async def sweep_no_shows(self):
+        now = time.monotonic()
+        for t in list(self.tournaments.values()):
+            if t.status != RUNNING: continue
+            round_elapsed = now - t.round_started_at
+            for game_id in list(t.round_games):
+                game = game_manager.active_games.get(game_id)
+                if game is None: continue
+                white_gone = self._absent(game.white, now, round_elapsed)
+                black_gone = self._absent(game.black, now, round_elapsed)
+                if not (white_gone or black_gone): continue
+                winner = "none" if white_gone and black_gone else "black" if white_gone else "white"
+                left = (white_gone and game.white.joined) or (black_gone and game.black.joined)
+                # Mesmo caminho de um fim de partida normal: estatísticas + avanço da rodada
+                await game_manager.broadcast_game_over(game_id, winner, "abandoned" if left else "no_show")
+
+    # --- INSCRITOS NO CANAL /ws/tournament ---
+    def subscribe(self, t: Tournament, user_id: str, websocket: WebSocket):
+        t.subscribers.setdefault(user_id, set()).add(websocket)
+        self.sockets[websocket] = (t.tournament_id, user_id)
+
+    def unsubscribe(self, websocket: WebSocket):
+        tournament_id, user_id = self.sockets.pop(websocket, (None, None))
+        t = self.tournaments.get(tournament_id)
+        if t is None: return
+        sockets = t.subscribers.get(user_id)
+        if sockets:
+            sockets.discard(websocket)
+            if not sockets: del t.subscribers[user_id]
+
+    async def _send(self, websocket: WebSocket, text: str):
+        try: await asyncio.wait_for(websocket.send_text(text), SEND_TIMEOUT)
+        except Exception: SEND_FAILURES.labels("tournament").inc()
+
+    async def _send_user(self, t: Tournament, user_id: str, text: str):
+        for ws in list(t.subscribers.get(user_id, ())): await self._send(ws, text)
+
+    async def _broadcast(self, t: Tournament, message: dict):
+        # Serializa uma vez para todos os inscritos
+        text = json.dumps(message, default=str)
+        await asyncio.gather(*(self._send(ws, text) for sockets in list(t.subscribers.values()) for ws in list(sockets)))
+
+    # --- TAREFA DE FUNDO ---
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(NO_SHOW_SWEEP_INTERVAL)
+            try: await self.sweep_no_shows()
+            except Exception as e: logger.error(f"Tournament no-show sweep error: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+
+tournament_manager = TournamentManager()
+game_manager.add_game_over_listener(tournament_manager.on_game_over)
+
+TOURNAMENT_GAMES.set_function(lambda: sum(len(t.round_games) for t in tournament_manager.tournaments.values()))
@@ -0,0 +1,284 @@
+"""
+Estatísticas por usuário mantidas de forma incremental no fim de cada partida.
+
+Cada partida finalizada vira um documento em `games`; o documento de `user_stats` de cada
+jogador (mesmo _id do usuário) é atualizado por um update em pipeline, então o /me lê
+um único documento pelo _id, não importa quantas partidas o usuário tenha. As escritas
+saem em lote pelo escritor de resultados (app.services.result_writer).
+
+Para reconstruir user_stats a partir de `games` (ex.: após mudar o formato):
+
+    python -m app.services.user_stats --backfill
+"""
+import argparse
+import logging
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from app.db import db
+from app.services.etags import bump_leaderboard_op
+from app.services.game_session import GameSession, OPPONENT
+
+logger = logging.getLogger(__name__)
+
+RECENT_GAMES = 10
+OUTCOME_FIELDS = {"win": "wins", "loss": "losses", "draw": "draws"}
+
+# Campos devolvidos pelo /me
+STATS_PROJECTION = {
+    "_id": 0, "by_color": 1, "by_reason": 1, "streak": 1, "best_win_streak": 1,
+    "avg_duration": 1, "recent": 1,
+}
+
+
+def _object_id(user_id):
+    # Jogadores anônimos (ou ids de teste) não têm estatísticas
+    if not user_id or not ObjectId.is_valid(str(user_id)): return None
+    return ObjectId(str(user_id))
+
+
+def game_document(game: GameSession, winner: str, reason: str, ended_at: datetime) -> dict:
+    return {
+        "game_id": game.game_id,
+        "white": {"user_id": _object_id(game.white.user_id), "name": game.white.name},
+        "black": {"user_id": _object_id(game.black.user_id), "name": game.black.name},
+        "winner": winner,
+        "reason": reason,
+        "started_at": game.start_time,
+        "ended_at": ended_at,
+        "duration": (ended_at - game.start_time).total_seconds(),
+    }
+
+
+def outcome_for(color: str, winner: str) -> str:
+    if winner == "draw": return "draw"
+    return "win" if winner == color else "loss"
+
+
+def _inc(path: str, amount=1) -> dict:
+    return {"$add": [{"$ifNull": [f"${path}", 0]}, amount]}
+
+
+def stats_update(outcome: str, color: str, reason: str, duration: float, entry: dict, now: datetime) -> list:
+    """
+    Update em pipeline: contadores, sequência atual, recorde e últimas partidas num único comando.
+
+    Idempotente por partida: se `entry["game_id"]` já está em `recent` (nova tentativa do
+    escritor de resultados, ou partida já contada pelo backfill), o documento fica como está.
+    Escreve sempre todas as chaves de by_color/by_reason, no mesmo formato do backfill.
+    """
+    field = OUTCOME_FIELDS[outcome]
+    counters = {"games": _inc("games")}
+    for name in OUTCOME_FIELDS.values():
+        counters[name] = _inc(name, int(name == field))
+        counters[f"by_reason.{reason}.{name}"] = _inc(f"by_reason.{reason}.{name}", int(name == field))
+    for side in ("white", "black"):
+        counters[f"by_color.{side}.games"] = _inc(f"by_color.{side}.games", int(side == color))
+        for name in OUTCOME_FIELDS.values():
+            counters[f"by_color.{side}.{name}"] = _inc(f"by_color.{side}.{name}", int(side == color and name == field))
+
+    changes = {
+        **counters,
+        "total_duration": _inc("total_duration", duration),
+        # Mesmo resultado da partida anterior estende a sequência; senão recomeça
+        "streak": {"$cond": [
+            {"$eq": ["$streak.type", outcome]},
+            {"type": outcome, "length": _inc("streak.length")},
+            {"type": outcome, "length": 1},
+        ]},
+        # Mais recente primeiro; $literal evita que strings com "$" virem caminhos de campo
+        "recent": {"$slice": [{"$concatArrays": [[{"$literal": entry}], {"$ifNull": ["$recent", []]}]}, RECENT_GAMES]},
+        "updated_at": {"$literal": now},
+    }
+    return [
+        {"$set": {"_applied": {"$in": [entry["game_id"], {"$ifNull": ["$recent.game_id", []]}]}}},
+        {"$set": {path: {"$cond": ["$_applied", f"${path}", value]} for path, value in changes.items()}},
+        # Recalculados a partir dos campos acima: também não mudam numa repetição
+        {"$set": {
+            "best_win_streak": {"$max": [
+                {"$ifNull": ["$best_win_streak", 0]},
+                {"$cond": [{"$eq": ["$streak.type", "win"]}, "$streak.length", 0]},
+            ]},
+            "avg_duration": {"$divide": ["$total_duration", "$games"]},
+        }},
+        {"$unset": "_applied"},
+    ]
+
+
+def game_result_ops(doc: dict) -> dict:
+    """
+    Operações (por coleção) que gravam a partida e atualizam os dois jogadores.
+    Entregues ao escritor de resultados, que junta as de várias partidas num bulk_write.
+    A ordem das chaves importa: o ranking só muda de geração depois dos contadores.
+
+    Todas são idempotentes por game_id (o escritor reenvia lotes após falhas transitórias):
+    `games` é um upsert no índice único de game_id, user_stats e users ignoram partidas
+    já contadas. O incremento de geração do ranking só invalida cache a mais.
+    """
+    game_id = doc["game_id"]
+    ops = {"games": [UpdateOne(
+        {"game_id": game_id}, {"$setOnInsert": {k: v for k, v in doc.items() if k != "game_id"}}, upsert=True
+    )]}
+    now = doc["ended_at"]
+    players = {color: doc[color]["user_id"] for color in ("white", "black")}
+    # Mesma regra de antes: partidas com jogador anônimo não contam
+    if not all(players.values()): return ops
+
+    ops["user_stats"], ops["users"] = [], []
+    for color, user_oid in players.items():
+        outcome = outcome_for(color, doc["winner"])
+        entry = {
+            "game_id": doc["game_id"], "color": color, "result": outcome, "reason": doc["reason"],
+            "opponent": doc[OPPONENT[color]]["name"], "duration": doc["duration"], "ended_at": now,
+        }
+        ops["user_stats"].append(UpdateOne(
+            {"_id": user_oid},
+            stats_update(outcome, color, doc["reason"], doc["duration"], entry, now),
+            upsert=True
+        ))
+        # Contadores antigos (ranking) + updated_at, que é a versão usada no ETag do /me
+        # `counted_games` (últimas partidas somadas) impede contar a mesma partida duas vezes
+        ops["users"].append(UpdateOne(
+            {"_id": user_oid, "counted_games": {"$ne": game_id}},
+            {
+                "$inc": {OUTCOME_FIELDS[outcome]: 1, "totalGames": 1},
+                "$set": {"updated_at": now},
+                "$push": {"counted_games": {"$each": [game_id], "$slice": -RECENT_GAMES}},
+            }
+        ))
+    ops["meta"] = [bump_leaderboard_op()]
+    return ops
+
+
+def ensure_indexes():
+    # Upsert por game_id: uma partida reenviada não vira um segundo documento
+    db["games"].create_index([("game_id", ASCENDING)], unique=True)
+
+
+def empty_stats() -> dict:
+    return {"by_color": {}, "by_reason": {}, "streak": None, "best_win_streak": 0, "avg_duration": 0, "recent": []}
+
+
+def get_user_stats(user_id) -> dict:
+    return db["user_stats"].find_one({"_id": user_id}, STATS_PROJECTION) or empty_stats()
+
+
+# -----------------------------
+# Backfill (reconstrução a partir de `games`)
+# -----------------------------
+
+def _count_if(condition: dict) -> dict:
+    return {"$sum": {"$cond": [condition, 1, 0]}}
+
+
+def _backfill_row(color: str) -> dict:
+    return {
+        "user_id": f"${color}.user_id",
+        "opponent": f"${OPPONENT[color]}.name",
+        "color": {"$literal": color},
+        "result": {"$switch": {"branches": [
+            {"case": {"$eq": ["$winner", "draw"]}, "then": "draw"},
+            {"case": {"$eq": ["$winner", color]}, "then": "win"},
+        ], "default": "loss"}},
+        "game_id": "$game_id", "reason": "$reason", "duration": "$duration", "ended_at": "$ended_at",
+        "both_known": {"$and": [{"$ne": [{"$ifNull": ["$white.user_id", None]}, None]},
+                                {"$ne": [{"$ifNull": ["$black.user_id", None]}, None]}]},
+    }
+
+
+def backfill_pipeline() -> list:
+    eq = lambda a, b: {"$eq": [a, b]}
+    counters = {}
+    for field, outcome in (("wins", "win"), ("losses", "loss"), ("draws", "draw")):
+        counters[field] = _count_if(eq("$result", outcome))
+        for color in ("white", "black"):
+            counters[f"{color}_{field}"] = _count_if({"$and": [eq("$color", color), eq("$result", outcome)]})
+    for color in ("white", "black"):
+        counters[f"{color}_games"] = _count_if(eq("$color", color))
+
+    return [
+        # Uma linha por (partida, jogador), do ponto de vista de cada cor
+        {"$project": {"row": [_backfill_row(color) for color in ("white", "black")]}},
+        {"$unwind": "$row"},
+        {"$replaceRoot": {"newRoot": "$row"}},
+        {"$match": {"both_known": True}},
+        {"$sort": {"ended_at": 1}},
+        {"$group": {
+            "_id": "$user_id",
+            "games": {"$sum": 1},
+            **counters,
+            "total_duration": {"$sum": "$duration"},
+            "reasons": {"$push": {"reason": "$reason", "result": "$result"}},
+            "history": {"$push": {
+                "game_id": "$game_id", "color": "$color", "result": "$result", "reason": "$reason",
+                "opponent": "$opponent", "duration": "$duration", "ended_at": "$ended_at",
+            }},
+            "updated_at": {"$last": "$ended_at"},
+        }},
+        {"$set": {
+            # Percorre o histórico em ordem: sequência atual e maior sequência de vitórias
+            "streaks": {"$reduce": {
+                "input": "$history",
+                "initialValue": {"type": None, "length": 0, "best": 0},
+                "in": {"$let": {
+                    "vars": {"length": {"$cond": [
+                        {"$eq": ["$$value.type", "$$this.result"]}, {"$add": ["$$value.length", 1]}, 1
+                    ]}},
+                    "in": {
+                        "type": "$$this.result",
+                        "length": "$$length",
+                        "best": {"$max": ["$$value.best", {"$cond": [{"$eq": ["$$this.result", "win"]}, "$$length", 0]}]},
+                    },
+                }},
+            }},
+        }},
+        {"$project": {
+            "games": 1, "wins": 1, "losses": 1, "draws": 1, "total_duration": 1, "updated_at": 1,
+            "avg_duration": {"$divide": ["$total_duration", "$games"]},
+            "by_color": {color: {
+                "games": f"${color}_games", "wins": f"${color}_wins",
+                "losses": f"${color}_losses", "draws": f"${color}_draws",
+            } for color in ("white", "black")},
+            "by_reason": {"$arrayToObject": {"$map": {
+                "input": {"$setUnion": ["$reasons.reason", []]},
+                "as": "reason",
+                "in": {"k": "$$reason", "v": {"$arrayToObject": {"$map": {
+                    "input": [["wins", "win"], ["losses", "loss"], ["draws", "draw"]],
+                    "as": "pair",
+                    "in": {"k": {"$arrayElemAt": ["$$pair", 0]}, "v": {"$size": {"$filter": {
+                        "input": "$reasons",
+                        "cond": {"$and": [{"$eq": ["$$this.reason", "$$reason"]},
+                                          {"$eq": ["$$this.result", {"$arrayElemAt": ["$$pair", 1]}]}]},
+                    }}}},
+                }}}},
+            }}},
+            "streak": {"type": "$streaks.type", "length": "$streaks.length"},
+            "best_win_streak": "$streaks.best",
+            "recent": {"$reverseArray": {"$slice": ["$history", -RECENT_GAMES]}},
+        }},
+        {"$merge": {"into": "user_stats", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+def backfill():
+    """Reconstrói user_stats inteiro a partir de `games` (o servidor Mongo faz todo o trabalho)."""
+    started = datetime.utcnow()
+    db["games"].aggregate(backfill_pipeline(), allowDiskUse=True)
+    users = db["user_stats"].count_documents({})
+    logger.info(f"user_stats backfill: {users} users in {(datetime.utcnow() - started).total_seconds():.1f}s")
+    return users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="reconstrói user_stats a partir de games")
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+        return
+    logging.basicConfig(level=logging.INFO)
+    print(f"{backfill()} documentos em user_stats")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+import os
+import time
+from app.cloudfare import r2_service
+from app.db import db, MONGO_MIN_POOL
+from app.services.avatar_images import prestart_process_pool
+
+logger = logging.getLogger(__name__)
+
+# WARMUP=1 faz o worker só ficar pronto depois de abrir conexões e montar clients
+WARMUP_ENABLED = os.getenv("WARMUP", "0") == "1"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 20))
+
+
+def _ping_mongo():
+    db.command("ping")
+
+
+def _prime_ranking():
+    # Traz o índice/páginas do ranking para o cache do servidor Mongo
+    list(db["users"].find({}, {"_id": 1, "wins": 1}).sort("wins", -1).limit(10))
+
+
+async def warm_up():
+    """Pré-conecta o pool do Mongo e inicializa clients caros antes de aceitar tráfego."""
+    started = time.perf_counter()
+    # Pings concorrentes abrem conexões em paralelo no pool
+    connections = max(1, MONGO_MIN_POOL)
+    steps = [asyncio.to_thread(_ping_mongo) for _ in range(connections)] + [
+        asyncio.to_thread(_prime_ranking),
+        asyncio.to_thread(lambda: r2_service.s3_client),
+        asyncio.to_thread(prestart_process_pool),
+    ]
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*steps, return_exceptions=True), WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Warmup timed out after {WARMUP_TIMEOUT}s; starting anyway")
+        return
+    for error in (r for r in results if isinstance(r, Exception)):
+        logger.warning(f"Warmup step failed: {error}")
+    logger.info(f"Warmup finished in {(time.perf_counter() - started) * 1000:.0f}ms")
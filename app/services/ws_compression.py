@@ -0,0 +1,62 @@
+import os
+from uvicorn.protocols.websockets.websockets_impl import WebSocketProtocol
+from websockets.exceptions import NegotiationError
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import Opcode
+
+# -----------------------------
+# permessage-deflate seletivo para os WebSockets
+# -----------------------------
+# Só os endpoints com mensagens grandes negociam compressão (chat e estado do jogo);
+# matchmaking e outros nem alocam o compressor. Mensagens pequenas saem sem compressão
+# (RSV1 desligado), o que a RFC 7692 permite mesmo com a extensão negociada.
+
+WS_COMPRESS_MIN_SIZE = int(os.getenv("WS_COMPRESS_MIN_SIZE", 256))
+COMPRESSED_PATHS = ("/ws/chat", "/ws/game/")
+# Janela e memLevel reduzidos: ~8x menos memória por socket que o padrão do zlib
+SERVER_MAX_WINDOW_BITS = 12
+COMPRESS_SETTINGS = {"memLevel": 5}
+
+
+class SelectivePerMessageDeflate(PerMessageDeflate):
+    def __init__(self, *args, min_size: int = WS_COMPRESS_MIN_SIZE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.min_size = min_size
+
+    def encode(self, frame):
+        # Mensagem inteira num único frame e pequena: comprimir custaria mais CPU do que economiza
+        if frame.fin and frame.opcode in (Opcode.TEXT, Opcode.BINARY) and len(frame.data) < self.min_size:
+            return frame
+        return super().encode(frame)
+
+
+class SelectiveDeflateFactory(ServerPerMessageDeflateFactory):
+    def __init__(self):
+        super().__init__(server_max_window_bits=SERVER_MAX_WINDOW_BITS, compress_settings=COMPRESS_SETTINGS)
+        self.enabled = False
+
+    def process_request_params(self, params, accepted_extensions):
+        if not self.enabled:
+            raise NegotiationError("compression disabled for this endpoint")
+        response_params, ext = super().process_request_params(params, accepted_extensions)
+        return response_params, SelectivePerMessageDeflate(
+            ext.remote_no_context_takeover,
+            ext.local_no_context_takeover,
+            ext.remote_max_window_bits,
+            ext.local_max_window_bits,
+            self.compress_settings,
+        )
+
+
+class SelectiveDeflateProtocol(WebSocketProtocol):
+    """Protocolo WebSocket do uvicorn com a negociação de compressão decidida pelo path."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deflate_factory = SelectiveDeflateFactory()
+        self.available_extensions = [self.deflate_factory] if self.config.ws_per_message_deflate else []
+
+    async def process_request(self, path, request_headers):
+        # Chamado antes da negociação das extensões no handshake
+        self.deflate_factory.enabled = any(p in path for p in COMPRESSED_PATHS)
+        return await super().process_request(path, request_headers)
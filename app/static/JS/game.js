@@ -23,6 +23,11 @@ let isMyTurn = false;
 let chainPiece = null;
 let isGameOver = false;
 
+// Reinício do servidor: o aviso "reconnect" (ou o código 1012) diz quando tentar de novo
+let serverRestarting = false;
+let reconnectDelay = 2000;
+let reconnectAttempts = 0;
+
 // WebRTC
 let localStream = null;
 let peerConnection = null;
@@ -214,6 +219,8 @@ function initGameConnection() {
     gameSocket = new WebSocket(wsUrl);
 
     gameSocket.onopen = () => { 
+        serverRestarting = false;
+        reconnectAttempts = 0;
         const statusBadge = document.getElementById('statusText');
         if(statusBadge) {
             statusBadge.textContent = "Online";
@@ -222,31 +229,46 @@ function initGameConnection() {
         setTimeout(() => { 
             if(!currentBoard) gameSocket.send(JSON.stringify({type:"request_state"})); 
             // Se sou brancas, inicio WebRTC
-            if(myColor === 'white') startWebRTC();
+            if(myColor === 'white' && !peerConnection) startWebRTC();
         }, 1000);
     };
 
     gameSocket.onmessage = (event) => {
         try {
             const data = JSON.parse(event.data);
-            if (data.type === 'update') handleGameUpdate(data);
+            if (data.type === 'ping') gameSocket.send(JSON.stringify({ type: 'pong', id: data.id }));
+            else if (data.type === 'update') handleGameUpdate(data);
             else if (data.type === 'game_over') handleGameOver(data);
             else if (data.type === 'chat') handleIncomingMatchMessage(data);
             else if (data.type === 'signal') handleWebRTCSignal(data);
+            else if (data.type === 'reconnect') {
+                serverRestarting = true;
+                reconnectDelay = data.retry_after_ms || reconnectDelay;
+            }
         } catch(e) {}
     };
     
-    gameSocket.onclose = () => {
+    gameSocket.onclose = (event) => {
         if(!isGameOver) {
             const statusBadge = document.getElementById('statusText');
             if(statusBadge) {
                 statusBadge.textContent = "Offline";
                 statusBadge.className = "badge bg-danger shadow-sm ms-2";
             }
+            // O estado da partida foi salvo: reconecta (no worker novo) e recebe o tabuleiro de volta
+            if (event.code === 1012) serverRestarting = true;
+            if (serverRestarting) scheduleReconnect(initGameConnection);
         }
     };
 }
 
+function scheduleReconnect(connect) {
+    if (reconnectAttempts >= 8) return;
+    const delay = Math.min(30000, reconnectDelay * 2 ** reconnectAttempts);
+    reconnectAttempts++;
+    setTimeout(connect, delay);
+}
+
 // ... (WebRTC e Chat mantidos iguais) ...
 async function startWebRTC() {
     createPeerConnection();
@@ -304,10 +326,14 @@ function initGlobalChat() {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
     const wsUrl = `${protocol}//${window.location.host}/api/ws/chat`;
     globalChatSocket = new WebSocket(wsUrl);
+    globalChatSocket.onclose = (event) => {
+        if (event.code === 1012) setTimeout(initGlobalChat, 2000 + Math.random() * 3000);
+    };
     globalChatSocket.onmessage = (event) => {
         try {
             const data = JSON.parse(event.data);
-            if(data.type === 'count') return;
+            if(data.type === 'ping') { globalChatSocket.send(JSON.stringify({ type: 'pong', id: data.id })); return; }
+            if(data.type === 'count' || data.type === 'reconnect') return;
             if(data.type === 'chat' || data.text) { 
                 const text = data.text;
                 const senderName = data.username || "Anônimo";
@@ -2,6 +2,9 @@
 
 let chatSocket = null;
 let matchmakingSocket = null;
+// Atraso sugerido pelo servidor ao reiniciar (mensagem "reconnect")
+let matchmakingRetryMs = null;
+let chatRetryMs = null;
 let currentUserData = null;
 
 document.addEventListener('DOMContentLoaded', async function() {
@@ -109,6 +112,18 @@ function toggleMatchmaking() {
     matchmakingSocket.onmessage = (event) => {
         const data = JSON.parse(event.data);
         
+        // Responde ao ping do servidor (sem resposta, a fila nos remove)
+        if (data.type === 'ping') {
+            matchmakingSocket.send(JSON.stringify({ type: 'pong', id: data.id }));
+            return;
+        }
+
+        // Servidor reiniciando: volta para a fila quando o socket fechar
+        if (data.type === 'reconnect') {
+            matchmakingRetryMs = data.retry_after_ms;
+            return;
+        }
+
         if (data.type === 'match_found') {
             console.log("⚔️ Partida encontrada!", data);
             sessionStorage.setItem('current_game_id', data.game_id);
@@ -125,9 +140,15 @@ function toggleMatchmaking() {
         }
     };
 
-    matchmakingSocket.onclose = () => {
-        console.log("Fila cancelada.");
+    matchmakingSocket.onclose = (event) => {
         matchmakingSocket = null;
+        if (event.code === 1012 && btnText && btnText.innerHTML.includes('Buscando')) {
+            const delay = matchmakingRetryMs || 2000 + Math.random() * 3000;
+            matchmakingRetryMs = null;
+            setTimeout(() => { if (!matchmakingSocket) toggleMatchmaking(); }, delay);
+            return;
+        }
+        console.log("Fila cancelada.");
         if(btnText && btnText.innerHTML.includes('Buscando')) {
             btnText.innerHTML = 'Buscar Partida';
             btnText.classList.remove('btn-primary');
@@ -186,7 +207,13 @@ function connectChatWebSocket(url) {
         try {
             const data = JSON.parse(event.data);
             
-            if (data.type === 'count') {
+            if (data.type === 'ping') {
+                chatSocket.send(JSON.stringify({ type: 'pong', id: data.id }));
+            }
+            else if (data.type === 'reconnect') {
+                chatRetryMs = data.retry_after_ms;
+            }
+            else if (data.type === 'count') {
                 updateOnlineCounter(data.count);
             } 
             else if (data.type === 'chat') {
@@ -204,7 +231,8 @@ function connectChatWebSocket(url) {
         const statusBadge = document.querySelector('.chat-header .badge');
         if(statusBadge) statusBadge.classList.replace('bg-success', 'bg-danger');
         updateOnlineCounter("...");
-        setTimeout(() => connectChatWebSocket(url), 3000);
+        setTimeout(() => connectChatWebSocket(url), chatRetryMs || 3000);
+        chatRetryMs = null;
     };
 }
 
@@ -1,3 +1,7 @@
+// Acima deste tamanho o upload é feito em partes (multipart)
+const MULTIPART_THRESHOLD = 64 * 1024 * 1024;
+const MULTIPART_CONCURRENCY = 4;
+
 class ScreenRecorder {
     constructor() {
         this.mediaRecorder = null;
@@ -133,6 +137,11 @@ class ScreenRecorder {
     }
 
     async uploadRecording(videoBlob, metadata) {
+        // Arquivos grandes vão em partes paralelas (uma falha só reenvia a parte)
+        if (videoBlob.size > MULTIPART_THRESHOLD) {
+            return await this.uploadMultipart(videoBlob, metadata);
+        }
+
         // 1. Pede a URL assinada (AGORA COM AUTH)
         const req = await fetch('/api/upload/request-url', {
             method: 'POST',
@@ -163,9 +172,77 @@ class ScreenRecorder {
 
         if (!uploadResponse.ok) throw new Error('Falha ao enviar o arquivo de vídeo para o storage');
 
+        // 3. Avisa o backend para confirmar o arquivo no storage
+        await fetch(`/api/upload/${data.recording_id}/uploaded`, { method: 'POST', credentials: 'include' })
+            .catch(() => {});
+
         return data;
     }
 
+    async uploadMultipart(videoBlob, metadata) {
+        const api = async (url, options = {}) => {
+            const res = await fetch(url, {
+                credentials: 'include',
+                headers: { 'Content-Type': 'application/json' },
+                ...options
+            });
+            if (!res.ok) throw new Error(`Erro na API de Upload (${res.status}): ${await res.text()}`);
+            return res.json();
+        };
+
+        const init = await api('/api/upload/multipart/initiate', {
+            method: 'POST',
+            body: JSON.stringify(metadata)
+        });
+        const base = `/api/upload/multipart/${init.recording_id}`;
+        const partNumbers = Array.from({ length: init.part_count }, (_, i) => i + 1);
+        const etags = {};
+
+        try {
+            // URLs pedidas em lotes; cada lote é enviado com MULTIPART_CONCURRENCY partes simultâneas
+            for (let i = 0; i < partNumbers.length; i += 100) {
+                const batch = partNumbers.slice(i, i + 100);
+                const { urls } = await api(`${base}/part-urls`, {
+                    method: 'POST',
+                    body: JSON.stringify({ part_numbers: batch })
+                });
+                const queue = [...urls];
+                const worker = async () => {
+                    while (queue.length) {
+                        const { part_number, url } = queue.shift();
+                        const start = (part_number - 1) * init.part_size;
+                        const chunk = videoBlob.slice(start, start + init.part_size);
+                        etags[part_number] = await this.uploadPart(url, chunk);
+                    }
+                };
+                await Promise.all(Array.from({ length: MULTIPART_CONCURRENCY }, worker));
+            }
+
+            const parts = partNumbers.map(n => ({ part_number: n, etag: etags[n] }));
+            await api(`${base}/complete`, { method: 'POST', body: JSON.stringify({ parts }) });
+        } catch (error) {
+            await fetch(base, { method: 'DELETE', credentials: 'include' }).catch(() => {});
+            throw error;
+        }
+
+        return init;
+    }
+
+    async uploadPart(url, chunk, attempts = 3) {
+        for (let attempt = 1; ; attempt++) {
+            try {
+                const res = await fetch(url, { method: 'PUT', body: chunk });
+                // O bucket precisa expor o header ETag no CORS
+                const etag = res.headers.get('ETag');
+                if (res.ok && etag) return etag;
+                throw new Error(`Falha ao enviar parte (${res.status})`);
+            } catch (error) {
+                if (attempt >= attempts) throw error;
+                await new Promise(r => setTimeout(r, 500 * 2 ** attempt));
+            }
+        }
+    }
+
     cleanup() {
         this.recordedChunks = [];
         this.isRecording = false;
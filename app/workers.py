@@ -0,0 +1,12 @@
+from uvicorn.workers import UvicornWorker
+from app.services.ws_compression import SelectiveDeflateProtocol
+
+
+class PWUvicornWorker(UvicornWorker):
+    """Worker do gunicorn com permessage-deflate seletivo nos WebSockets (ver app/services/ws_compression.py)"""
+
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "ws": SelectiveDeflateProtocol,
+        "ws_per_message_deflate": True,
+    }
@@ -0,0 +1,62 @@
+"""
+Revisão de partida: uma avaliação vetorizada para todas as folhas x uma chamada por posição.
+
+Gera uma partida aleatória (semente fixa) e mede review_game contra a mesma busca
+avaliando as folhas de cada posição separadamente.
+
+    python -m benchmarks.analysis --moves 60 --depth 2
+"""
+import argparse
+import random
+import time
+
+from app.services.analysis import (
+    analyse_positions, legal_moves, play, review_game, position_from_wire
+)
+
+
+def random_game(moves: int, seed: int):
+    random.seed(seed)
+    position, steps = position_from_wire(None), []
+    for _ in range(moves):
+        legal = legal_moves(*position)
+        if not legal: break
+        move = random.choice(legal)
+        steps.append({"from": move[0], "to": move[1]})
+        position = play(position, move)
+    return steps
+
+
+def per_position(steps, depth: int):
+    position = position_from_wire(None)
+    for step in steps:
+        analyse_positions([position], depth)
+        move = next(m for m in legal_moves(*position) if m[0] == step["from"] and m[1] == step["to"])
+        position = play(position, move)
+
+
+def timed(fn, *args, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat): fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--moves", type=int, default=60)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    steps = random_game(args.moves, args.seed)
+    batched = timed(lambda: review_game(steps, position_from_wire(None), args.depth), repeat=args.repeat)
+    separate = timed(per_position, steps, args.depth, repeat=args.repeat)
+    print(f"{len(steps)} lances, profundidade {args.depth}")
+    print(f"  uma avaliação por posição  {separate:8.1f} ms")
+    print(f"  avaliação única em lote    {batched:8.1f} ms")
+    print(f"  ganho: {separate / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
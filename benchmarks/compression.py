@@ -0,0 +1,132 @@
+"""
+Custo de CPU x bytes economizados na compressão de payloads reais do app.
+
+Compara, para cada payload (estado do jogo, mensagem de chat, /my-recordings, /ranking):
+  - deflate "por mensagem" (permessage-deflate sem context takeover)
+  - deflate com context takeover (o mesmo compressor para uma sequência de mensagens,
+    como o websockets usa por padrão)
+  - gzip e brotli (compressão HTTP)
+
+    python -m benchmarks.compression
+"""
+import argparse
+import gzip
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from benchmarks.perft import parse_position
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def game_update(position: str = "middlegame") -> dict:
+    return {
+        "type": "update",
+        "board": parse_position(position)["board"],
+        "turn": "white",
+        "chain_piece": None,
+        "last_move_from": {"r": 5, "c": 4},
+        "last_move_to": {"r": 4, "c": 3},
+        "sound": "move",
+        "players": {
+            "white": {"name": "Maria Silva", "email": "maria@example.com", "id": "65f0c1a2b3c4d5e6f7a8b9c0"},
+            "black": {"name": "João Souza", "email": "joao@example.com", "id": "65f0c1a2b3c4d5e6f7a8b9c1"},
+        },
+    }
+
+
+def recordings(n: int = 50) -> list:
+    base = datetime(2025, 3, 1)
+    return [{
+        "_id": f"65f0c1a2b3c4d5e6f7a8{i:04x}",
+        "recording_id": f"1b4e28ba-2fa1-11d2-883f-0016d3cc{i:04x}",
+        "user_id": "65f0c1a2b3c4d5e6f7a8b9c0",
+        "user_email": "maria@example.com",
+        "title": f"Partida contra João #{i}",
+        "duration": 300 + i * 7,
+        "players": [
+            {"email": "maria@example.com", "name": "Maria Silva", "role": "white", "result": "win" if i % 2 else "loss"},
+            {"email": "joao@example.com", "name": "João Souza", "role": "black", "result": "loss" if i % 2 else "win"},
+        ],
+        "game_type": "checkers_match",
+        "file_key": f"users/maria_at_example_com/recording_20250301_1200{i:02d}_ab{i:04x}.webm",
+        "file_size": 40_000_000 + i * 12345,
+        "public_url": f"https://pub-de94145f5f0e4c39b93b6db978cc0969.r2.dev/users/maria_at_example_com/recording_{i}.webm",
+        "status": "verified",
+        "created_at": (base + timedelta(hours=i)).isoformat(),
+        "updated_at": (base + timedelta(hours=i)).isoformat(),
+    } for i in range(n)]
+
+
+def ranking() -> list:
+    return [{
+        "name": f"Jogador {i}",
+        "avatar": f"https://pw.jan.bortolanza.vms.ufsc.br/images/avatars/custom/{i:032x}_64.webp",
+        "wins": 100 - i,
+        "totalGames": 150 - i,
+    } for i in range(10)]
+
+
+PAYLOADS = {
+    "game_update": lambda: json.dumps(game_update()).encode(),
+    "chat_message": lambda: json.dumps({"type": "chat", "username": "Maria", "text": "boa partida!"}).encode(),
+    "my_recordings_50": lambda: json.dumps(recordings()).encode(),
+    "ranking_10": lambda: json.dumps(ranking()).encode(),
+}
+
+
+def deflate_once(data: bytes) -> bytes:
+    c = zlib.compressobj(6, zlib.DEFLATED, -12, 5)
+    return c.compress(data) + c.flush(zlib.Z_SYNC_FLUSH)
+
+
+def timed(fn, data: bytes, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat): out = fn(data)
+    return len(out), (time.perf_counter() - start) / repeat * 1e6
+
+
+def context_takeover(messages) -> tuple:
+    """Bytes médios por mensagem reutilizando o compressor (como numa partida real)."""
+    c = zlib.compressobj(6, zlib.DEFLATED, -12, 5)
+    total = 0
+    start = time.perf_counter()
+    for m in messages: total += len(c.compress(m) + c.flush(zlib.Z_SYNC_FLUSH))
+    return total / len(messages), (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    codecs = [("deflate", deflate_once), ("gzip-6", lambda d: gzip.compress(d, 6, mtime=0))]
+    if brotli: codecs.append(("brotli-4", lambda d: brotli.compress(d, quality=4)))
+
+    print(f"{'payload':18} {'bytes':>7} {'codec':>10} {'saída':>7} {'razão':>6} {'µs/op':>8} {'bytes salvos/µs':>16}")
+    for name, build in PAYLOADS.items():
+        data = build()
+        for codec, fn in codecs:
+            size, us = timed(fn, data, args.repeat)
+            saved = len(data) - size
+            print(f"{name:18} {len(data):>7} {codec:>10} {size:>7} {size / len(data):>6.2f} {us:>8.1f} {saved / us:>16.1f}")
+
+    # Sequência de atualizações de uma partida: o contexto compartilhado aproveita a repetição
+    updates = []
+    for i in range(60):
+        msg = game_update("middlegame" if i % 2 else "initial")
+        msg["turn"] = "white" if i % 2 else "black"
+        updates.append(json.dumps(msg).encode())
+    avg_raw = sum(map(len, updates)) / len(updates)
+    avg_ctx, us_ctx = context_takeover(updates)
+    print(f"\n60 updates de jogo: {avg_raw:.0f} B/msg sem compressão, "
+          f"{avg_ctx:.0f} B/msg com context takeover ({us_ctx:.1f} µs/msg)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Substituto em memória do banco Mongo para benchmarks (não é um mock completo).
+
+Suporta o subconjunto usado pelas rotas: igualdade simples nos filtros, $set/$inc/$unset,
+sort/limit e inserts. Filtros com operadores ($in, $lte...) simplesmente não casam com nada,
+o que mantém as tarefas de fundo ociosas durante a medição.
+"""
+from bson import ObjectId
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, expected in query.items():
+        if key.startswith("$") or isinstance(expected, dict): return False
+        if doc.get(key) != expected: return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction=1):
+        self.docs.sort(key=lambda d: d.get(key) or 0, reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        if n: self.docs = self.docs[:n]
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([dict(d) for d in self.docs if _matches(d, query or {})])
+
+    def find_one(self, query=None, projection=None):
+        return next(iter(self.find(query)), None)
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+
+    def insert_many(self, docs):
+        for doc in docs: self.insert_one(doc)
+
+    def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if _matches(doc, query):
+                self._apply(doc, update)
+                return
+        if upsert:
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            self._apply(doc, update)
+            self.insert_one(doc)
+
+    def update_many(self, query, update):
+        for doc in self.docs:
+            if _matches(doc, query): self._apply(doc, update)
+
+    def bulk_write(self, ops, ordered=True):
+        pass
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def _apply(self, doc, update):
+        if isinstance(update, list): return  # updates em pipeline não são simulados
+        for k, v in update.get("$set", {}).items(): doc[k] = v
+        for k, v in update.get("$inc", {}).items(): doc[k] = doc.get(k, 0) + v
+        for k in update.get("$unset", {}): doc.pop(k, None)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def command(self, *args, **kwargs):
+        return {"ok": 1}
+
+
+class FakeClient:
+    """Ocupa o lugar do MongoClient em app.db: todo client[nome] aponta para o mesmo banco em memória."""
+
+    def __init__(self):
+        self.database = FakeDatabase()
+
+    def __getitem__(self, name):
+        return self.database
+
+    def close(self):
+        pass
@@ -0,0 +1,102 @@
+"""
+Memória por partida em andamento: GameSession (slots + bytearray) x o dict antigo.
+
+O formato antigo é reconstruído aqui (dict com chaves f"{cor}_campo" e uma dict por peça)
+só para comparação. Também mede o custo de montar e serializar a mensagem de estado.
+
+    python -m benchmarks.game_memory --games 10000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from app.services.game_manager import GameManager
+from app.services.game_session import GameSession, board_to_wire
+
+
+def legacy_game() -> dict:
+    board = [[None] * 8 for _ in range(8)]
+    for r in range(8):
+        for c in range(8):
+            if (r + c) % 2 == 1:
+                if r < 3: board[r][c] = {"color": "black", "king": False}
+                elif r > 4: board[r][c] = {"color": "white", "king": False}
+    return {
+        "white_ws": None, "black_ws": None,
+        "white_user_id": None, "black_user_id": None,
+        "white_name": "Aguardando...", "white_email": "",
+        "black_name": "Aguardando...", "black_email": "",
+        "turn": "white",
+        "board": board,
+        "chain_piece": None,
+        "last_move_from": None,
+        "last_move_to": None,
+        "last_sound": "start",
+        "start_time": datetime.utcnow(),
+    }
+
+
+def measure(factory, count: int) -> float:
+    """Bytes alocados por partida (inclui a chave no dict de partidas ativas)."""
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = {game_id: factory(game_id) for game_id in ids}
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) / count
+
+
+def legacy_state_msg(game: dict) -> dict:
+    return {
+        "type": "update", "board": game["board"], "turn": game["turn"], "chain_piece": game["chain_piece"],
+        "last_move_from": game["last_move_from"], "last_move_to": game["last_move_to"], "sound": game.get("last_sound"),
+        "players": {
+            c: {"name": game[f"{c}_name"], "email": game.get(f"{c}_email", ""), "id": game[f"{c}_user_id"]}
+            for c in ("white", "black")
+        },
+    }
+
+
+def per_call_ns(fn, arg, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number): fn(arg)
+    return (time.perf_counter() - start) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    legacy = measure(lambda _: legacy_game(), args.games)
+    compact = measure(GameSession, args.games)
+    print(f"{'formato':14} {'bytes/partida':>14} {'partidas/GiB':>14}")
+    for label, size in (("dict antigo", legacy), ("GameSession", compact)):
+        print(f"{label:14} {size:>14,.0f} {2 ** 30 / size:>14,.0f}")
+    print(f"redução: {legacy / compact:.1f}x")
+
+    engine = GameManager()
+    print("\nmensagem de estado (ns/chamada):")
+    print(f"  dict antigo   {per_call_ns(legacy_state_msg, legacy_game(), args.number):>8.0f}")
+    print(f"  GameSession   {per_call_ns(engine._build_state_msg, GameSession('bench'), args.number):>8.0f}")
+    print(f"  board_to_wire {per_call_ns(board_to_wire, GameSession('bench').board, args.number):>8.0f}")
+
+    # Broadcast: antes cada send_json serializava de novo; agora é uma serialização por lance
+    dumps = lambda m: json.dumps(m, separators=(",", ":"), ensure_ascii=False)
+    old = lambda g: [dumps(legacy_state_msg(g)) for _ in range(2)]
+    new = lambda g: dumps(engine._build_state_msg(g))
+    print("\nbroadcast para 2 jogadores (ns/lance):")
+    print(f"  dict antigo   {per_call_ns(old, legacy_game(), args.number // 10):>8.0f}")
+    print(f"  GameSession   {per_call_ns(new, GameSession('bench'), args.number // 10):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
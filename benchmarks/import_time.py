@@ -0,0 +1,50 @@
+"""
+Verifica o orçamento de tempo de import do app (o boot do worker depende disso).
+
+Roda `python -X importtime -c "import app.main"` num processo limpo, mostra os módulos
+mais caros e sai com código 1 se o tempo acumulado de app.main passar do orçamento.
+
+    python -m benchmarks.import_time --budget-ms 1500
+"""
+import argparse
+import subprocess
+import sys
+
+
+def measure(module: str):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        sys.exit(f"falha ao importar {module}:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        _, self_us, cumulative_us, name = [p.strip() for p in line.replace("import time:", "|").split("|")]
+        rows.append((int(self_us), int(cumulative_us), name))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    total_ms = next(cum for _, cum, name in rows if name == args.module) / 1000
+
+    print(f"{'cumulativo (ms)':>16} {'próprio (ms)':>13}  módulo")
+    for self_us, cum_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{cum_us / 1000:>16.1f} {self_us / 1000:>13.1f}  {name.strip()}")
+
+    print(f"\nimport {args.module}: {total_ms:.0f}ms (orçamento {args.budget_ms:.0f}ms)")
+    if total_ms > args.budget_ms: sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Gerador de lances construído sobre as regras do GameManager.
+
+Cada "lance" é um passo único (origem -> destino), exatamente como o cliente envia pelo
+WebSocket: capturas em cadeia viram vários passos seguidos do mesmo jogador.
+"""
+from app.services.game_manager import GameManager
+from app.services.game_session import GameSession, COLOR_BITS, OPPONENT
+
+DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+def legal_moves(engine: GameManager, game: GameSession, color: str):
+    """Lista (origem, destino, é_captura) válidos para `color` no estado `game`."""
+    board, chain, own = game.board, game.chain_piece, COLOR_BITS[color]
+    origins = [chain] if chain else [{"r": i >> 3, "c": i & 7} for i, p in enumerate(board) if p & own]
+    moves = []
+    for o in origins:
+        for dr, dc in DIRECTIONS:
+            r, c = o["r"] + dr, o["c"] + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                t = {"r": r, "c": c}
+                is_valid, is_capture = engine._validate_move_logic(game, o, t, color)
+                if is_valid: moves.append((o, t, is_capture))
+                r += dr
+                c += dc
+    return moves
+
+
+def play(engine: GameManager, game: GameSession, move):
+    """Aplica um passo ao estado (mesma sequência do process_move, sem I/O)."""
+    o, t, is_capture = move
+    engine._apply_move_on_board(game.board, o, t, is_capture)
+    game.chain_piece = None
+    if is_capture and engine._can_capture_from(game.board, t, game.turn):
+        game.chain_piece = t
+    else:
+        game.turn = OPPONENT[game.turn]
+
+
+def copy_session(game: GameSession) -> GameSession:
+    return GameSession(game.game_id, bytearray(game.board), game.turn, game.chain_piece)
+
+
+def new_game(engine: GameManager) -> GameSession:
+    return GameSession("bench", engine._get_initial_board())
@@ -0,0 +1,366 @@
+"""
+Perft e micro-benchmarks das regras do GameManager.
+
+perft(N) conta todas as sequências de passos legais até a profundidade N. Um passo é um
+lance único origem -> destino, como o cliente envia: cada salto de uma captura em cadeia
+conta como um passo (e o turno só troca quando a cadeia termina).
+
+Os números são conferidos contra REFERENCE, gerado por um gerador independente
+(reference_moves, escrito direto das regras: peças andam 1 casa para frente e capturam
+por salto curto em qualquer direção; damas voam e capturam pousando em qualquer casa
+livre após a peça; captura obrigatória; promoção imediata ao tocar a última fileira).
+
+    python -m benchmarks.perft                 # confere o corpus inteiro (sai com 1 se divergir)
+    python -m benchmarks.perft --micro         # também mede as funções de regra isoladamente
+    python -m benchmarks.perft --position flying_king --depth 3 --divide
+"""
+import argparse
+import sys
+import time
+import timeit
+
+from app.services.game_manager import GameManager
+from app.services.game_session import WHITE, GameSession, board_from_wire
+from benchmarks.movegen import DIRECTIONS, copy_session, legal_moves, play
+
+# -----------------------------
+# Corpus de posições
+# -----------------------------
+# Linha 0 no topo (lado das pretas). w/b = peça, W/B = dama, '.' = vazio.
+POSITIONS = {
+    "initial": ("white", None, [
+        ".b.b.b.b",
+        "b.b.b.b.",
+        ".b.b.b.b",
+        "........",
+        "........",
+        "w.w.w.w.",
+        ".w.w.w.w",
+        "w.w.w.w.",
+    ]),
+    # Dama em a1 com peça inimiga no meio da diagonal longa: 3 casas de pouso (h8 ocupada)
+    "flying_king": ("white", None, [
+        ".......b",
+        "........",
+        "........",
+        "........",
+        "...b....",
+        "........",
+        "........",
+        "W.......",
+    ]),
+    # Duas peças inimigas coladas na diagonal bloqueiam a captura da dama
+    "blocked_king": ("white", None, [
+        "........",
+        "......b.",
+        "........",
+        "....b...",
+        "...b....",
+        "........",
+        ".w......",
+        "W.......",
+    ]),
+    # Peça branca com captura em cadeia e dois caminhos possíveis no segundo salto
+    "man_chain": ("white", None, [
+        "........",
+        "........",
+        "...b.b..",
+        "........",
+        "...b....",
+        "..w.....",
+        "........",
+        "......b.",
+    ]),
+    # Peça comum não pode capturar à distância nem pousar longe após o salto
+    "man_no_flying": ("white", None, [
+        "........",
+        "........",
+        "........",
+        "....b...",
+        "........",
+        "..b.....",
+        ".w......",
+        "........",
+    ]),
+    # Captura que promove na última fileira e continua como dama
+    "promotion_chain": ("white", None, [
+        "........",
+        "..b.....",
+        ".w......",
+        "......b.",
+        "........",
+        "......b.",
+        "........",
+        "b.......",
+    ]),
+    # Pretas com dama e peças, captura obrigatória ignorando lances simples
+    "black_forced": ("black", None, [
+        "........",
+        "..b.....",
+        "...w....",
+        "........",
+        ".....B..",
+        "........",
+        "...w.w..",
+        "w.......",
+    ]),
+    # Meio-jogo com várias capturas e damas dos dois lados
+    "middlegame": ("white", None, [
+        ".b.b...b",
+        "..b.b...",
+        ".b...b.b",
+        "..w.b...",
+        ".w...W..",
+        "w...w.w.",
+        ".B.w...w",
+        "w.w.....",
+    ]),
+    # Cadeia em andamento: só a peça marcada pode continuar capturando
+    "chain_in_progress": ("white", (4, 3), [
+        "........",
+        "..b.....",
+        "........",
+        "..b.b...",
+        "...w....",
+        "........",
+        ".....b..",
+        "w.......",
+    ]),
+}
+
+# Contagens por profundidade (índice 0 = profundidade 1), geradas com reference_moves
+REFERENCE = {
+    "initial": [7, 49, 302, 1469, 7350, 36644, 177113],
+    "flying_king": [3, 3, 2, 0, 0, 0],
+    "blocked_king": [2, 6, 12, 26, 63, 244],
+    "man_chain": [1, 2, 4, 8, 16, 87],
+    "man_no_flying": [1, 1, 0, 0, 0, 0],
+    "promotion_chain": [1, 1, 2, 0, 0, 0],
+    "black_forced": [2, 6, 25, 99, 515, 2976],
+    "middlegame": [3, 11, 21, 89, 290, 978],
+    "chain_in_progress": [2, 7, 22, 151, 558, 4032],
+}
+
+
+def parse_position(name: str) -> dict:
+    turn, chain, rows = POSITIONS[name]
+    pieces = {"w": ("white", False), "b": ("black", False), "W": ("white", True), "B": ("black", True)}
+    board = [[None] * 8 for _ in range(8)]
+    for r, row in enumerate(rows):
+        for c, ch in enumerate(row):
+            if ch in pieces:
+                color, king = pieces[ch]
+                board[r][c] = {"color": color, "king": king}
+    return {
+        "board": board,
+        "turn": turn,
+        "chain_piece": {"r": chain[0], "c": chain[1]} if chain else None,
+    }
+
+
+def copy_game(game: dict) -> dict:
+    return {
+        "board": [[dict(p) if p else None for p in row] for row in game["board"]],
+        "turn": game["turn"],
+        "chain_piece": game["chain_piece"],
+    }
+
+
+def load_session(name: str) -> GameSession:
+    """Mesma posição no formato do motor (tabuleiro compacto)."""
+    game = parse_position(name)
+    return GameSession(name, board_from_wire(game["board"]), game["turn"], game["chain_piece"])
+
+
+# -----------------------------
+# Gerador de referência (independente do GameManager)
+# -----------------------------
+
+def _captures_from(board, r, c):
+    piece = board[r][c]
+    color, caps = piece["color"], []
+    for dr, dc in DIRECTIONS:
+        if piece["king"]:
+            ir, ic = r + dr, c + dc
+            while 0 <= ir < 8 and 0 <= ic < 8 and board[ir][ic] is None:
+                ir, ic = ir + dr, ic + dc
+            if not (0 <= ir < 8 and 0 <= ic < 8) or board[ir][ic]["color"] == color: continue
+            jr, jc = ir + dr, ic + dc
+            while 0 <= jr < 8 and 0 <= jc < 8 and board[jr][jc] is None:
+                caps.append((jr, jc))
+                jr, jc = jr + dr, jc + dc
+        else:
+            mr, mc, jr, jc = r + dr, c + dc, r + 2 * dr, c + 2 * dc
+            if 0 <= jr < 8 and 0 <= jc < 8 and board[jr][jc] is None \
+                    and board[mr][mc] is not None and board[mr][mc]["color"] != color:
+                caps.append((jr, jc))
+    return caps
+
+
+def _quiet_from(board, r, c):
+    piece = board[r][c]
+    forward = -1 if piece["color"] == "white" else 1
+    quiet = []
+    for dr, dc in DIRECTIONS:
+        if not piece["king"] and dr != forward: continue
+        ir, ic = r + dr, c + dc
+        while 0 <= ir < 8 and 0 <= ic < 8 and board[ir][ic] is None:
+            quiet.append((ir, ic))
+            if not piece["king"]: break
+            ir, ic = ir + dr, ic + dc
+    return quiet
+
+
+def reference_moves(game: dict):
+    board, color, chain = game["board"], game["turn"], game["chain_piece"]
+    if chain:
+        r, c = chain["r"], chain["c"]
+        return [({"r": r, "c": c}, {"r": tr, "c": tc}, True) for tr, tc in _captures_from(board, r, c)]
+    own = [(r, c) for r in range(8) for c in range(8) if board[r][c] and board[r][c]["color"] == color]
+    captures = [({"r": r, "c": c}, {"r": tr, "c": tc}, True) for r, c in own for tr, tc in _captures_from(board, r, c)]
+    if captures: return captures
+    return [({"r": r, "c": c}, {"r": tr, "c": tc}, False) for r, c in own for tr, tc in _quiet_from(board, r, c)]
+
+
+def reference_play(game: dict, move):
+    (o, t, is_capture), board = move, game["board"]
+    piece = board[o["r"]][o["c"]]
+    if is_capture:
+        dr = 1 if t["r"] > o["r"] else -1
+        dc = 1 if t["c"] > o["c"] else -1
+        r, c = o["r"] + dr, o["c"] + dc
+        while board[r][c] is None: r, c = r + dr, c + dc
+        board[r][c] = None
+    board[o["r"]][o["c"]], board[t["r"]][t["c"]] = None, piece
+    if t["r"] == (0 if piece["color"] == "white" else 7): piece["king"] = True
+    if is_capture and _captures_from(board, t["r"], t["c"]):
+        game["chain_piece"] = t
+    else:
+        game["chain_piece"] = None
+        game["turn"] = "black" if game["turn"] == "white" else "white"
+
+
+# -----------------------------
+# Perft
+# -----------------------------
+
+# Cada backend: (carrega posição, gera lances, aplica lance, copia estado)
+
+def engine_backend(engine: GameManager):
+    return (
+        load_session,
+        lambda g: legal_moves(engine, g, g.turn),
+        lambda g, m: play(engine, g, m),
+        copy_session,
+    )
+
+
+REFERENCE_BACKEND = (parse_position, reference_moves, reference_play, copy_game)
+
+
+def perft(game, depth: int, backend) -> int:
+    if depth == 0: return 1
+    _, gen, apply, copy = backend
+    moves = gen(game)
+    if depth == 1: return len(moves)
+    total = 0
+    for move in moves:
+        child = copy(game)
+        apply(child, move)
+        total += perft(child, depth - 1, backend)
+    return total
+
+
+def divide(game, depth: int, backend):
+    _, gen, apply, copy = backend
+    for move in gen(game):
+        child = copy(game)
+        apply(child, move)
+        o, t, _ = move
+        print(f"  ({o['r']},{o['c']})->({t['r']},{t['c']}): {perft(child, depth - 1, backend)}")
+
+
+def check_corpus(engine: GameManager, max_depth: int) -> bool:
+    backend = engine_backend(engine)
+    load = backend[0]
+    ok, nodes, elapsed = True, 0, 0.0
+    for name, expected in REFERENCE.items():
+        for depth, want in enumerate(expected[:max_depth], start=1):
+            start = time.perf_counter()
+            got = perft(load(name), depth, backend)
+            elapsed += time.perf_counter() - start
+            nodes += got
+            status = "ok" if got == want else f"DIVERGE (esperado {want})"
+            if got != want: ok = False
+            print(f"{name:18} d={depth}: {got:>9}  {status}")
+    print(f"\n{nodes} nós em {elapsed:.2f}s -> {nodes / elapsed:,.0f} nós/s" if elapsed else "")
+    return ok
+
+
+# -----------------------------
+# Micro-benchmarks
+# -----------------------------
+
+def micro(engine: GameManager, number: int = 2000):
+    games = [load_session(name) for name in POSITIONS]
+    pairs = [(g, m) for g in games for m in reference_moves(parse_position(g.game_id))]
+    squares = [
+        (g, {"r": i >> 3, "c": i & 7}, "white" if p & WHITE else "black")
+        for g in games for i, p in enumerate(g.board) if p
+    ]
+
+    def validate():
+        for g, (o, t, _) in pairs: engine._validate_move_logic(g, o, t, g.turn)
+
+    def can_capture():
+        for g, pos, color in squares: engine._can_capture_from(g.board, pos, color)
+
+    def any_capture():
+        for g in games: engine._has_any_capture(g.board, g.turn)
+
+    def path_clear():
+        for g, (o, t, _) in pairs: engine._is_path_clear(g.board, o["r"], o["c"], t["r"], t["c"])
+
+    def apply_move():
+        for g, (o, t, cap) in pairs: engine._apply_move_on_board(bytearray(g.board), o, t, cap)
+
+    print(f"\n{'função':28} {'ns/chamada':>12}")
+    for label, fn, calls in [
+        ("_validate_move_logic", validate, len(pairs)),
+        ("_can_capture_from", can_capture, len(squares)),
+        ("_has_any_capture", any_capture, len(games)),
+        ("_is_path_clear", path_clear, len(pairs)),
+        ("_apply_move_on_board", apply_move, len(pairs)),
+    ]:
+        best = min(timeit.repeat(fn, number=max(1, number // calls), repeat=5)) / max(1, number // calls)
+        print(f"{label:28} {best / calls * 1e9:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--position", choices=sorted(POSITIONS))
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--divide", action="store_true", help="contagem por lance raiz (para depurar divergências)")
+    parser.add_argument("--reference", action="store_true", help="usa o gerador de referência em vez do motor")
+    parser.add_argument("--micro", action="store_true")
+    args = parser.parse_args()
+
+    engine = GameManager()
+    backend = REFERENCE_BACKEND if args.reference else engine_backend(engine)
+
+    if args.position:
+        game = backend[0](args.position)
+        if args.divide: divide(game, args.depth, backend)
+        start = time.perf_counter()
+        nodes = perft(game, args.depth, backend)
+        elapsed = time.perf_counter() - start
+        print(f"perft({args.depth}) = {nodes}  [{elapsed:.2f}s, {nodes / max(elapsed, 1e-9):,.0f} nós/s]")
+        return
+
+    ok = check_corpus(engine, args.depth)
+    if args.micro: micro(engine)
+    if not ok: sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
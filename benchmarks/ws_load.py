@@ -0,0 +1,339 @@
+"""
+Benchmark de carga dos WebSockets: matchmaking, partidas e chat global.
+
+Por padrão sobe o app num subprocesso em localhost com um Mongo em memória
+(benchmarks/fake_mongo.py) e sem rate limiting, depois:
+
+  1. conecta 2*N clientes em /ws/matchmaking e mede o tempo até o match_found;
+  2. joga as N partidas em paralelo em /ws/game/{id}/{cor} com uma política
+     determinística (sempre o primeiro lance legal; desiste após --max-moves);
+  3. conecta M clientes em /ws/chat e mede a latência de entrega dos broadcasts.
+
+Resultados (p50/p95/p99 de RTT por lance, fan-out do broadcast, memória por partida,
+CPU por lance) vão para benchmarks/results/ws_load-<commit>.json. Use --compare para
+diferenças contra uma execução anterior.
+
+    python -m benchmarks.ws_load --games 500 --chat-clients 1000
+    python -m benchmarks.ws_load --games 500 --compare benchmarks/results/ws_load-abc1234.json
+    python -m benchmarks.ws_load --url http://127.0.0.1:8000 --server-pid 1234
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import websockets
+
+from app.services.game_manager import GameManager
+from benchmarks.movegen import legal_moves, new_game, play
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+# O servidor drena por até DRAIN_DEADLINE segundos no SIGTERM; espera isso + uma folga
+DRAIN_DEADLINE = float(os.getenv("DRAIN_DEADLINE", 20))
+SHUTDOWN_GRACE = 15
+
+
+# -----------------------------
+# Servidor de benchmark
+# -----------------------------
+
+def serve(port: int):
+    # Troca o cliente (e não `app.db.db`): os módulos já importados guardam o proxy
+    # `db`, que resolve o banco pelo cliente a cada acesso
+    import app.db
+    from benchmarks.fake_mongo import FakeClient
+    app.db._client = FakeClient()
+
+    import uvicorn
+    from app.main import app as asgi_app
+    uvicorn.run(asgi_app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ, RATE_LIMIT_ENABLED="0")
+    proc = subprocess.Popen([sys.executable, "-m", "benchmarks.ws_load", "--serve", "--port", str(port)], env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5): return proc
+        except OSError:
+            if proc.poll() is not None: sys.exit("servidor de benchmark encerrou na inicialização")
+            time.sleep(0.2)
+    proc.kill()
+    sys.exit("servidor de benchmark não respondeu em 30s")
+
+
+def process_stats(pid):
+    """(segundos de CPU, RSS em bytes) do processo via /proc; None se indisponível."""
+    if not pid: return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        return cpu, rss
+    except (OSError, StopIteration, IndexError):
+        return None
+
+
+# -----------------------------
+# Métricas
+# -----------------------------
+
+def percentiles(samples):
+    if not samples: return {"count": 0}
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {
+        "count": len(s),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(s[-1] * 1000, 3),
+    }
+
+
+async def answer_ping(ws, msg) -> bool:
+    """Responde ao ping da aplicação como os clientes JS (senão o servidor derruba o socket)."""
+    if msg.get("type") != "ping": return False
+    await ws.send(json.dumps({"type": "pong", "id": msg.get("id")}))
+    return True
+
+
+async def recv_until(ws, predicate):
+    while True:
+        msg = json.loads(await ws.recv())
+        if await answer_ping(ws, msg): continue
+        if predicate(msg): return msg
+
+
+# -----------------------------
+# Cenários
+# -----------------------------
+
+async def run_matchmaking(base_ws: str, players: int, timings: list):
+    async def client():
+        started = time.perf_counter()
+        async with websockets.connect(f"{base_ws}/api/ws/matchmaking") as ws:
+            msg = await recv_until(ws, lambda m: m.get("type") == "match_found")
+        timings.append(time.perf_counter() - started)
+        return msg["game_id"], msg["color"]
+
+    pairs = {}
+    for game_id, color in await asyncio.gather(*(client() for _ in range(players))):
+        pairs.setdefault(game_id, {})[color] = True
+    return [gid for gid, colors in pairs.items() if len(colors) == 2]
+
+
+async def open_game(base_ws: str, game_id: str):
+    sockets = {}
+    for color in ("white", "black"):
+        ws = await websockets.connect(f"{base_ws}/api/ws/game/{game_id}/{color}?userId=anon")
+        sockets[color] = ws
+    # Cada conexão provoca um broadcast; drena até ambos verem os dois jogadores
+    both_joined = lambda m: m.get("type") == "update" and all(
+        p["name"] != "Aguardando..." for p in m["players"].values()
+    )
+    await asyncio.gather(*(recv_until(ws, both_joined) for ws in sockets.values()))
+    return sockets
+
+
+async def play_game(engine, sockets, max_moves: int, rtts: list, fanouts: list):
+    """Joga uma partida; RTT é medido no mover, fan-out até o último destinatário receber."""
+    game = new_game(engine)
+    moves = 0
+    while moves < max_moves:
+        color = game.turn
+        options = legal_moves(engine, game, color)
+        if not options: break
+        move = options[0]
+        o, t, _ = move
+        opponent = "black" if color == "white" else "white"
+
+        async def arrival(ws):
+            msg = await recv_until(ws, lambda m: m.get("type") in ("update", "game_over"))
+            return time.perf_counter(), msg
+
+        sent = time.perf_counter()
+        await sockets[color].send(json.dumps({"type": "move", "from": o, "to": t}))
+        (t_mover, m_mover), (t_opp, m_opp) = await asyncio.gather(arrival(sockets[color]), arrival(sockets[opponent]))
+        rtts.append(t_mover - sent)
+        fanouts.append(max(t_mover, t_opp) - sent)
+        moves += 1
+        if "game_over" in (m_mover.get("type"), m_opp.get("type")): return moves
+        play(engine, game, move)
+
+    await sockets[game.turn].send(json.dumps({"type": "surrender"}))
+    await asyncio.gather(*(recv_until(ws, lambda m: m.get("type") == "game_over") for ws in sockets.values()))
+    return moves
+
+
+async def run_chat(base_ws: str, clients: int, messages: int, latencies: list):
+    sockets = []
+    for i in range(0, clients, 200):
+        sockets += await asyncio.gather(*(
+            websockets.connect(f"{base_ws}/api/ws/chat", max_queue=None)
+            for _ in range(min(200, clients - i))
+        ))
+    await asyncio.sleep(1)
+
+    sent_at = {}
+    expected = messages * len(sockets)
+    received = 0
+    all_received = asyncio.Event()
+
+    async def reader(ws):
+        nonlocal received
+        async for raw in ws:
+            msg = json.loads(raw)
+            if await answer_ping(ws, msg): continue
+            if msg.get("type") != "chat" or msg.get("bench_id") not in sent_at: continue
+            latencies.append(time.perf_counter() - sent_at[msg["bench_id"]])
+            received += 1
+            if received >= expected: all_received.set()
+
+    readers = [asyncio.create_task(reader(ws)) for ws in sockets]
+    for n in range(messages):
+        sent_at[n] = time.perf_counter()
+        await sockets[n % len(sockets)].send(json.dumps({"username": "bench", "text": "olá", "bench_id": n}))
+        await asyncio.sleep(0.05)
+    try: await asyncio.wait_for(all_received.wait(), timeout=30)
+    except asyncio.TimeoutError: pass
+
+    for task in readers: task.cancel()
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+    return received, expected
+
+
+async def run(args, pid):
+    base_ws = args.url.replace("http", "ws", 1)
+    engine = GameManager()
+    results = {}
+
+    # 1. Matchmaking
+    mm_times = []
+    before = process_stats(pid)
+    game_ids = []
+    for i in range(0, args.games, args.ramp):
+        batch = min(args.ramp, args.games - i)
+        game_ids += await run_matchmaking(base_ws, batch * 2, mm_times)
+    results["matchmaking"] = percentiles(mm_times)
+    results["games_matched"] = len(game_ids)
+
+    # 2. Partidas: abre todas, mede memória, depois joga em paralelo
+    sockets = []
+    for i in range(0, len(game_ids), args.ramp):
+        sockets += await asyncio.gather(*(open_game(base_ws, gid) for gid in game_ids[i:i + args.ramp]))
+    with_games = process_stats(pid)
+    if before and with_games and game_ids:
+        results["memory_per_game_bytes"] = (with_games[1] - before[1]) // len(game_ids)
+
+    rtts, fanouts = [], []
+    started = time.perf_counter()
+    moves = await asyncio.gather(*(play_game(engine, s, args.max_moves, rtts, fanouts) for s in sockets))
+    elapsed = time.perf_counter() - started
+    after = process_stats(pid)
+    total_moves = sum(moves)
+    results["move_rtt"] = percentiles(rtts)
+    results["broadcast_fanout"] = percentiles(fanouts)
+    results["moves_total"] = total_moves
+    results["moves_per_second"] = round(total_moves / elapsed, 1) if elapsed else None
+    if with_games and after and total_moves:
+        results["cpu_ms_per_move"] = round((after[0] - with_games[0]) * 1000 / total_moves, 4)
+    await asyncio.gather(*(ws.close() for s in sockets for ws in s.values()), return_exceptions=True)
+
+    # 3. Chat global
+    if args.chat_clients:
+        latencies = []
+        received, expected = await run_chat(base_ws, args.chat_clients, args.chat_messages, latencies)
+        results["chat_delivery"] = percentiles(latencies)
+        results["chat_delivered_ratio"] = round(received / expected, 4) if expected else None
+
+    return results
+
+
+# -----------------------------
+# Persistência e comparação
+# -----------------------------
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(results: dict, args) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = git_commit()
+    path = args.output or os.path.join(RESULTS_DIR, f"ws_load-{commit}.json")
+    payload = {
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat(),
+        "params": {k: getattr(args, k) for k in ("games", "max_moves", "chat_clients", "chat_messages", "ramp")},
+        "results": results,
+    }
+    with open(path, "w") as f: json.dump(payload, f, indent=2)
+    return path
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f: baseline = json.load(f)["results"]
+
+    def flatten(d, prefix=""):
+        for k, v in d.items():
+            if isinstance(v, dict): yield from flatten(v, f"{prefix}{k}.")
+            elif isinstance(v, (int, float)): yield f"{prefix}{k}", v
+
+    old = dict(flatten(baseline))
+    print(f"\n{'métrica':40} {'antes':>12} {'agora':>12} {'Δ%':>8}")
+    for key, value in flatten(current):
+        if key not in old: continue
+        delta = ((value - old[key]) / old[key] * 100) if old[key] else 0.0
+        print(f"{key:40} {old[key]:>12} {value:>12} {delta:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="usa um servidor já em execução em vez de subir um")
+    parser.add_argument("--server-pid", type=int, help="PID do servidor externo (para CPU/memória)")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--max-moves", type=int, default=60)
+    parser.add_argument("--ramp", type=int, default=100, help="conexões abertas por lote")
+    parser.add_argument("--chat-clients", type=int, default=500)
+    parser.add_argument("--chat-messages", type=int, default=50)
+    parser.add_argument("--output")
+    parser.add_argument("--compare", help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    if args.serve: return serve(args.port)
+
+    proc = None
+    pid = args.server_pid
+    if not args.url:
+        proc = start_server(args.port)
+        args.url = f"http://127.0.0.1:{args.port}"
+        pid = proc.pid
+    try:
+        results = asyncio.run(run(args, pid))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=DRAIN_DEADLINE + SHUTDOWN_GRACE)
+
+    print(json.dumps(results, indent=2))
+    print(f"\nSalvo em {save(results, args)}")
+    if args.compare: compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,11 +16,19 @@ User=www-data
 Group=www-data
 WorkingDirectory=/home/jan.bortolanza/pw
 Environment="PATH=/home/jan.bortolanza/pw/venv/bin"
+Environment="WARMUP=1"
+# SIGTERM: o worker drena (salva as partidas, avisa os clientes) em até DRAIN_DEADLINE segundos;
+# o graceful-timeout do gunicorn e o TimeoutStopSec precisam ser maiores que isso
+Environment="DRAIN_DEADLINE=20"
 ExecStart=/home/jan.bortolanza/pw/venv/bin/gunicorn \
-  -k uvicorn.workers.UvicornWorker \
+  -k app.workers.PWUvicornWorker \
   -w 1 \
+  --graceful-timeout 45 \
   --bind 127.0.0.1:8000 \
   app.main:app
+# `systemctl reload`: o gunicorn sobe o worker novo antes de drenar o antigo (sem janela fora do ar)
+ExecReload=/bin/kill -s HUP $MAINPID
+TimeoutStopSec=60
 Restart=always
 RestartSec=5
 